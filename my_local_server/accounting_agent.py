@@ -1,8 +1,46 @@
 from lm_studio_agent import LMStudioAgent
+from services.fact_service import FACT_TABLE_DESCRIPTIONS
+from sql_templates import match_question, format_result
+from chat_sessions import SUMMARY_CHAR_LIMIT
+import asyncio
 import sqlite3
 import json
+import logging
 from flask import jsonify
 
+logger = logging.getLogger(__name__)
+
+# Independent sections analyzed in parallel for report-style prompts
+REPORT_SECTIONS = {
+    'income_statement': [
+        'Total income by category',
+        'Total expenses by category',
+        'Net profit by month'
+    ],
+    'balance_sheet': [
+        'Cash and bank position from the daily balances',
+        'Outstanding customer balances',
+        'Net income to date'
+    ],
+    'cash_flow': [
+        'Income received by payment mode',
+        'Expenses paid by payment mode',
+        'Net cash movement by week'
+    ]
+}
+
+# Raw tables keep money as integer paise (see money.Money); fact tables are in rupees
+MONEY_UNITS_NOTE = (
+    "Money columns in Accounts, Sales, daily_balances, channel_balance, order_receivable and customer_metrics are integer paise: divide by 100.0 for rupees. "
+    "Fact tables are already in rupees."
+)
+
+DEFAULT_REPORT_SECTIONS = [
+    'Total income by category',
+    'Total expenses by category',
+    'Income by payment mode'
+]
+
 class AccountingAgent(LMStudioAgent):
     def __init__(self, db_path, base_url="http://localhost:1234", **kwargs):
         """
@@ -33,12 +71,16 @@ class AccountingAgent(LMStudioAgent):
             
     def get_table_schema(self):
         """Get the database schema information"""
+        with self.tracer.span('schema'):
+            return self._read_table_schema()
+
+    def _read_table_schema(self):
         try:
             conn = self.connect_db()
             cursor = conn.cursor()
             
-            # Get list of tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            # Get list of tables and views (the fact views are agent-facing)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")
             tables = cursor.fetchall()
             
             schema = {}
@@ -55,13 +97,33 @@ class AccountingAgent(LMStudioAgent):
             
         except Exception as e:
             raise Exception(f"Error getting schema: {str(e)}")
+
+    def _format_fact_tables(self, schema):
+        """Describe the precomputed fact tables present in the schema"""
+        lines = [
+            f"- {name}: {description}"
+            for name, description in FACT_TABLE_DESCRIPTIONS.items()
+            if name in schema
+        ]
+        if not lines:
+            return ""
+        return (
+            "Precomputed summary tables (prefer these over scanning Accounts, Sales or Customer):\n"
+            + "\n".join(lines)
+        )
     
-    def query_database(self, query):
+    def query_database(self, query, params=None):
         """Execute a database query safely"""
+        with self.tracer.span('sql') as span:
+            data = self._run_query(query, params)
+            span.rows = len(data)
+            return data
+
+    def _run_query(self, query, params=None):
         try:
             conn = self.connect_db()
             cursor = conn.cursor()
-            cursor.execute(query)
+            cursor.execute(query, params or {})
             results = cursor.fetchall()
             columns = [description[0] for description in cursor.description]
             conn.close()
@@ -72,61 +134,94 @@ class AccountingAgent(LMStudioAgent):
         except sqlite3.Error as e:
             raise Exception(f"Database query error: {str(e)}")
     
-    def analyze_financial_data(self, question):
+    def _build_analysis_prompt(self, schema, question):
+        """Build the prompt asking the model for a SQL query or a direct analysis"""
+        return f"""Based on the following database schema:
+        {json.dumps(schema, indent=2)}
+        
+        {self._format_fact_tables(schema)}
+        
+        Please help analyze this financial question: {question}
+        
+        If you need to query the database, follow these strict SQL guidelines:
+        1. Use only standard SQLite syntax
+        2. Start with 'SELECT' followed by specific column names (avoid SELECT *)
+        3. Use proper table names: fact_daily_pnl, fact_weekly_pnl, fact_monthly_pnl, fact_payment_mode_daily,
+           fact_customer_balance, fact_order_aging, customer_metrics, Accounts, Customer, Sales, daily_balances,
+           order_service and order_tag (join to service and tag for per-service or per-tag questions)
+        4. For table aliases, use meaningful names like 'acc' for Accounts
+        5. Use proper date functions: date('now', '-7 days') for date operations
+        6. Compare date columns directly (e.g. date >= date('now', '-7 days')) instead of wrapping them in functions
+        7. {MONEY_UNITS_NOTE}
+        8. End with a semicolon
+        
+        Example valid queries:
+        - SELECT date, income, expense, net FROM fact_daily_pnl WHERE date >= date('now', '-7 days');
+        - SELECT month, income, expense, net FROM fact_monthly_pnl ORDER BY month DESC LIMIT 6;
+        - SELECT payment_mode, SUM(amount) AS total FROM fact_payment_mode_daily
+          WHERE transaction_type = 'Income' AND date >= date('now', '-30 days') GROUP BY payment_mode;
+        - SELECT amount / 100.0 AS amount, transaction_type FROM Accounts WHERE transaction_date >= date('now', '-7 days');
+        - SELECT acc.transaction_date, acc.amount / 100.0 AS amount, acc.tax_amount / 100.0 AS tax_amount,
+          acc.total_amount / 100.0 AS total_amount, acc.order_no 
+          FROM Accounts acc 
+          WHERE acc.transaction_date >= date('now', '-30 days');
+        - SELECT SUM(amount) / 100.0 as total, SUM(tax_amount) / 100.0 as tax_total, transaction_type, category 
+          FROM Accounts 
+          GROUP BY transaction_type, category;
+        
+        Provide either a valid SQL query or a clear analysis."""
+
+    def _build_data_prompt(self, data, question):
+        """Build the prompt asking the model to explain query results"""
+        return f"""Based on these query results:
+        {json.dumps(data, indent=2)}
+        
+        Provide a clear analysis addressing the original question:
+        {question}
+        
+        Include:
+        1. Summary of key findings
+        2. Relevant numbers and trends
+        3. Business insights or recommendations"""
+
+    def analyze_financial_data(self, question, narrative=True):
+        """Blocking wrapper around aanalyze_financial_data for scripts"""
+        return self._run_blocking(self.aanalyze_financial_data(question, narrative=narrative))
+
+    async def aanalyze_financial_data(self, question, schema=None, narrative=True):
         """
         Analyze financial data based on user question.
+        
+        Questions matching a known SQL template skip model-generated SQL; the
+        model is only asked for the narrative, and not at all for numeric
+        answers or when narrative is False. SQLite work runs in a worker
+        thread so the scheduler loop stays free.
+        
+        Args:
+            question (str): The financial question
+            schema (dict, optional): Pre-fetched schema, shared by fanned-out sub-analyses
+            narrative (bool): Whether template answers should be explained by the model
         """
         try:
-            schema = self.get_table_schema()
-            
-            # Create a more specific prompt with clear SQL guidelines
-            analysis_prompt = f"""Based on the following database schema:
-            {json.dumps(schema, indent=2)}
-            
-            Please help analyze this financial question: {question}
-            
-            If you need to query the database, follow these strict SQL guidelines:
-            1. Use only standard SQLite syntax
-            2. Start with 'SELECT' followed by specific column names (avoid SELECT *)
-            3. Use proper table names: Accounts, Customer, Sales, DailyBalance
-            4. For table aliases, use meaningful names like 'acc' for Accounts
-            5. Use proper date functions: date('now', '-7 days') for date operations
-            6. End with a semicolon
-            
-            Example valid queries:
-            - SELECT amount, transaction_type FROM Accounts WHERE transaction_date >= date('now', '-7 days');
-            - SELECT acc.transaction_date, acc.amount, acc.tax_amount, acc.total_amount, acc.order_no 
-              FROM Accounts acc 
-              WHERE acc.transaction_date >= date('now', '-30 days');
-            - SELECT SUM(amount) as total, SUM(tax_amount) as tax_total, transaction_type, category 
-              FROM Accounts 
-              GROUP BY transaction_type, category;
-            
-            Provide either a valid SQL query or a clear analysis."""
-            
-            response = self.simple_chat(analysis_prompt, self.system_prompt)
-            print(response)
+            match = match_question(question)
+            if match:
+                data = await asyncio.to_thread(self.query_database, match.sql, match.params)
+                if match.numeric or not narrative:
+                    return format_result(match, data)
+                return await self.asimple_chat(self._build_data_prompt(data, question), self.system_prompt,
+                                               span_name='explain')
+            
+            if schema is None:
+                schema = await asyncio.to_thread(self.get_table_schema)
+            
+            analysis_prompt = self._traced_prompt(self._build_analysis_prompt, schema, question)
+            response = await self.asimple_chat(analysis_prompt, self.system_prompt)
             if "SELECT" in response.upper():
-                
                 query = self._clean_sql_query(response)
-                print(query)
                 try:
-                    data = self.query_database(query)
-                    
-                    # Get analysis of the data
-                    data_prompt = f"""Based on these query results:
-                    {json.dumps(data, indent=2)}
-                    
-                    Provide a clear analysis addressing the original question:
-                    {question}
-                    
-                    Include:
-                    1. Summary of key findings
-                    2. Relevant numbers and trends
-                    3. Business insights or recommendations"""
-                    
-                    return self.simple_chat(data_prompt, self.system_prompt)
-                    
+                    data = await asyncio.to_thread(self.query_database, query)
+                    return await self.asimple_chat(self._build_data_prompt(data, question), self.system_prompt,
+                                                   span_name='explain')
                 except sqlite3.Error as e:
                     return f"Database query error: {str(e)}. Please rephrase your question."
             
@@ -151,63 +246,91 @@ class AccountingAgent(LMStudioAgent):
         return text
 
     def get_financial_report(self, report_type, period=None):
+        """Blocking wrapper around aget_financial_report for scripts"""
+        return self._run_blocking(self.aget_financial_report(report_type, period))
+
+    async def aget_financial_report(self, report_type, period=None):
         """
-        Generate financial reports.
+        Generate a financial report.
+        
+        Each section of the report is analyzed independently and in parallel,
+        then the model combines the section analyses into the final report.
         
         Args:
             report_type (str): Type of report (e.g., 'balance_sheet', 'income_statement')
             period (str, optional): Time period for the report
         """
         try:
-            report_prompt = f"""Please generate a {report_type} report"""
+            schema = await asyncio.to_thread(self.get_table_schema)
+            sections = REPORT_SECTIONS.get(report_type, DEFAULT_REPORT_SECTIONS)
+            questions = [
+                f"{section} for the period: {period}" if period else section
+                for section in sections
+            ]
+            
+            analyses = await asyncio.gather(*(
+                self.aanalyze_financial_data(question, schema=schema)
+                for question in questions
+            ))
+            
+            combined = "\n\n".join(
+                f"### {section}\n{analysis}" for section, analysis in zip(sections, analyses)
+            )
+            report_prompt = f"""Combine these section analyses into a single {report_type} report"""
             if period:
                 report_prompt += f" for the period: {period}"
+            report_prompt += f""":
             
-            return self.analyze_financial_data(report_prompt)
+            {combined}
+            
+            Keep the numbers exactly as given and end with the key recommendations."""
+            
+            return await self.asimple_chat(report_prompt, self.system_prompt, span_name='explain')
             
         except Exception as e:
             return f"Report generation error: {str(e)}"
 
-    def process_chat_message(self, message, conversation_history=None):
+    def process_chat_message(self, message, conversation_history=None, summary=None):
+        """Blocking wrapper around aprocess_chat_message for scripts"""
+        return self._run_blocking(self.aprocess_chat_message(message, conversation_history, summary))
+
+    async def aprocess_chat_message(self, message, conversation_history=None, summary=None):
         """
         Process a chat message from the web UI.
         
         Args:
             message (str): User's message
-            conversation_history (list): Previous messages in the conversation
+            conversation_history (list): Recent messages in the conversation
+            summary (str): Rolling summary of older, compacted messages
             
         Returns:
             dict: Response containing assistant's message and any relevant data
         """
         try:
-            # Get database schema for context
-            schema = self.get_table_schema()
-            
-            # Build conversation context
-            context = f"""Database Schema: {json.dumps(schema, indent=2)}
-            
-            Previous conversation:
-            {self._format_conversation_history(conversation_history) if conversation_history else 'No previous context.'}
-            
-            User question: {message}
-            """
+            match = match_question(message)
+            if match:
+                data = await asyncio.to_thread(self.query_database, match.sql, match.params)
+                if match.numeric:
+                    final_response = format_result(match, data)
+                else:
+                    final_response = await self.asimple_chat(self._build_explain_prompt(data), self.system_prompt,
+                                                             span_name='explain')
+                return {
+                    'message': final_response,
+                    'data': data,
+                    'query': match.sql.strip()
+                }
             
-            # Get initial response
-            response = self.simple_chat(context, self.system_prompt)
+            schema = await asyncio.to_thread(self.get_table_schema)
+            context = self._traced_prompt(self._build_chat_context, schema, message, conversation_history,
+                                          summary)
+            response = await self.asimple_chat(context, self.system_prompt)
             
-            # Check if response contains SQL query
             if "SELECT" in response.upper():
-                # Extract and execute query
-                query = response[response.upper().find("SELECT"):].split(";")[0] + ";"
-                data = self.query_database(query)
-                
-                # Get final analysis with the data
-                data_context = f"""Based on the query results:
-                {json.dumps(data, indent=2)}
-                
-                Please provide a clear explanation for the user."""
-                
-                final_response = self.simple_chat(data_context, self.system_prompt)
+                query = self._extract_chat_query(response)
+                data = await asyncio.to_thread(self.query_database, query)
+                final_response = await self.asimple_chat(self._build_explain_prompt(data), self.system_prompt,
+                                                         span_name='explain')
                 
                 return {
                     'message': final_response,
@@ -227,6 +350,120 @@ class AccountingAgent(LMStudioAgent):
                 'error': True
             }
 
+    async def achat_in_session(self, store, session_id, message):
+        """
+        Answer a chat message using server-side session history.
+        
+        Args:
+            store (ChatSessionStore): Session storage
+            session_id (str): ID of the chat session
+            message (str): User's message
+            
+        Returns:
+            dict: Response from aprocess_chat_message plus session_id and result_id
+        """
+        summary, history = await asyncio.to_thread(store.load_context, session_id)
+        response = await self.aprocess_chat_message(message, history, summary)
+        response['session_id'] = session_id
+        if response.get('error'):
+            return response
+
+        response['result_id'] = await asyncio.to_thread(store.save_turn, session_id, message, response)
+        await self._acompact_session(store, session_id)
+        return response
+
+    async def _acompact_session(self, store, session_id):
+        """Fold messages that no longer fit the history budget into the summary"""
+        summary, overflow = await asyncio.to_thread(store.pending_compaction, session_id)
+        if not overflow:
+            return
+
+        new_summary = await self.asimple_chat(
+            self._traced_prompt(self._build_summary_prompt, summary, overflow),
+            self.system_prompt,
+            span_name='summarize'
+        )
+        if new_summary.startswith("Error:"):
+            # Keep the conversation bounded even when the model is unavailable
+            new_summary = " ".join(
+                [summary] + [f"{msg['role']}: {msg['content'][:200]}" for msg in overflow]
+            ).strip()[-SUMMARY_CHAR_LIMIT:]
+
+        await asyncio.to_thread(store.apply_summary, session_id, new_summary,
+                                [msg['id'] for msg in overflow])
+
+    async def atraced(self, endpoint, coro):
+        """
+        Await an agent coroutine as one traced request.
+        
+        The spans recorded while it runs are stored in agent_trace / agent_span
+        once it finishes, whether it succeeded or not.
+        """
+        self.tracer.start(endpoint, self.user_key)
+        try:
+            return await coro
+        except Exception as e:
+            self.tracer.error = str(e)
+            raise
+        finally:
+            self.tracer.finish()
+            await asyncio.to_thread(self.tracer.save, self.db_path)
+
+    def _traced_prompt(self, builder, *args):
+        """Build a prompt inside a 'prompt' span that records its size"""
+        with self.tracer.span('prompt') as span:
+            prompt = builder(*args)
+            span.prompt_chars = len(prompt)
+        return prompt
+
+    def _build_chat_context(self, schema, message, conversation_history, summary=None):
+        """Build the chat prompt from the schema, history and new message"""
+        return f"""Database Schema:
+            {self._format_schema(schema)}
+            
+            {MONEY_UNITS_NOTE}
+            
+            {self._format_fact_tables(schema)}
+            
+            Summary of earlier conversation:
+            {summary or 'None.'}
+            
+            Previous conversation:
+            {self._format_conversation_history(conversation_history) if conversation_history else 'No previous context.'}
+            
+            User question: {message}
+            """
+
+    def _build_summary_prompt(self, summary, messages):
+        """Build the prompt that folds older messages into the rolling summary"""
+        return f"""Current summary of the conversation:
+            {summary or 'None.'}
+            
+            Older messages to fold into it:
+            {self._format_conversation_history(messages)}
+            
+            Rewrite the summary in under 120 words. Keep the questions asked, the tables,
+            periods and figures discussed, and any result references like [result #12].
+            Reply with the summary only."""
+
+    def _format_schema(self, schema):
+        """One line per table: name(column type, ...)"""
+        return "\n".join(
+            f"{table}({', '.join(col['name'] + ' ' + col['type'] for col in columns)})"
+            for table, columns in schema.items()
+        )
+
+    def _build_explain_prompt(self, data):
+        """Build the prompt asking the model to explain chat query results"""
+        return f"""Based on the query results:
+                {json.dumps(data, indent=2)}
+                
+                Please provide a clear explanation for the user."""
+
+    def _extract_chat_query(self, response):
+        """Pull the first SELECT statement out of a chat response"""
+        return response[response.upper().find("SELECT"):].split(";")[0] + ";"
+
     def _format_conversation_history(self, history):
         """Format conversation history for context"""
         if not history:
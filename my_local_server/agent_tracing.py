@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Timing and token counts for one step of an agent request"""
+
+    def __init__(self, name, offset_ms, prompt_chars=None):
+        self.name = name
+        self.offset_ms = offset_ms
+        self.duration_ms = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.prompt_chars = prompt_chars
+        self.rows = None
+        self.error = None
+
+    def record_usage(self, usage):
+        """Copy token counts from an OpenAI-style 'usage' block"""
+        if usage:
+            self.prompt_tokens = usage.get('prompt_tokens')
+            self.completion_tokens = usage.get('completion_tokens')
+
+
+class AgentTracer:
+    """
+    Collects spans (check, schema, prompt, generate, sql, explain) for one
+    agent request and stores them in the agent_trace / agent_span tables.
+    """
+
+    def __init__(self):
+        self.request_id = uuid.uuid4().hex
+        self.endpoint = None
+        self.user = None
+        self.started_at = datetime.utcnow()
+        self.duration_ms = None
+        self.error = None
+        self.spans = []
+        self._start = time.perf_counter()
+
+    def start(self, endpoint, user=None):
+        """Begin the trace for a top-level request"""
+        self.endpoint = endpoint
+        self.user = user
+        self.started_at = datetime.utcnow()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, prompt_chars=None):
+        span = Span(name, (time.perf_counter() - self._start) * 1000, prompt_chars)
+        began = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - began) * 1000
+            self.spans.append(span)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        breakdown = ', '.join(f"{s.name}={s.duration_ms:.0f}ms" for s in self.spans)
+        logger.info(f"Agent request {self.endpoint} took {self.duration_ms:.0f}ms ({breakdown})")
+
+    @property
+    def prompt_tokens(self):
+        return sum(s.prompt_tokens or 0 for s in self.spans)
+
+    @property
+    def completion_tokens(self):
+        return sum(s.completion_tokens or 0 for s in self.spans)
+
+    def save(self, db_path):
+        """Persist the trace and its spans; failures are logged, never raised"""
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                with conn:
+                    cursor = conn.execute(
+                        """INSERT INTO agent_trace
+                               (request_id, endpoint, user, started_at, duration_ms,
+                                prompt_tokens, completion_tokens, error)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (
+                            self.request_id,
+                            self.endpoint,
+                            self.user,
+                            self.started_at.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                            self.duration_ms,
+                            self.prompt_tokens,
+                            self.completion_tokens,
+                            self.error
+                        )
+                    )
+                    conn.executemany(
+                        """INSERT INTO agent_span
+                               (trace_id, name, offset_ms, duration_ms, prompt_tokens,
+                                completion_tokens, prompt_chars, rows, error)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        [
+                            (cursor.lastrowid, s.name, s.offset_ms, s.duration_ms, s.prompt_tokens,
+                             s.completion_tokens, s.prompt_chars, s.rows, s.error)
+                            for s in self.spans
+                        ]
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not save agent trace {self.request_id}: {str(e)}")
@@ -1,6 +1,12 @@
 from flask import Flask
+import logging
 import os
 
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -17,13 +23,39 @@ UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Backup configuration
+app.config['BACKUP_FOLDER'] = os.getenv('BACKUP_FOLDER', os.path.join(basedir, 'backups'))
+app.config['BACKUP_KEEP'] = int(os.getenv('BACKUP_KEEP', 7))
+
+# Analytics export configuration
+app.config['EXPORT_FOLDER'] = os.getenv('EXPORT_FOLDER', os.path.join(basedir, 'exports'))
+
+# LLM configuration: concurrent requests allowed against the local LM Studio server
+app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv('LLM_MAX_CONCURRENCY', 2))
+app.config['CHAT_HISTORY_TOKEN_BUDGET'] = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 1500))
+
+# Instrumentation: statements slower than this are logged; a fraction of requests is profiled
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 100))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# Debug only: keep slow-query parameter values (phone numbers, password hashes) instead of their types
+app.config['SLOW_QUERY_LOG_PARAMETERS'] = os.getenv('SLOW_QUERY_LOG_PARAMETERS', '0') == '1'
+
 # Initialize extensions
 from extensions import db
+from json_provider import init_json
+from instrumentation import init_instrumentation
 db.init_app(app)
+init_json(app)
+init_instrumentation(app)
 
 # Import routes
 from routes import init_routes
 from excel_upload import init_upload_routes
+from services.fact_service import FactTableService
+from services.search_service import SearchService
+from services.version_service import TableVersionService
+from services.export_service import ExportService
+from money import unconverted_money_columns
 
 # Initialize routes
 init_routes(app)
@@ -31,7 +63,35 @@ init_upload_routes(app)
 
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this to a secure secret key
 
+def init_database():
+    """
+    Create missing tables, fact views, search indexes and change-tracking
+    triggers. Must run inside an app context; errors propagate so the app
+    never serves against a half-initialized database.
+
+    Raises:
+        RuntimeError: Money columns are still REAL rupees
+    """
+    unconverted = unconverted_money_columns(db.session.connection(), db.metadata)
+    if unconverted:
+        columns = ', '.join(f"{table}.{column}" for table, names in unconverted.items() for column in names)
+        raise RuntimeError(
+            f"Money columns still hold rupees ({columns}); "
+            f"run migrations/convert_money_to_paise.py before starting the app"
+        )
+    db.create_all()
+    FactTableService().ensure_views()
+    SearchService().ensure_index()
+    TableVersionService().ensure_tracking()
+    ExportService(app.config['EXPORT_FOLDER']).ensure_tracking()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Set up the database; run once before serving the app with flask run or a WSGI server"""
+    init_database()
+    print("Database initialized")
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_database()
     app.run(debug=True, port=5000) 
\ No newline at end of file
@@ -0,0 +1,209 @@
+import json
+import sqlite3
+import uuid
+from datetime import datetime
+
+SUMMARY_CHAR_LIMIT = 1200
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text or '') // 4)
+
+
+def _now():
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class ChatSessionStore:
+    """
+    Server-side storage for accounting chat history.
+
+    Only the most recent turns that fit in the token budget are sent back to
+    the model; older turns are folded into a rolling summary. Query results
+    are kept in chat_result and referenced by ID instead of being re-sent.
+    """
+
+    def __init__(self, db_path, token_budget=1500, keep_recent=4):
+        """
+        Args:
+            db_path (str): Path to the SQLite database file
+            token_budget (int): Maximum estimated tokens of verbatim history per prompt
+            keep_recent (int): Messages always kept verbatim, even over budget
+        """
+        self.db_path = db_path
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+
+    def connect_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_session(self, user_id):
+        session_id = uuid.uuid4().hex
+        conn = self.connect_db()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO chat_session (id, user_id, summary, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                    (session_id, user_id, '', _now(), _now())
+                )
+        finally:
+            conn.close()
+        return session_id
+
+    def owns_session(self, session_id, user_id):
+        conn = self.connect_db()
+        try:
+            row = conn.execute(
+                'SELECT 1 FROM chat_session WHERE id = ? AND user_id = ?', (session_id, user_id)
+            ).fetchone()
+            return row is not None
+        finally:
+            conn.close()
+
+    def load_context(self, session_id):
+        """
+        Get what the next prompt should see of this session.
+
+        Returns:
+            tuple: (rolling summary, list of {'role', 'content'} for uncompacted turns)
+        """
+        conn = self.connect_db()
+        try:
+            summary = conn.execute(
+                'SELECT summary FROM chat_session WHERE id = ?', (session_id,)
+            ).fetchone()
+            rows = conn.execute(
+                """SELECT m.role, m.content, r.id AS result_id, r.row_count, r.columns
+                   FROM chat_message m
+                   LEFT JOIN chat_result r ON r.id = m.result_id
+                   WHERE m.session_id = ? AND m.compacted = 0
+                   ORDER BY m.id""",
+                (session_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        turns = []
+        for row in rows:
+            content = row['content']
+            if row['result_id']:
+                columns = ', '.join(json.loads(row['columns'] or '[]'))
+                content += f"\n[result #{row['result_id']}: {row['row_count']} rows; columns: {columns}]"
+            turns.append({'role': row['role'], 'content': content})
+        return (summary['summary'] if summary else ''), turns
+
+    def save_turn(self, session_id, message, response):
+        """
+        Store a user message and the assistant's reply.
+
+        Returns:
+            int or None: ID of the stored query result, if the reply had one
+        """
+        conn = self.connect_db()
+        try:
+            with conn:
+                result_id = None
+                data = response.get('data')
+                if data is not None:
+                    cursor = conn.execute(
+                        """INSERT INTO chat_result (session_id, query, row_count, columns, data, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?)""",
+                        (
+                            session_id,
+                            response.get('query'),
+                            len(data),
+                            json.dumps(list(data[0].keys()) if data else []),
+                            json.dumps(data, default=str),
+                            _now()
+                        )
+                    )
+                    result_id = cursor.lastrowid
+
+                reply = response.get('message') or ''
+                conn.executemany(
+                    """INSERT INTO chat_message
+                           (session_id, role, content, token_estimate, result_id, compacted, created_at)
+                       VALUES (?, ?, ?, ?, ?, 0, ?)""",
+                    [
+                        (session_id, 'user', message, estimate_tokens(message), None, _now()),
+                        (session_id, 'assistant', reply, estimate_tokens(reply), result_id, _now())
+                    ]
+                )
+                conn.execute('UPDATE chat_session SET updated_at = ? WHERE id = ?', (_now(), session_id))
+            return result_id
+        finally:
+            conn.close()
+
+    def pending_compaction(self, session_id):
+        """
+        Find the oldest uncompacted messages that no longer fit the budget.
+
+        Returns:
+            tuple: (current summary, list of {'id', 'role', 'content'} to fold into it)
+        """
+        conn = self.connect_db()
+        try:
+            summary = conn.execute(
+                'SELECT summary FROM chat_session WHERE id = ?', (session_id,)
+            ).fetchone()
+            rows = conn.execute(
+                """SELECT id, role, content, token_estimate FROM chat_message
+                   WHERE session_id = ? AND compacted = 0
+                   ORDER BY id DESC""",
+                (session_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        # Walk back from the newest message, keeping as much as fits
+        used = 0
+        keep = 0
+        for index, row in enumerate(rows):
+            used += row['token_estimate'] or 0
+            if index >= self.keep_recent and used > self.token_budget:
+                break
+            keep = index + 1
+
+        overflow = [
+            {'id': row['id'], 'role': row['role'], 'content': row['content']}
+            for row in reversed(rows[keep:])
+        ]
+        return (summary['summary'] if summary else ''), overflow
+
+    def apply_summary(self, session_id, summary, message_ids):
+        """Replace the rolling summary and mark the folded messages as compacted"""
+        conn = self.connect_db()
+        try:
+            with conn:
+                conn.execute(
+                    'UPDATE chat_session SET summary = ?, updated_at = ? WHERE id = ?',
+                    (summary[:SUMMARY_CHAR_LIMIT], _now(), session_id)
+                )
+                conn.executemany(
+                    'UPDATE chat_message SET compacted = 1 WHERE id = ?',
+                    [(message_id,) for message_id in message_ids]
+                )
+        finally:
+            conn.close()
+
+    def get_result(self, result_id, session_id):
+        conn = self.connect_db()
+        try:
+            row = conn.execute(
+                'SELECT id, query, row_count, columns, data FROM chat_result WHERE id = ? AND session_id = ?',
+                (result_id, session_id)
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        return {
+            'id': row['id'],
+            'query': row['query'],
+            'row_count': row['row_count'],
+            'columns': json.loads(row['columns'] or '[]'),
+            'data': json.loads(row['data'] or '[]')
+        }
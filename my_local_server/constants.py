@@ -57,6 +57,13 @@ ORDER_STATUSES = [
     'Cancelled'
 ]
 
+# Order statuses still waiting on the workshop; orders without a status count as Unprocessed
+WORKSHOP_OPEN_STATUSES = [
+    'Unprocessed',
+    'Pending',
+    'Processing'
+]
+
 # CSV Column Mappings
 CSV_COLUMNS = {
     'ORDERS': {
@@ -275,4 +282,26 @@ COLUMN_STANDARDIZATION = {
     'Order Status': 'order_status',
     'Last Payment Activity': 'last_payment_activity',
     'Coupon Code': 'coupon_code'
-}
\ No newline at end of file
+}
+# Country code assumed for phone numbers entered without one
+DEFAULT_PHONE_COUNTRY_CODE = '91'
+
+# Payment channels reconciled against the daily bank and cash balances.
+# Modes not listed here (Package redemptions) move no money.
+PAYMENT_CHANNELS = {
+    'cash': ['Cash'],
+    'bank': [
+        'UPI',
+        'Bank Transfer',
+        'Credit Card',
+        'Debit Card',
+        'Check',
+        'Digital Wallet',
+        'PhonePe',
+        'Google Pay',
+        'Paytm',
+        'NEFT',
+        'RTGS',
+        'IMPS'
+    ]
+}
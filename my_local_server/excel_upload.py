@@ -12,8 +12,17 @@ from constants import (
     COLUMN_STANDARDIZATION
 )
 import numpy as np
+import logging
+from services.fact_service import FactTableService
+from services.dimension_service import OrderDimensionService
+from validation import validate_frame
+
+logger = logging.getLogger(__name__)
 
 def init_upload_routes(app):
+    fact_service = FactTableService()
+    dimension_service = OrderDimensionService()
+
     def is_valid_order_no(order_no):
         """Check if order number is valid"""
         if pd.isna(order_no):
@@ -71,30 +80,28 @@ def init_upload_routes(app):
 
             # Skip if both date and amount are invalid
             if pd.isna(payment_date) or pd.isna(amount):
-                print(f"Skipping row with invalid date or amount: {row}")
+                logger.warning(f"Skipping row with invalid date or amount: {row}")
                 return None
 
-            # Create transaction record with validated data
-            transaction = Accounts(
-                transaction_date=payment_date,
-                transaction_type='Income',
-                category='Sales',
-                amount=amount,
-                tax_amount=0.0,  # Default tax amount
-                total_amount=amount,
-                payment_mode=map_payment_mode(row['payment_mode']),
-                payment_status='Completed',
-                order_no=str(row['order_no']).strip(),
-                is_reconciled=False,  # Default value
-                created_at=datetime.utcnow(),
-                source='csv'
-            )
-            
-            return transaction
+            # Transaction record; choice fields are checked for the whole file by validate_frame
+            return {
+                'transaction_date': payment_date,
+                'transaction_type': 'Income',
+                'category': 'Sales',
+                'amount': amount,
+                'tax_amount': 0.0,  # Default tax amount
+                'total_amount': amount,
+                'payment_mode': map_payment_mode(row['payment_mode']),
+                'payment_status': 'Completed',
+                'order_no': str(row['order_no']).strip(),
+                'is_reconciled': False,  # Default value
+                'created_at': datetime.utcnow(),
+                'source': 'csv'
+            }
             
         except Exception as e:
-            print(f"Error processing payment row: {row}")
-            print(f"Error details: {str(e)}")
+            logger.error(f"Error processing payment row: {str(e)}")
+            logger.debug(f"Row: {row}")
             return None
 
     def standardize_payment_mode(mode):
@@ -204,7 +211,7 @@ def init_upload_routes(app):
                 except:
                     continue
             
-            print(f"Could not parse {date_type}: {date_str}")
+            logger.warning(f"Could not parse {date_type}: {date_str}")
             return None
 
     def parse_payment_date(date_str):
@@ -236,7 +243,7 @@ def init_upload_routes(app):
             return pd.to_datetime(date_str)
                 
         except:
-            print(f"Could not parse payment date: {date_str}")
+            logger.warning(f"Could not parse payment date: {date_str}")
             return None
 
     def parse_transaction_date(date_str):
@@ -263,10 +270,10 @@ def init_upload_routes(app):
                 except:
                     continue
             
-            print(f"Could not parse transaction date: {date_str}")
+            logger.warning(f"Could not parse transaction date: {date_str}")
             return None
         except:
-            print(f"Error parsing transaction date: {date_str}")
+            logger.warning(f"Error parsing transaction date: {date_str}")
             return None
 
     def is_return_order(order_no):
@@ -310,7 +317,7 @@ def init_upload_routes(app):
                 try:
                     df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
                 except Exception as e:
-                    print(f"Error converting {col}: {str(e)}")
+                    logger.warning(f"Error converting {col}: {str(e)}")
                     continue
         
         return df
@@ -329,7 +336,7 @@ def init_upload_routes(app):
             # Map column names to standardized format
             df = map_column_name(df)
             
-            print("Available columns:", df.columns.tolist())
+            logger.debug(f"Available columns: {df.columns.tolist()}")
             
             # Verify required columns for orders CSV
             required_columns = REQUIRED_COLUMNS['ORDERS']
@@ -342,7 +349,7 @@ def init_upload_routes(app):
                     'error': f'Missing required columns: {", ".join(missing_columns)}\nAvailable columns: {", ".join(df.columns)}'
                 }), 400
 
-            print("Mapped CSV Columns:", df.columns.tolist())
+            logger.debug(f"Mapped CSV columns: {df.columns.tolist()}")
             
             with db.session.no_autoflush:
                 # First pass: Process customers
@@ -373,17 +380,17 @@ def init_upload_routes(app):
                                 value = row.get(column)
                                 customer_data[field] = str(value) if pd.notna(value) else ''
                             except Exception as e:
-                                print(f"Error processing {column}: {str(e)}")
+                                logger.warning(f"Error processing {column}: {str(e)}")
                                 customer_data[field] = ''
 
                         if customer:
                             # Update existing customer
-                            print(f"Updating customer: {customer.customer_code}")
+                            logger.debug(f"Updating customer: {customer.customer_code}")
                             for key, value in customer_data.items():
                                 setattr(customer, key, value)
                         else:
                             # Create new customer
-                            print(f"Creating new customer: {row['customer_code']}")
+                            logger.debug(f"Creating new customer: {row['customer_code']}")
                             customer = Customer(
                                 customer_code=str(row['customer_code']),
                                 **customer_data
@@ -393,8 +400,8 @@ def init_upload_routes(app):
                         db.session.commit()
                         
                     except Exception as e:
-                        print(f"Error processing customer row: {row}")
-                        print(f"Error details: {str(e)}")
+                        logger.error(f"Error processing customer row: {str(e)}")
+                        logger.debug(f"Row: {row}")
                         db.session.rollback()
                         continue
 
@@ -446,7 +453,7 @@ def init_upload_routes(app):
                             # Check if sale already exists
                             existing_sale = Sales.query.get(str(row['order_no']))
                             if existing_sale:
-                                print(f"Updating existing sale: {row['order_no']}")
+                                logger.debug(f"Updating existing sale: {row['order_no']}")
                                 # Update existing sale
                                 for key, value in processed_data.items():
                                     setattr(existing_sale, key, value)
@@ -473,7 +480,7 @@ def init_upload_routes(app):
                                 existing_sale.coupon_code = str(row['coupon_code']) if pd.notna(row['coupon_code']) else None
                             else:
                                 # Create new sale
-                                print(f"Creating new sale: {row['order_no']}")
+                                logger.debug(f"Creating new sale: {row['order_no']}")
                                 sale = Sales(
                                     order_no=str(row['order_no']),
                                     customer_id=customer.id,
@@ -502,16 +509,31 @@ def init_upload_routes(app):
                                 db.session.add(sale)
                         
                     except Exception as e:
-                        print(f"Error processing row: {row}")
-                        print(f"Error details: {str(e)}")
+                        logger.error(f"Error processing sales row: {str(e)}")
+                        logger.debug(f"Row: {row}")
                         db.session.rollback()
                         continue
 
                 db.session.commit()
+
+                # Split the service and tag columns of every order in this file
+                dimension_service.refresh_orders(df['order_no'].dropna().astype(str))
+
+                # Refresh the customer balance facts for everyone in this file
+                customer_codes = df['customer_code'].dropna().astype(str).unique().tolist()
+                customer_ids = []
+                for offset in range(0, len(customer_codes), 500):
+                    customer_ids.extend(
+                        customer_id for (customer_id,) in db.session.query(Customer.id).filter(
+                            Customer.customer_code.in_(customer_codes[offset:offset + 500])
+                        )
+                    )
+                fact_service.refresh_customers(customer_ids)
+                db.session.commit()
                 return jsonify({'message': 'Customer and sales data imported successfully'}), 200
                 
         except Exception as e:
-            print(f"Main error: {str(e)}")
+            logger.exception(f"Error importing orders: {str(e)}")
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
@@ -540,25 +562,36 @@ def init_upload_routes(app):
             df = df.apply(lambda x: x.str.strip() if isinstance(x, str) else x)
             
             # Process each row
-            transactions = []
-            for _, row in df.iterrows():
-                transaction = process_payment_row(row)
-                if transaction:
-                    transactions.append(transaction)
+            records = [record for record in map(process_payment_row, (row for _, row in df.iterrows())) if record]
             
-            # Bulk save transactions
-            if transactions:
-                db.session.bulk_save_objects(transactions)
+            # Validate the whole batch at once, then bulk insert the valid rows
+            skipped = 0
+            if records:
+                transactions = pd.DataFrame(records)
+                errors = validate_frame(transactions)
+                invalid = errors.notna()
+                skipped = int(invalid.sum())
+                for index in errors[invalid].index:
+                    logger.warning(f"Skipping invalid payment {records[index]['order_no']}: {errors[index]}")
+                records = [record for record, bad in zip(records, invalid) if not bad]
+
+            if records:
+                db.session.bulk_insert_mappings(Accounts, records)
+                fact_service.refresh_dates(record['transaction_date'] for record in records)
+                fact_service.refresh_orders(record['order_no'] for record in records)
                 db.session.commit()
                 
+            message = f'Successfully processed {len(records)} transactions'
+            if skipped:
+                message += f' ({skipped} invalid rows skipped)'
             return jsonify({
                 'success': True,
-                'message': f'Successfully processed {len(transactions)} transactions'
+                'message': message
             })
             
         except Exception as e:
             db.session.rollback()
-            print(f"Error in upload_payments: {str(e)}")
+            logger.exception(f"Error in upload_payments: {str(e)}")
             return jsonify({'error': str(e)}), 500
 
 def map_payment_mode(mode):
@@ -619,8 +652,8 @@ def process_payments(df):
             payments.append(payment)
 
         except Exception as e:
-            print(f"Error processing payment row: {row}")
-            print(f"Error details: {str(e)}")
+            logger.error(f"Error processing payment row: {str(e)}")
+            logger.debug(f"Row: {row}")
             db.session.rollback()
             continue
 
@@ -650,8 +683,8 @@ def process_orders(df):
             orders.append(order)
 
         except Exception as e:
-            print(f"Error processing order row: {row}")
-            print(f"Error details: {str(e)}")
+            logger.error(f"Error processing order row: {str(e)}")
+            logger.debug(f"Row: {row}")
             continue
 
     return orders
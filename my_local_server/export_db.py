@@ -1,28 +1,55 @@
+import argparse
 import sqlite3
 import os
+from services.backup_service import BackupService
 
-def export_db():
-    # Source database path
-    src_db = "instance/database.db"
-    # Backup file path
-    backup_file = "database_backup.sql"
-    
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, 'instance', 'database.db')
+BACKUP_DIR = os.getenv('BACKUP_FOLDER', os.path.join(current_dir, 'backups'))
+
+def export_db(keep=7):
+    """Write a compressed, checksummed online backup of the database"""
     try:
-        # Connect to the database
-        conn = sqlite3.connect(src_db)
-        
-        # Open backup file
-        with open(backup_file, 'w') as f:
-            # Iterate over the dump
+        backup = BackupService(DB_PATH, BACKUP_DIR, keep=keep).create_backup()
+        print(f"Database backed up to {os.path.join(BACKUP_DIR, backup['name'])}")
+        print(f"Size: {backup['size']} bytes, SHA-256: {backup['sha256']}")
+    except Exception as e:
+        print(f"Error backing up database: {str(e)}")
+
+def export_sql(backup_file=os.path.join(current_dir, 'database_backup.sql')):
+    """Write a plain SQL text dump (readable by import_db.py)"""
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_PATH)
+
+        with open(backup_file, 'w', encoding='utf-8') as f:
             for line in conn.iterdump():
                 f.write('%s\n' % line)
-        
+
         print(f"Database successfully exported to {backup_file}")
-        
+
+        # Make sure the dump loads back into the same rows import_db.py would restore
+        check = BackupService(DB_PATH, BACKUP_DIR).check_sql_dump(backup_file)
+        if check['mismatches']:
+            for table, (live, restored) in sorted(check['mismatches'].items()):
+                print(f"Round-trip mismatch in {table}: {live} rows in the database, {restored} in the dump")
+        else:
+            print(f"Round-trip check passed for {check['tables']} tables")
+
     except Exception as e:
         print(f"Error exporting database: {str(e)}")
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 if __name__ == "__main__":
-    export_db() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Back up the accounting database')
+    parser.add_argument('--sql', action='store_true', help='Write a plain SQL dump instead of a compressed backup')
+    parser.add_argument('--keep', type=int, default=int(os.getenv('BACKUP_KEEP', 7)),
+                        help='Number of compressed backups to retain')
+    args = parser.parse_args()
+
+    if args.sql:
+        export_sql()
+    else:
+        export_db(keep=args.keep)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from functools import wraps
+from flask import request, make_response, Response
+from services.version_service import TableVersionService, DATABASE_EPOCH
+
+
+def etag_cached(*tables, key=None, cache_control='private, no-cache'):
+    """
+    Conditional GET support driven by table change counters.
+
+    The weak ETag combines the path, query string, the database epoch (which
+    changes when a backup or dump is restored) and the current version of
+    every table the response is built from, plus key() when the response
+    also depends on something else (such as today's date). A request whose
+    If-None-Match still matches gets a 304 without running the view.
+
+    Args:
+        tables (str): Tables (as named in table_version) the response reads
+        key (callable, optional): Extra value to fold into the ETag
+        cache_control (str): Cache-Control header for 200 and 304 responses
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            versions = TableVersionService().get_versions([*tables, DATABASE_EPOCH])
+            if any(version is None for version in versions.values()):
+                # Untracked table: no safe validator, always build the response
+                return f(*args, **kwargs)
+
+            parts = [request.path, request.query_string.decode(), json.dumps(versions, sort_keys=True)]
+            if key:
+                parts.append(str(key()))
+            etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20]
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return decorated_function
+    return decorator
+
+
+class StaticPayload:
+    """A JSON body computed once per process, served with a strong ETag"""
+
+    def __init__(self, data, max_age=86400):
+        self.body = json.dumps(data, separators=(',', ':'))
+        self.etag = hashlib.sha1(self.body.encode()).hexdigest()[:20]
+        self.max_age = max_age
+
+    def response(self):
+        if request.if_none_match.contains(self.etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
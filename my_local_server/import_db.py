@@ -1,64 +1,70 @@
-import sqlite3
+import argparse
 import os
+from services.backup_service import BackupService
 
-def import_database():
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, 'instance', 'database.db')
+BACKUP_DIR = os.getenv('BACKUP_FOLDER', os.path.join(current_dir, 'backups'))
+
+def rebuild_search_index():
+    """Recreate the full-text indexes a SQL dump leaves out and fill them from their tables"""
+    # Imported here so the app binds to the restored database
+    from app import app
+    from services.search_service import SearchService
+
+    with app.app_context():
+        # The restored database has no *_fts tables, so ensure_index creates
+        # each one with its triggers and runs the FTS 'rebuild' to fill it
+        SearchService().ensure_index()
+    print("Rebuilt the search index")
+
+def import_database(source=None):
+    """
+    Restore the database from a compressed backup or a SQL dump.
+
+    The restored copy is built and checked in a temporary file and renamed
+    over instance/database.db only once it is complete, so a failed restore
+    leaves the existing database untouched. Stop the app before restoring.
+
+    Args:
+        source (str): Path to a .db.gz/.db.zst backup or a .sql dump;
+            defaults to database_backup.sql next to this script
+    """
     try:
-        # Get the absolute path to the database file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        instance_dir = os.path.join(current_dir, 'instance')
-        db_path = os.path.join(instance_dir, 'database.db')
-        backup_path = os.path.join(current_dir, 'database_backup.sql')
-        
+        source = source or os.path.join(current_dir, 'database_backup.sql')
+
         # Create instance directory if it doesn't exist
-        os.makedirs(instance_dir, exist_ok=True)
-        
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Read the SQL file with error handling for different encodings
-        encodings_to_try = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        sql_commands = None
-        
-        for encoding in encodings_to_try:
-            try:
-                with open(backup_path, 'r', encoding=encoding) as f:
-                    sql_commands = f.read()
-                break  # If successful, break the loop
-            except UnicodeDecodeError:
-                continue
-        
-        if sql_commands is None:
-            raise Exception("Could not decode the SQL file with any of the attempted encodings")
-        
-        # Split and execute commands
-        # Split on semicolon but ignore semicolons inside quotes
-        import re
-        commands = re.split(r';(?=(?:[^\']*\'[^\']*\')*[^\']*$)', sql_commands)
-        
-        for command in commands:
-            command = command.strip()
-            if command:
-                try:
-                    cursor.execute(command)
-                except sqlite3.Error as e:
-                    print(f"Error executing command: {command[:100]}...")
-                    print(f"Error message: {str(e)}")
-                    continue
-        
-        # Commit changes and close connection
-        conn.commit()
-        conn.close()
-        
-        print(f"Database successfully imported to {db_path}")
-        return db_path
-        
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+        service = BackupService(DB_PATH, BACKUP_DIR)
+        if source.endswith(('.gz', '.zst')):
+            service.restore_backup(source)
+        else:
+            result = service.restore_sql_dump(source)
+            print(f"Loaded {result['statements']} statements and {result['indexes']} indexes")
+            rebuild_search_index()
+
+        print(f"Database successfully imported to {DB_PATH}")
+        return DB_PATH
+
     except Exception as e:
         raise Exception(f"Error importing database: {str(e)}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Restore the accounting database')
+    parser.add_argument('source', nargs='?', help='Backup (.db.gz/.db.zst) or SQL dump to restore')
+    parser.add_argument('--latest', action='store_true', help='Restore the newest backup in the backup folder')
+    args = parser.parse_args()
+
     try:
-        db_path = import_database()
+        source = args.source
+        if args.latest:
+            backups = BackupService(DB_PATH, BACKUP_DIR).list_backups()
+            if not backups:
+                raise Exception(f"No backups found in {BACKUP_DIR}")
+            source = os.path.join(BACKUP_DIR, backups[0]['name'])
+
+        db_path = import_database(source)
         print(f"Database path: {db_path}")
     except Exception as e:
-        print(f"Error: {str(e)}") 
\ No newline at end of file
+        print(f"Error: {str(e)}")
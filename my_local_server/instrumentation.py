@@ -0,0 +1,245 @@
+import cProfile
+import io
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import g, has_request_context, request, session
+from sqlalchemy import event
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _describe_parameters(parameters, executemany):
+    """Parameter count and types only, so slow-query logs never hold user data"""
+    rows = parameters if executemany else [parameters]
+    first = rows[0] if rows else ()
+    values = first.values() if isinstance(first, dict) else (first or ())
+    types = ', '.join(type(value).__name__ for value in values)
+    description = f"{len(values)} params ({types})" if values else "0 params"
+    if executemany:
+        description = f"{len(rows)} rows x {description}"
+    return description
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty sequence"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class EndpointStats:
+    """Running totals for one endpoint; recent durations are kept for percentiles"""
+
+    def __init__(self, keep=500):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.recent = deque(maxlen=keep)
+
+    def add(self, duration_ms, queries, sql_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.queries += queries
+        self.sql_ms += sql_ms
+        self.recent.append(duration_ms)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 1),
+            'p50_ms': round(_percentile(self.recent, 0.5), 1),
+            'p95_ms': round(_percentile(self.recent, 0.95), 1),
+            'max_ms': round(self.max_ms, 1),
+            'avg_queries': round(self.queries / self.count, 1),
+            'avg_sql_ms': round(self.sql_ms / self.count, 1),
+            'total_ms': round(self.total_ms, 1)
+        }
+
+
+class PerfMonitor:
+    """
+    Per-request timing and SQL statistics for the Flask app.
+
+    SQLAlchemy cursor events count and time every statement; statements
+    slower than slow_query_ms are kept with the count and types of their
+    bound parameters (the values only with log_parameters, for debugging). Each
+    response gets a Server-Timing header (app, db) and is added to the
+    per-endpoint totals shown on /admin/perf; streamed responses (CSV
+    exports) are added when the response is closed, so their totals cover
+    the whole body.
+
+    A sample of requests (profile_rate, or ?_profile=1 from an admin) runs
+    under cProfile and keeps the top functions by cumulative time.
+
+    Everything is held in memory for this process only.
+    """
+
+    def __init__(self, slow_query_ms=100, profile_rate=0.0, keep=100, log_parameters=False):
+        """
+        Args:
+            slow_query_ms (float): Statements taking longer than this are logged
+            profile_rate (float): Fraction of requests to profile, 0 to 1
+            keep (int): Number of slow queries and profiles to keep
+            log_parameters (bool): Keep bound parameter values of slow queries
+                instead of their count and types; they can include phone
+                numbers and password hashes, so only for local debugging
+        """
+        self.slow_query_ms = slow_query_ms
+        self.log_parameters = log_parameters
+        self.profile_rate = profile_rate
+        self.started_at = datetime.utcnow()
+        self.endpoints = {}
+        self.slow_queries = deque(maxlen=keep)
+        self.profiles = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Register the request hooks and the engine's cursor events"""
+        self.slow_query_ms = app.config.get('SLOW_QUERY_MS', self.slow_query_ms)
+        self.profile_rate = app.config.get('PROFILE_SAMPLE_RATE', self.profile_rate)
+        self.log_parameters = app.config.get('SLOW_QUERY_LOG_PARAMETERS', self.log_parameters)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.extensions['perf_monitor'] = self
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('perf_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('perf_query_start')
+        if not starts:
+            return
+        started = starts.pop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        path = None
+        if has_request_context():
+            g.perf_queries = g.get('perf_queries', 0) + 1
+            g.perf_sql_ms = g.get('perf_sql_ms', 0.0) + duration_ms
+            path = request.path
+
+        if duration_ms >= self.slow_query_ms:
+            if self.log_parameters:
+                described = repr(parameters)[:500]
+            else:
+                described = _describe_parameters(parameters, executemany)
+            entry = {
+                'at': datetime.utcnow().isoformat(timespec='seconds'),
+                'duration_ms': round(duration_ms, 1),
+                'path': path,
+                'statement': _WHITESPACE.sub(' ', statement).strip(),
+                'parameters': described,
+                'executemany': executemany
+            }
+            self.slow_queries.append(entry)
+            logger.warning(f"Slow query ({entry['duration_ms']}ms) on {path}: {entry['statement'][:200]} {entry['parameters']}")
+
+    def _should_profile(self):
+        if request.args.get('_profile') and session.get('role') == 'admin':
+            return True
+        return self.profile_rate > 0 and random.random() < self.profile_rate
+
+    def _before_request(self):
+        g.perf_start = time.perf_counter()
+        g.perf_queries = 0
+        g.perf_sql_ms = 0.0
+        if self._should_profile():
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.perf_profiler = profiler
+            except ValueError:
+                # Another profiler is already active on this thread
+                pass
+
+    def _after_request(self, response):
+        if 'perf_start' not in g:
+            return response
+        key = f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+        full_path = request.full_path.rstrip('?')
+        profiler = g.pop('perf_profiler', None)
+
+        if response.is_streamed:
+            # The body (and its queries) is produced after this hook returns;
+            # record once the server has sent it and closed the response.
+            # Headers are already gone by then, so there is no Server-Timing.
+            perf = g._get_current_object()
+            response.call_on_close(lambda: self._record(key, full_path, perf, profiler))
+            return response
+
+        duration_ms, queries, sql_ms = self._record(key, full_path, g, profiler)
+        response.headers.add(
+            'Server-Timing',
+            f'app;dur={duration_ms:.1f}, db;dur={sql_ms:.1f};desc="{queries} queries"'
+        )
+        return response
+
+    def _record(self, key, full_path, perf, profiler):
+        """Add one finished request to the endpoint totals; perf is the request's g"""
+        duration_ms = (time.perf_counter() - perf.perf_start) * 1000
+        queries = perf.get('perf_queries', 0)
+        sql_ms = perf.get('perf_sql_ms', 0.0)
+
+        if profiler is not None:
+            profiler.disable()
+            self._keep_profile(profiler, full_path, duration_ms)
+
+        with self._lock:
+            if key not in self.endpoints:
+                self.endpoints[key] = EndpointStats()
+            self.endpoints[key].add(duration_ms, queries, sql_ms)
+        return duration_ms, queries, sql_ms
+
+    def _keep_profile(self, profiler, full_path, duration_ms):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+        self.profiles.append({
+            'at': datetime.utcnow().isoformat(timespec='seconds'),
+            'path': full_path,
+            'duration_ms': round(duration_ms, 1),
+            'stats': output.getvalue()
+        })
+
+    def snapshot(self):
+        """Endpoint totals (slowest total time first), slow queries and profiles, newest first"""
+        with self._lock:
+            endpoints = [
+                {'endpoint': key, **stats.to_dict()}
+                for key, stats in self.endpoints.items()
+            ]
+        endpoints.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return {
+            'since': self.started_at.isoformat(timespec='seconds'),
+            'slow_query_ms': self.slow_query_ms,
+            'profile_rate': self.profile_rate,
+            'endpoints': endpoints,
+            'slow_queries': list(reversed(self.slow_queries)),
+            'profiles': list(reversed(self.profiles))
+        }
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.slow_queries.clear()
+            self.profiles.clear()
+            self.started_at = datetime.utcnow()
+
+
+def init_instrumentation(app):
+    """Attach a PerfMonitor to the app and return it"""
+    monitor = PerfMonitor()
+    monitor.init_app(app)
+    return monitor
@@ -0,0 +1,58 @@
+from datetime import date
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; Flask's json module is used without it
+    orjson = None
+
+
+def _default(o):
+    """Types orjson does not encode natively"""
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, date):
+        # pandas Timestamp and other datetime subclasses; NaT is not a real date
+        return o.isoformat() if o == o else None
+    return DefaultJSONProvider.default(o)
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """Flask's provider, but with isoformat dates and numeric Decimals"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(IsoJSONProvider):
+    """
+    JSON provider backed by orjson.
+
+    datetime, date and numpy values are encoded natively (datetimes as
+    isoformat strings, like the hand-written routes produce) and Decimal as
+    a number. jsonify() builds the response body directly from orjson's
+    bytes. Keys are not sorted.
+    """
+
+    option = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Callers asking for json.dumps options (indent, sort_keys, ...) get them
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=self.option)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Use the orjson provider when orjson is installed, Flask's json otherwise"""
+    app.json = OrjsonProvider(app) if orjson is not None else IsoJSONProvider(app)
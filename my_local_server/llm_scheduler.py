@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import httpx
+
+
+class FairSemaphore:
+    """
+    Semaphore that hands free slots to waiting users in round-robin order.
+
+    A user who fans out several calls at once only gets one of the next free
+    slots; the others go to whoever else is waiting. Must only be used from
+    the event loop that owns it.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._waiters = OrderedDict()  # user key -> deque of futures
+
+    async def acquire(self, key):
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed to us just before cancellation
+                self.release()
+            else:
+                queue = self._waiters.get(key)
+                if queue and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiters[key]
+            raise
+
+    def release(self):
+        while self._waiters:
+            key, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            # Move this user to the back of the line
+            del self._waiters[key]
+            if queue:
+                self._waiters[key] = queue
+            if not future.done():
+                # Hand the slot over directly, the active count is unchanged
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, key):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @property
+    def waiting(self):
+        return sum(len(queue) for queue in self._waiters.values())
+
+
+class AgentScheduler:
+    """
+    Runs agent coroutines on one shared background event loop.
+
+    All LLM calls made through agents bound to this scheduler share a single
+    async HTTP client and a FairSemaphore that bounds concurrent requests to
+    the local LM Studio server. Flask views either block on run() or submit()
+    a job and let the client poll get_job().
+    """
+
+    def __init__(self, max_concurrency=2, job_ttl=600):
+        """
+        Args:
+            max_concurrency (int): Maximum concurrent requests to LM Studio
+            job_ttl (int): Seconds finished jobs are kept for polling
+        """
+        self.max_concurrency = max_concurrency
+        self.job_ttl = job_ttl
+        self.loop = None
+        self.limiter = None
+        self.http_client = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Start the background loop on first use"""
+        with self._lock:
+            if self.loop is not None:
+                return
+            ready = threading.Event()
+
+            def run_loop():
+                self.loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self.loop)
+                self.limiter = FairSemaphore(self.max_concurrency)
+                self.http_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(300.0, connect=10.0),
+                    limits=httpx.Limits(max_connections=self.max_concurrency * 2)
+                )
+                ready.set()
+                self.loop.run_forever()
+
+            threading.Thread(target=run_loop, name='agent-scheduler', daemon=True).start()
+            ready.wait()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the scheduler loop and wait for its result"""
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout)
+
+    def submit(self, user_key, coro):
+        """
+        Run a coroutine in the background without blocking the caller.
+
+        Returns:
+            str: Job ID to pass to get_job()
+        """
+        self._ensure_loop()
+        self._purge_jobs()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'user': user_key,
+            'status': 'running',
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+
+        def on_done(future):
+            try:
+                job['result'] = future.result()
+                job['status'] = 'done'
+            except Exception as e:
+                job['error'] = str(e)
+                job['status'] = 'error'
+            job['finished_at'] = time.time()
+
+        asyncio.run_coroutine_threadsafe(coro, self.loop).add_done_callback(on_done)
+        return job_id
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purge_jobs(self):
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            for job_id in [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] and job['finished_at'] < cutoff
+            ]:
+                del self._jobs[job_id]
@@ -1,9 +1,16 @@
 import requests
+import httpx
+import asyncio
 import json
+import logging
 import time
+from agent_tracing import AgentTracer
+
+logger = logging.getLogger(__name__)
 
 class LMStudioAgent:
-    def __init__(self, base_url=None, port=None, max_retries=3, retry_delay=2):
+    def __init__(self, base_url=None, port=None, max_retries=3, retry_delay=2,
+                 scheduler=None, user_key=None):
         """
         Initialize the LM Studio agent with the base URL of the LM Studio server.
         
@@ -12,6 +19,9 @@ class LMStudioAgent:
             port (int, optional): Port number (default: 1234)
             max_retries (int): Maximum number of connection retry attempts
             retry_delay (int): Delay between retries in seconds
+            scheduler (AgentScheduler, optional): Shared scheduler providing the async
+                HTTP client and the concurrency limit for the async methods
+            user_key (str, optional): Key used to queue this agent's calls fairly
         """
         if port is not None and base_url is not None:
             self.base_url = f"{base_url.rstrip('/')}:{port}/v1"
@@ -27,9 +37,17 @@ class LMStudioAgent:
         self.headers = {
             "Content-Type": "application/json"
         }
+        self.scheduler = scheduler
+        self.user_key = user_key or "anonymous"
+        self._connection_checked = False
+        self.tracer = AgentTracer()
         
     def check_connection(self):
         """Check if LM Studio server is running and accessible"""
+        with self.tracer.span('check'):
+            return self._check_connection()
+
+    def _check_connection(self):
         for attempt in range(self.max_retries):
             try:
                 # Try direct chat completion endpoint first
@@ -46,8 +64,10 @@ class LMStudioAgent:
                 return True
             except requests.exceptions.RequestException as e:
                 if attempt < self.max_retries - 1:
-                    print(f"Connection attempt {attempt + 1} failed. Retrying in {self.retry_delay} seconds...")
-                    print(f"Attempted URL: {test_url}")
+                    logger.warning(
+                        f"Connection attempt {attempt + 1} to {test_url} failed. "
+                        f"Retrying in {self.retry_delay} seconds..."
+                    )
                     time.sleep(self.retry_delay)
                 else:
                     raise Exception(
@@ -61,7 +81,7 @@ class LMStudioAgent:
                     )
 
     def chat_completion(self, messages, model="local-model", 
-                       temperature=0.7, max_tokens=2000):
+                       temperature=0.7, max_tokens=2000, span_name="generate"):
         """
         Send a chat completion request to LM Studio.
         
@@ -70,6 +90,7 @@ class LMStudioAgent:
             model (str): Model identifier (default: "local-model")
             temperature (float): Sampling temperature (0.0 to 1.0)
             max_tokens (int): Maximum number of tokens to generate
+            span_name (str): Name of the trace span recording this call
             
         Returns:
             dict: The response from LM Studio
@@ -87,21 +108,25 @@ class LMStudioAgent:
         }
 
         try:
-            response = requests.post(endpoint, 
-                                  headers=self.headers, 
-                                  json=payload)
-            response.raise_for_status()
-            return response.json()
+            with self.tracer.span(span_name, prompt_chars=self._prompt_chars(messages)) as span:
+                response = requests.post(endpoint, 
+                                      headers=self.headers, 
+                                      json=payload)
+                response.raise_for_status()
+                result = response.json()
+                span.record_usage(result.get('usage'))
+            return result
         except requests.exceptions.RequestException as e:
             raise Exception(f"Error communicating with LM Studio: {str(e)}")
 
-    def simple_chat(self, message, system_prompt=None):
+    def simple_chat(self, message, system_prompt=None, span_name="generate"):
         """
         Simple interface for single-message chat interactions.
         
         Args:
             message (str): User message
             system_prompt (str, optional): System prompt to set context
+            span_name (str): Name of the trace span recording this call
             
         Returns:
             str: The model's response text
@@ -112,7 +137,107 @@ class LMStudioAgent:
         messages.append({"role": "user", "content": message})
 
         try:
-            response = self.chat_completion(messages)
+            response = self.chat_completion(messages, span_name=span_name)
+            return response['choices'][0]['message']['content']
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    async def acheck_connection(self, client):
+        """Async variant of check_connection, performed once per agent"""
+        if self._connection_checked:
+            return True
+
+        with self.tracer.span('check'):
+            return await self._acheck_connection(client)
+
+    async def _acheck_connection(self, client):
+        test_url = f"{self.base_url}/models"
+        for attempt in range(self.max_retries):
+            try:
+                response = await client.get(test_url, headers=self.headers)
+                response.raise_for_status()
+                self._connection_checked = True
+                return True
+            except httpx.HTTPError as e:
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay)
+                else:
+                    raise Exception(
+                        "Could not connect to LM Studio. Please ensure that:\n"
+                        "1. LM Studio is running\n"
+                        "2. A model is loaded\n"
+                        "3. The Runtime is selected in Settings\n"
+                        f"4. The server URL is correct (trying: {test_url})\n"
+                        "5. No firewall is blocking the connection\n\n"
+                        f"Error details: {str(e)}"
+                    )
+
+    def _run_blocking(self, coro):
+        """
+        Run a coroutine to completion from synchronous code.
+
+        With a scheduler the coroutine runs on its shared loop, where the
+        limiter and HTTP client live; asyncio.run is only used without one.
+        """
+        if self.scheduler is None:
+            return asyncio.run(coro)
+        return self.scheduler.run(coro)
+
+    async def achat_completion(self, messages, model="local-model",
+                               temperature=0.7, max_tokens=2000, span_name="generate"):
+        """
+        Async variant of chat_completion.
+
+        Uses the scheduler's shared HTTP client and waits for a fair slot on the
+        LM Studio server, so concurrent users and fanned-out sub-analyses never
+        exceed the configured concurrency limit.
+
+        Returns:
+            dict: The response from LM Studio
+        """
+        if self.scheduler is None:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=10.0)) as client:
+                return await self._apost_completion(client, messages, model, temperature, max_tokens, span_name)
+
+        async with self.scheduler.limiter.slot(self.user_key):
+            return await self._apost_completion(
+                self.scheduler.http_client, messages, model, temperature, max_tokens, span_name
+            )
+
+    async def _apost_completion(self, client, messages, model, temperature, max_tokens, span_name):
+        await self.acheck_connection(client)
+
+        payload = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+        try:
+            with self.tracer.span(span_name, prompt_chars=self._prompt_chars(messages)) as span:
+                response = await client.post(f"{self.base_url}/chat/completions",
+                                             headers=self.headers,
+                                             json=payload)
+                response.raise_for_status()
+                result = response.json()
+                span.record_usage(result.get('usage'))
+            return result
+        except httpx.HTTPError as e:
+            raise Exception(f"Error communicating with LM Studio: {str(e)}")
+
+    async def asimple_chat(self, message, system_prompt=None, span_name="generate"):
+        """Async variant of simple_chat"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": message})
+
+        try:
+            response = await self.achat_completion(messages, span_name=span_name)
             return response['choices'][0]['message']['content']
         except Exception as e:
-            return f"Error: {str(e)}" 
\ No newline at end of file
+            return f"Error: {str(e)}"
+
+    def _prompt_chars(self, messages):
+        return sum(len(m.get('content') or '') for m in messages)
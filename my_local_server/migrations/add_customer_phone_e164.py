@@ -0,0 +1,37 @@
+from app import app
+from extensions import db
+from sqlalchemy import text
+from phone_numbers import normalize_phone
+
+def add_customer_phone_e164():
+    with app.app_context():
+        try:
+            columns = [row[1] for row in db.session.execute(text("PRAGMA table_info(customer)"))]
+            if 'phone_e164' not in columns:
+                db.session.execute(text("ALTER TABLE customer ADD COLUMN phone_e164 VARCHAR(16)"))
+                print("Added phone_e164 column to customer table")
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_customer_phone_e164 ON customer (phone_e164)"
+            ))
+
+            # Backfill from the free-text phone column
+            rows = db.session.execute(text("SELECT id, phone FROM customer")).all()
+            updates = [
+                {'id': customer_id, 'phone_e164': normalize_phone(phone)}
+                for customer_id, phone in rows
+            ]
+            for offset in range(0, len(updates), 1000):
+                db.session.execute(
+                    text("UPDATE customer SET phone_e164 = :phone_e164 WHERE id = :id"),
+                    updates[offset:offset + 1000]
+                )
+            db.session.commit()
+
+            normalized = sum(1 for update in updates if update['phone_e164'])
+            print(f"Normalized {normalized} of {len(updates)} customer phone numbers")
+        except Exception as e:
+            print(f"Error adding phone_e164 column: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    add_customer_phone_e164()
@@ -0,0 +1,96 @@
+from app import app, db_path
+from extensions import db
+from sqlalchemy import text
+from models import Accounts, AccountsArchive, Sales, DailyBalance
+from money import Money
+from services.backup_service import BackupService
+from services.fact_service import FactTableService, FACT_VIEWS
+from services.search_service import SearchService
+from services.version_service import TableVersionService
+
+MONEY_MODELS = [Accounts, AccountsArchive, Sales, DailyBalance]
+
+
+def _money_columns(model):
+    return [column.name for column in model.__table__.columns if isinstance(column.type, Money)]
+
+
+def _declared_types(conn, table):
+    return {row[1]: (row[2] or '').upper() for row in conn.execute(text(f'PRAGMA table_info({table})'))}
+
+
+def _convert_table(conn, model):
+    """
+    Rebuild one table with INTEGER money columns, converting rupees to paise.
+
+    SQLite cannot change a column's type in place, so the table is renamed,
+    recreated from the model and copied across. Triggers and indexes on the
+    old table are dropped first; the services recreate them afterwards.
+    """
+    table = model.__table__.name
+    old_types = _declared_types(conn, table)
+    money = _money_columns(model)
+    if not old_types:
+        return False
+    if all(old_types.get(column) == 'INTEGER' for column in money):
+        print(f"{table}: already in paise")
+        return False
+
+    for kind in ('trigger', 'index'):
+        names = conn.execute(text(
+            f"SELECT name FROM sqlite_master WHERE type = '{kind}' AND tbl_name = :table AND sql IS NOT NULL"
+        ), {'table': table}).scalars().all()
+        for name in names:
+            conn.execute(text(f'DROP {kind.upper()} {name}'))
+
+    conn.execute(text(f'ALTER TABLE {table} RENAME TO {table}_before_paise'))
+    model.__table__.create(conn)
+
+    # Keep columns added outside the model (e.g. by earlier migrations)
+    new_columns = set(_declared_types(conn, table))
+    for column, declared in old_types.items():
+        if column not in new_columns:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {declared}'))
+
+    columns = list(old_types)
+    # Round off float noise before rounding half away from zero: 0.285 -> 29 paise
+    values = [
+        f'CAST(ROUND(ROUND({column} * 100, 6)) AS INTEGER)' if column in money else column
+        for column in columns
+    ]
+    count = conn.execute(text(
+        f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {table}_before_paise"
+    )).rowcount
+    conn.execute(text(f'DROP TABLE {table}_before_paise'))
+    print(f"{table}: converted {count} rows ({', '.join(money)})")
+    return True
+
+
+def convert_money_to_paise():
+    with app.app_context():
+        try:
+            db.create_all()
+            backup = BackupService(db_path, app.config['BACKUP_FOLDER'], keep=app.config['BACKUP_KEEP']).create_backup()
+            print(f"Backed up the database to {backup['name']}")
+
+            with db.engine.begin() as conn:
+                # Rename without rewriting references to the table in other tables and views
+                conn.execute(text('PRAGMA legacy_alter_table = ON'))
+                for view in FACT_VIEWS:
+                    conn.execute(text(f'DROP VIEW IF EXISTS {view}'))
+                converted = [model.__table__.name for model in MONEY_MODELS if _convert_table(conn, model)]
+
+            FactTableService().ensure_views()
+            search_service = SearchService()
+            search_service.ensure_index()
+            search_service.rebuild()
+            TableVersionService().ensure_tracking()
+            if converted:
+                FactTableService().rebuild()
+            print(f"Converted money columns to paise in: {', '.join(converted) or 'nothing to do'}")
+        except Exception as e:
+            print(f"Error converting money columns: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    convert_money_to_paise()
@@ -0,0 +1,15 @@
+from app import app
+from extensions import db
+
+def create_accounts_archive():
+    with app.app_context():
+        try:
+            # Only creates missing tables, so existing data is untouched
+            db.create_all()
+            print("Created accounts_archive")
+        except Exception as e:
+            print(f"Error creating accounts_archive: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_accounts_archive()
@@ -0,0 +1,21 @@
+from app import app
+from extensions import db
+from services.fact_service import FactTableService
+from services.reconciliation_service import ReconciliationService
+
+def create_channel_balances():
+    with app.app_context():
+        try:
+            # Creates channel_balance and the daily_balances date index
+            db.create_all()
+            FactTableService().ensure_views()
+
+            ReconciliationService().rebuild()
+            db.session.commit()
+            print("Created and backfilled channel_balance from the ledger")
+        except Exception as e:
+            print(f"Error creating channel balances: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_channel_balances()
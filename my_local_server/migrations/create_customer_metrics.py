@@ -0,0 +1,20 @@
+from app import app
+from extensions import db
+from services.customer_metrics_service import CustomerMetricsService
+
+def create_customer_metrics():
+    with app.app_context():
+        try:
+            # Creates customer_metrics; outstanding is read from order_receivable,
+            # so run create_order_receivables.py first on older databases
+            db.create_all()
+
+            CustomerMetricsService().rebuild()
+            db.session.commit()
+            print("Created and backfilled customer_metrics from sales")
+        except Exception as e:
+            print(f"Error creating customer metrics: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_customer_metrics()
@@ -0,0 +1,22 @@
+from app import app
+from extensions import db
+from services.fact_service import FactTableService
+
+def create_fact_tables():
+    with app.app_context():
+        try:
+            # Create the fact tables, then the views and indexes on the existing tables
+            db.create_all()
+            fact_service = FactTableService()
+            fact_service.ensure_views()
+            print("Created fact tables, views and indexes")
+
+            # Backfill from the existing ledger
+            counts = fact_service.rebuild()
+            print(f"Backfilled facts for {counts['days']} days and {counts['customers']} customers")
+        except Exception as e:
+            print(f"Error creating fact tables: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_fact_tables()
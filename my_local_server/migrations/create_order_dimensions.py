@@ -0,0 +1,22 @@
+from app import app
+from extensions import db
+from services.fact_service import FactTableService
+from services.dimension_service import OrderDimensionService
+
+def create_order_dimensions():
+    with app.app_context():
+        try:
+            # Creates service, tag, order_service and order_tag; ensure_views
+            # adds the reverse lookup indexes
+            db.create_all()
+            FactTableService().ensure_views()
+
+            orders = OrderDimensionService().rebuild()
+            db.session.commit()
+            print(f"Parsed services and tags for {orders} orders")
+        except Exception as e:
+            print(f"Error creating order dimensions: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_order_dimensions()
@@ -0,0 +1,22 @@
+from app import app
+from extensions import db
+from services.fact_service import FactTableService
+from services.receivable_service import ReceivableService
+
+def create_order_receivables():
+    with app.app_context():
+        try:
+            # Creates order_receivable; ensure_views adds the accounts.order_no
+            # and open-receivable indexes to existing databases
+            db.create_all()
+            FactTableService().ensure_views()
+
+            ReceivableService().rebuild()
+            db.session.commit()
+            print("Created and backfilled order_receivable from sales and the ledger")
+        except Exception as e:
+            print(f"Error creating order receivables: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_order_receivables()
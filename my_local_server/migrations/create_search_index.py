@@ -0,0 +1,20 @@
+from app import app
+from extensions import db
+from services.search_service import SearchService, SEARCH_INDEXES
+
+def create_search_index():
+    with app.app_context():
+        try:
+            search_service = SearchService()
+            search_service.ensure_index()
+            print(f"Created search indexes: {', '.join(SEARCH_INDEXES)}")
+
+            # Repopulate in case the indexes already existed but drifted
+            search_service.rebuild()
+            print("Rebuilt search indexes from the customer, sales and accounts tables")
+        except Exception as e:
+            print(f"Error creating search indexes: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_search_index()
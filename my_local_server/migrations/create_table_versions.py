@@ -0,0 +1,16 @@
+from app import app
+from extensions import db
+from services.version_service import TableVersionService
+
+def create_table_versions():
+    with app.app_context():
+        try:
+            db.create_all()
+            TableVersionService().ensure_tracking()
+            print("Created table_version and the customer and employee version triggers")
+        except Exception as e:
+            print(f"Error creating table versions: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    create_table_versions()
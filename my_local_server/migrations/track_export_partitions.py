@@ -0,0 +1,23 @@
+from app import app
+from extensions import db
+from sqlalchemy import text
+from services.export_service import ExportService
+
+def track_export_partitions():
+    with app.app_context():
+        try:
+            # Watermarks are now per (entity, format) change versions; the old
+            # timestamp watermarks cannot be converted, so the next export of
+            # each entity is a full one
+            db.session.execute(text('DROP TABLE IF EXISTS export_watermark'))
+            db.session.commit()
+            db.create_all()
+
+            ExportService(app.config['EXPORT_FOLDER']).ensure_tracking()
+            print("Created export_partition_change and the accounts, sales and customer export triggers")
+        except Exception as e:
+            print(f"Error tracking export partitions: {str(e)}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    track_export_partitions()
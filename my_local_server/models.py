@@ -2,14 +2,9 @@ from datetime import datetime
 from extensions import db
 from sqlalchemy.sql import func
 from sqlalchemy.orm import validates
-from constants import (
-    TRANSACTION_TYPES,
-    INCOME_CATEGORIES,
-    EXPENSE_CATEGORIES,
-    PAYMENT_MODES,
-    PAYMENT_STATUSES,
-    ORDER_STATUSES
-)
+from phone_numbers import normalize_phone
+from validation import check_choice
+from money import Money
 from werkzeug.security import generate_password_hash, check_password_hash
 import re
 
@@ -19,6 +14,7 @@ class Customer(db.Model):
     name = db.Column(db.String(100), nullable=False)
     address = db.Column(db.String(200))
     phone = db.Column(db.String(20))
+    phone_e164 = db.Column(db.String(16), index=True)  # normalized from phone, for exact lookups
     preference = db.Column(db.String(200))
     gstin = db.Column(db.String(20))
     area_location = db.Column(db.String(100))
@@ -26,24 +22,29 @@ class Customer(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     orders = db.relationship('Sales', backref='customer', lazy=True)
 
+    @validates('phone')
+    def validate_phone(self, key, value):
+        self.phone_e164 = normalize_phone(value)
+        return value
+
 class Sales(db.Model):
     order_no = db.Column(db.String(50), primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
-    order_date = db.Column(db.DateTime, nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False, index=True)
+    order_date = db.Column(db.DateTime, nullable=False, index=True)
     due_date = db.Column(db.DateTime)
     last_activity = db.Column(db.DateTime)
     pieces = db.Column(db.Integer)
     weight = db.Column(db.Float)
-    gross_amount = db.Column(db.Float)
-    discount = db.Column(db.Float)
-    tax = db.Column(db.Float)
-    net_amount = db.Column(db.Float)
-    advance = db.Column(db.Float)
-    paid = db.Column(db.Float)
-    adjustment = db.Column(db.Float)
-    balance = db.Column(db.Float)
-    advance_received = db.Column(db.Float)
-    advance_used = db.Column(db.Float)
+    gross_amount = db.Column(Money)
+    discount = db.Column(Money)
+    tax = db.Column(Money)
+    net_amount = db.Column(Money)
+    advance = db.Column(Money)
+    paid = db.Column(Money)
+    adjustment = db.Column(Money)
+    balance = db.Column(Money)
+    advance_received = db.Column(Money)
+    advance_used = db.Column(Money)
     booked_by = db.Column(db.String(100))
     workshop_note = db.Column(db.Text)
     order_note = db.Column(db.Text)
@@ -65,13 +66,13 @@ class Sales(db.Model):
 
 class Accounts(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    transaction_date = db.Column(db.DateTime, nullable=False)
-    order_no = db.Column(db.String(50))
+    transaction_date = db.Column(db.DateTime, nullable=False, index=True)
+    order_no = db.Column(db.String(50), index=True)
     transaction_type = db.Column(db.String(50))
     category = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    tax_amount = db.Column(db.Float, default=0.0)
-    total_amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
+    tax_amount = db.Column(Money, default=0)
+    total_amount = db.Column(Money, nullable=False)
     payment_mode = db.Column(db.String(50))
     payment_status = db.Column(db.String(50), default='Completed')
     reference_no = db.Column(db.String(100))
@@ -105,30 +106,9 @@ class Accounts(db.Model):
             
         return income - expense 
 
-    @validates('transaction_type')
-    def validate_transaction_type(self, key, value):
-        if value not in TRANSACTION_TYPES:
-            raise ValueError(f"Invalid transaction type. Must be one of: {', '.join(TRANSACTION_TYPES)}")
-        return value
-
-    @validates('category')
-    def validate_category(self, key, value):
-        valid_categories = INCOME_CATEGORIES + EXPENSE_CATEGORIES
-        if value not in valid_categories:
-            raise ValueError(f"Invalid category. Must be one of: {', '.join(valid_categories)}")
-        return value
-
-    @validates('payment_mode')
-    def validate_payment_mode(self, key, value):
-        if value and value not in PAYMENT_MODES:
-            raise ValueError(f"Invalid payment mode. Must be one of: {', '.join(PAYMENT_MODES)}")
-        return value
-
-    @validates('payment_status')
-    def validate_payment_status(self, key, value):
-        if value not in PAYMENT_STATUSES:
-            raise ValueError(f"Invalid payment status. Must be one of: {', '.join(PAYMENT_STATUSES)}")
-        return value
+    @validates('transaction_type', 'category', 'payment_mode', 'payment_status')
+    def validate_choice(self, key, value):
+        return check_choice(key, value)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -182,13 +162,210 @@ class DailyBalance(db.Model):
     __tablename__ = 'daily_balances'
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False)
-    bank_balance = db.Column(db.Numeric(10, 2), nullable=False)
-    cash_in_hand = db.Column(db.Numeric(10, 2), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
+    bank_balance = db.Column(Money, nullable=False)
+    cash_in_hand = db.Column(Money, nullable=False)
     notes = db.Column(db.String(500))
     verified_by = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
-        return f'<DailyBalance {self.date}: Bank={self.bank_balance}, Cash={self.cash_in_hand}>'
\ No newline at end of file
+        return f'<DailyBalance {self.date}: Bank={self.bank_balance}, Cash={self.cash_in_hand}>'
+
+class FactDailyPnl(db.Model):
+    __tablename__ = 'fact_daily_pnl'
+
+    date = db.Column(db.Date, primary_key=True)
+    income = db.Column(db.Float, default=0.0)
+    expense = db.Column(db.Float, default=0.0)
+    transfer = db.Column(db.Float, default=0.0)
+    tax = db.Column(db.Float, default=0.0)
+    net = db.Column(db.Float, default=0.0)
+    transaction_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FactPaymentModeDaily(db.Model):
+    __tablename__ = 'fact_payment_mode_daily'
+
+    date = db.Column(db.Date, primary_key=True)
+    payment_mode = db.Column(db.String(50), primary_key=True)
+    transaction_type = db.Column(db.String(50), primary_key=True)
+    amount = db.Column(db.Float, default=0.0)
+    transaction_count = db.Column(db.Integer, default=0)
+
+class AgentTrace(db.Model):
+    __tablename__ = 'agent_trace'
+
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.String(32), index=True)
+    endpoint = db.Column(db.String(100))
+    user = db.Column(db.String(80))
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    duration_ms = db.Column(db.Float)
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    spans = db.relationship('AgentSpan', backref='trace', lazy=True)
+
+class AgentSpan(db.Model):
+    __tablename__ = 'agent_span'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trace_id = db.Column(db.Integer, db.ForeignKey('agent_trace.id'), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)  # check, schema, prompt, generate, sql, explain
+    offset_ms = db.Column(db.Float)
+    duration_ms = db.Column(db.Float)
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    prompt_chars = db.Column(db.Integer)
+    rows = db.Column(db.Integer)
+    error = db.Column(db.Text)
+
+class ChatSession(db.Model):
+    __tablename__ = 'chat_session'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    summary = db.Column(db.Text, default='')  # rolling summary of compacted messages
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    messages = db.relationship('ChatMessage', backref='session', lazy=True)
+
+class ChatMessage(db.Model):
+    __tablename__ = 'chat_message'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(32), db.ForeignKey('chat_session.id'), nullable=False, index=True)
+    role = db.Column(db.String(20), nullable=False)  # user, assistant
+    content = db.Column(db.Text, nullable=False)
+    token_estimate = db.Column(db.Integer)
+    result_id = db.Column(db.Integer, db.ForeignKey('chat_result.id'))
+    compacted = db.Column(db.Boolean, default=False, nullable=False)  # folded into the session summary
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChatResult(db.Model):
+    __tablename__ = 'chat_result'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(32), db.ForeignKey('chat_session.id'), nullable=False, index=True)
+    query = db.Column(db.Text)
+    row_count = db.Column(db.Integer)
+    columns = db.Column(db.Text)  # JSON list of column names
+    data = db.Column(db.Text)  # JSON rows
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExportWatermark(db.Model):
+    __tablename__ = 'export_watermark'
+
+    entity = db.Column(db.String(50), primary_key=True)  # accounts, sales, customers
+    format = db.Column(db.String(20), primary_key=True)  # parquet, feather
+    version = db.Column(db.Integer, nullable=False)  # export_partition_change versions after this are re-exported
+    row_count = db.Column(db.Integer)
+    exported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExportPartitionChange(db.Model):
+    __tablename__ = 'export_partition_change'
+
+    # Month partitions touched by inserts, updates or deletes; maintained by triggers
+    entity = db.Column(db.String(50), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM, or 'unknown' for rows without a date
+    version = db.Column(db.Integer, nullable=False)  # Increases with every change to the partition
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_version'
+
+    name = db.Column(db.String(50), primary_key=True)  # table whose changes are counted
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped by triggers on every write
+
+class AccountsArchive(db.Model):
+    __tablename__ = 'accounts_archive'
+
+    # Same columns as Accounts; id keeps the original transaction ID
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_date = db.Column(db.DateTime, nullable=False)
+    order_no = db.Column(db.String(50))
+    transaction_type = db.Column(db.String(50))
+    category = db.Column(db.String(100), nullable=False)
+    amount = db.Column(Money, nullable=False)
+    tax_amount = db.Column(Money, default=0)
+    total_amount = db.Column(Money, nullable=False)
+    payment_mode = db.Column(db.String(50))
+    payment_status = db.Column(db.String(50))
+    reference_no = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    is_reconciled = db.Column(db.Boolean)
+    created_at = db.Column(db.DateTime)
+    created_by = db.Column(db.String(100))
+    source = db.Column(db.String(50))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    archive_reason = db.Column(db.String(50))  # cleanup, bulk_delete
+
+class ChannelBalance(db.Model):
+    __tablename__ = 'channel_balance'
+
+    # One row per payment channel (cash, bank) and day with ledger activity
+    channel = db.Column(db.String(10), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    inflow = db.Column(Money, nullable=False, default=0)  # Income received that day
+    outflow = db.Column(Money, nullable=False, default=0)  # Expenses paid that day
+    net = db.Column(Money, nullable=False, default=0)
+    running_balance = db.Column(Money, nullable=False, default=0)  # Sum of net up to and including date
+
+class OrderReceivable(db.Model):
+    __tablename__ = 'order_receivable'
+
+    # One row per order, maintained by ReceivableService as sales and payments are imported
+    order_no = db.Column(db.String(50), db.ForeignKey('sales.order_no'), primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    area_location = db.Column(db.String(100))  # Copied from the customer for area aging
+    order_date = db.Column(db.DateTime)
+    due_date = db.Column(db.DateTime)
+    net_amount = db.Column(Money, nullable=False, default=0)
+    received = db.Column(Money, nullable=False, default=0)  # Income recorded against the order in Accounts
+    outstanding = db.Column(Money, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CustomerMetrics(db.Model):
+    __tablename__ = 'customer_metrics'
+
+    # Lifetime order figures per customer, maintained by CustomerMetricsService on import
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    first_order_date = db.Column(db.DateTime)
+    last_order_date = db.Column(db.DateTime, index=True)
+    total_net = db.Column(Money, nullable=False, default=0)
+    outstanding = db.Column(Money, nullable=False, default=0, index=True)  # Sum of order_receivable.outstanding
+    avg_ticket = db.Column(Money, nullable=False, default=0)  # total_net / order_count
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Service(db.Model):
+    __tablename__ = 'service'
+
+    # Interned service names parsed from Sales.primary_services and topup_service
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)  # Lowercased, single-spaced name
+    name = db.Column(db.String(100), nullable=False)  # First spelling seen
+
+class Tag(db.Model):
+    __tablename__ = 'tag'
+
+    # Interned tag names parsed from Sales.tags
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+
+class OrderService(db.Model):
+    __tablename__ = 'order_service'
+
+    order_no = db.Column(db.String(50), db.ForeignKey('sales.order_no'), primary_key=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True)  # primary, topup
+
+class OrderTag(db.Model):
+    __tablename__ = 'order_tag'
+
+    order_no = db.Column(db.String(50), db.ForeignKey('sales.order_no'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True)
@@ -0,0 +1,101 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import numbers
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.types import TypeDecorator, Integer
+
+PAISE = Decimal('0.01')
+
+
+def to_money(value):
+    """
+    Parse an amount into a Decimal rounded to whole paise (half up).
+
+    Accepts Decimal, int, float (by its shortest repr, so 0.285 is 0.29),
+    numpy numbers and numeric strings. None stays None.
+
+    Raises:
+        ValueError: If the value is not a finite number
+    """
+    if value is None:
+        return None
+    if isinstance(value, (float, np.floating)):
+        value = repr(float(value))
+    try:
+        amount = Decimal(value if isinstance(value, Decimal) else str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value!r}')
+    return amount.quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+def to_paise(value):
+    """Amount as an integer number of paise, or None"""
+    amount = to_money(value)
+    return None if amount is None else int(amount.scaleb(2))
+
+
+def from_paise(paise):
+    """
+    Integer paise as a two-place Decimal, or None.
+
+    Raises:
+        TypeError: If the value is not an integer. A float here is a rupee
+            amount from a column migrations/convert_money_to_paise.py has
+            not converted yet; scaling it would be 100x off.
+    """
+    if paise is None:
+        return None
+    if isinstance(paise, bool) or not isinstance(paise, numbers.Integral):
+        raise TypeError(
+            f'Expected integer paise, got {paise!r}; run migrations/convert_money_to_paise.py'
+        )
+    return Decimal(int(paise)).scaleb(-2)
+
+
+def unconverted_money_columns(connection, metadata):
+    """
+    Money columns the database still declares as something other than INTEGER.
+
+    Writes to such a column store paise in a rupee column, which the
+    conversion migration would then multiply by 100 again.
+
+    Returns:
+        dict: {table: [column names]} for existing tables only
+    """
+    unconverted = {}
+    for table in metadata.sorted_tables:
+        money = [column.name for column in table.columns if isinstance(column.type, Money)]
+        if not money:
+            continue
+        declared = {
+            row[1]: (row[2] or '').upper()
+            for row in connection.execute(text(f'PRAGMA table_info({table.name})'))
+        }
+        stale = [column for column in money if column in declared and declared[column] != 'INTEGER']
+        if stale:
+            unconverted[table.name] = stale
+    return unconverted
+
+
+class Money(TypeDecorator):
+    """
+    Money stored as INTEGER paise and handled as two-place Decimals.
+
+    SUM() over a Money column is an exact integer sum in SQLite; the ORM
+    turns the result back into rupees.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return Decimal
+
+    def process_bind_param(self, value, dialect):
+        return to_paise(value)
+
+    def process_result_value(self, value, dialect):
+        return from_paise(value)
@@ -0,0 +1,42 @@
+import re
+from constants import DEFAULT_PHONE_COUNTRY_CODE
+
+NON_DIGITS = re.compile(r'\D')
+FLOAT_SUFFIX = re.compile(r'\.0+$')
+
+
+def normalize_phone(raw, country_code=DEFAULT_PHONE_COUNTRY_CODE):
+    """
+    Normalize a free-text phone number to E.164 (e.g. +919876543210).
+
+    Handles spaces, dashes, brackets, a leading 0 trunk prefix, 00/+
+    international prefixes and numbers that pandas read as floats
+    ('9876543210.0').
+
+    Returns:
+        str or None: The E.164 number, or None if it cannot be normalized
+    """
+    if raw is None:
+        return None
+    text = FLOAT_SUFFIX.sub('', str(raw).strip())
+    if not text:
+        return None
+
+    has_plus = text.startswith('+')
+    digits = NON_DIGITS.sub('', text)
+
+    if has_plus:
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = country_code + digits[1:]
+    elif len(digits) == 10:
+        digits = country_code + digits
+    elif not (len(digits) == 10 + len(country_code) and digits.startswith(country_code)):
+        return None
+
+    # E.164 allows at most 15 digits; anything under 8 is not a full number
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    return '+' + digits
@@ -1,7 +1,7 @@
-from flask import jsonify, request, send_from_directory, render_template, session, redirect, url_for, send_file, current_app
+from flask import jsonify, request, send_from_directory, render_template, session, redirect, url_for, send_file, current_app, after_this_request, Response, stream_with_context
 from datetime import datetime, timedelta
-from sqlalchemy import or_, func
-from models import Customer, Sales, Accounts, User, Employee, DailyBalance
+from sqlalchemy import or_, and_, func, type_coerce
+from models import Customer, Sales, Accounts, User, Employee, DailyBalance, AgentTrace, AgentSpan, CustomerMetrics
 from extensions import db
 from constants import (
     TRANSACTION_TYPES,
@@ -12,10 +12,28 @@ from constants import (
 )
 from functools import wraps
 from services.whatsapp_service import WhatsAppService
+from services.fact_service import FactTableService
+from services.backup_service import BackupService
+from services.export_service import ExportService, EXPORT_ENTITIES
+from services.archive_service import TransactionArchiveService
+from services.reconciliation_service import ReconciliationService
+from services.receivable_service import ReceivableService
+from services.workload_service import WorkloadService
+from services.search_service import SearchService, MIN_FTS_LENGTH, fts_rowids, fts_ranked
+from services.typeahead_service import CustomerTypeahead
 from accounting_agent import AccountingAgent
+from llm_scheduler import AgentScheduler
+from phone_numbers import normalize_phone
+from chat_sessions import ChatSessionStore
+from http_cache import etag_cached, StaticPayload
+from serializers import model_serializer, row_serializer
+from money import to_money, to_paise
+import base64
 import csv
-from io import BytesIO, StringIO
+import json
+from io import StringIO
 import pandas as pd
+import numpy as np
 import os
 from flask_cors import CORS
 
@@ -37,10 +55,444 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def apply_order_filters(query, args, ranked=False):
+    """
+    Apply the /api/orders filter parameters to a Sales query.
+
+    With ranked=True a full-text search also orders the query by bm25 rank,
+    best match first; add any other ordering after this.
+    """
+    search = args.get('search', '').lower()
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    due_start = args.get('due_start')
+    due_end = args.get('due_end')
+    status = args.get('status')
+
+    if len(search) >= MIN_FTS_LENGTH:
+        order_match = fts_ranked('sales_fts', search)
+        name_match = fts_ranked('customer_fts', search, ['name'])
+        query = query.outerjoin(order_match, order_match.c.order_no == Sales.order_no) \
+            .outerjoin(name_match, name_match.c.rowid == Sales.customer_id) \
+            .filter(or_(order_match.c.order_no.isnot(None), name_match.c.rowid.isnot(None)))
+        if ranked:
+            # An order number hit and a customer name hit compete on their own bm25 scores
+            query = query.order_by(func.coalesce(
+                func.min(order_match.c.rank, name_match.c.rank), order_match.c.rank, name_match.c.rank
+            ))
+    elif search:
+        query = query.filter(
+            or_(
+                Sales.order_no.ilike(f'%{search}%'),
+                Sales.customer.has(Customer.name.ilike(f'%{search}%'))
+            )
+        )
+    
+    if start_date:
+        query = query.filter(Sales.order_date >= datetime.strptime(start_date, '%Y-%m-%d'))
+    if end_date:
+        query = query.filter(Sales.order_date <= datetime.strptime(end_date, '%Y-%m-%d'))
+    
+    if due_start:
+        query = query.filter(Sales.due_date >= datetime.strptime(due_start, '%Y-%m-%d'))
+    if due_end:
+        query = query.filter(Sales.due_date <= datetime.strptime(due_end, '%Y-%m-%d'))
+    
+    if status and status != 'all':
+        query = query.filter(Sales.order_status == status)
+    return query
+
+def apply_transaction_filters(query, args, ranked=False):
+    """
+    Apply the /api/transactions filter parameters to an Accounts query.
+
+    With ranked=True a full-text search also orders the query by bm25 rank,
+    best match first; add any other ordering after this.
+    """
+    search = args.get('search', '').lower()
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    source = args.get('source')
+
+    if len(search) >= MIN_FTS_LENGTH:
+        match = fts_ranked('accounts_fts', search)
+        query = query.join(match, match.c.rowid == Accounts.id)
+        if ranked:
+            query = query.order_by(match.c.rank)
+    elif search:
+        query = query.filter(
+            or_(
+                Accounts.order_no.ilike(f'%{search}%'),
+                Accounts.description.ilike(f'%{search}%'),
+                Accounts.notes.ilike(f'%{search}%')
+            )
+        )
+    
+    if start_date:
+        query = query.filter(Accounts.transaction_date >= datetime.strptime(start_date, '%Y-%m-%d'))
+    if end_date:
+        query = query.filter(Accounts.transaction_date <= datetime.strptime(end_date, '%Y-%m-%d'))
+    
+    if source and source != 'all':
+        query = query.filter(Accounts.source == source)
+    return query
+
+def apply_customer_filters(query, args):
+    """Apply search, area and registration source filters to a Customer query"""
+    search = args.get('search', '').lower()
+    area_location = args.get('area_location')
+    registration_source = args.get('registration_source')
+
+    if area_location:
+        query = query.filter(Customer.area_location == area_location)
+    if registration_source:
+        query = query.filter(Customer.registration_source == registration_source)
+    if len(search) >= MIN_FTS_LENGTH:
+        query = query.filter(Customer.id.in_(fts_rowids('customer_fts', search)))
+    elif search:
+        query = query.filter(
+            or_(
+                Customer.name.ilike(f'%{search}%'),
+                Customer.customer_code.ilike(f'%{search}%'),
+                Customer.phone.ilike(f'%{search}%')
+            )
+        )
+    return query
+
+def apply_employee_filters(query, args):
+    """Apply search, status and department filters to an Employee query"""
+    search = args.get('search', '').lower()
+    status = args.get('status')
+    department = args.get('department')
+
+    if search:
+        query = query.filter(
+            or_(
+                Employee.name.ilike(f'%{search}%'),
+                Employee.employee_code.ilike(f'%{search}%')
+            )
+        )
+    if status and status != 'all':
+        query = query.filter(Employee.status == status)
+    if department:
+        query = query.filter(Employee.department == department)
+    return query
+
+# Columns for /api/export/<entity>: (header, column), base query, filters and sort order
+EXPORT_DEFINITIONS = {
+    'transactions': {
+        'columns': [
+            ('ID', Accounts.id),
+            ('Date', Accounts.transaction_date),
+            ('Order No', Accounts.order_no),
+            ('Transaction Type', Accounts.transaction_type),
+            ('Category', Accounts.category),
+            ('Amount', Accounts.amount),
+            ('Tax Amount', Accounts.tax_amount),
+            ('Total Amount', Accounts.total_amount),
+            ('Payment Mode', Accounts.payment_mode),
+            ('Payment Status', Accounts.payment_status),
+            ('Reference No', Accounts.reference_no),
+            ('Description', Accounts.description),
+            ('Notes', Accounts.notes),
+            ('Source', Accounts.source),
+            ('Created By', Accounts.created_by)
+        ],
+        'filters': apply_transaction_filters,
+        'order_by': Accounts.transaction_date.desc()
+    },
+    'orders': {
+        'columns': [
+            ('Order No', Sales.order_no),
+            ('Customer Code', Customer.customer_code),
+            ('Customer Name', Customer.name),
+            ('Order Date', Sales.order_date),
+            ('Due Date', Sales.due_date),
+            ('Pieces', Sales.pieces),
+            ('Gross Amount', Sales.gross_amount),
+            ('Discount', Sales.discount),
+            ('Tax', Sales.tax),
+            ('Net Amount', Sales.net_amount),
+            ('Paid', Sales.paid),
+            ('Balance', Sales.balance),
+            ('Status', Sales.order_status),
+            ('Primary Services', Sales.primary_services),
+            ('Tags', Sales.tags)
+        ],
+        'join': (Customer, Sales.customer_id == Customer.id),
+        'filters': apply_order_filters,
+        'order_by': Sales.order_date.desc()
+    },
+    'customers': {
+        'columns': [
+            ('Customer Code', Customer.customer_code),
+            ('Name', Customer.name),
+            ('Phone', Customer.phone),
+            ('Address', Customer.address),
+            ('Area', Customer.area_location),
+            ('GSTIN', Customer.gstin),
+            ('Preference', Customer.preference),
+            ('Registration Source', Customer.registration_source),
+            ('Created At', Customer.created_at)
+        ],
+        'filters': apply_customer_filters,
+        'order_by': Customer.id
+    },
+    'employees': {
+        'columns': [
+            ('Employee Code', Employee.employee_code),
+            ('Name', Employee.name),
+            ('Phone', Employee.phone),
+            ('Email', Employee.email),
+            ('PAN', Employee.pan_number),
+            ('Aadhar', Employee.aadhar_number),
+            ('Designation', Employee.designation),
+            ('Department', Employee.department),
+            ('Join Date', Employee.join_date),
+            ('Status', Employee.status)
+        ],
+        'filters': apply_employee_filters,
+        'order_by': Employee.id
+    }
+}
+
+def stream_csv(filename, headers, rows, flush_size=64 * 1024):
+    """
+    Stream rows as a CSV download without building the file in memory.
+
+    Rows are written to a small buffer that is flushed to the client every
+    flush_size characters, so memory stays flat however many rows there are.
+    """
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([
+                value.isoformat(sep=' ') if isinstance(value, datetime) else value
+                for value in row
+            ])
+            if buffer.tell() >= flush_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# Columns each listing can project (fields=) and sort by (sort=, '-' for descending)
+LISTING_DEFINITIONS = {
+    'customers': {
+        'table': 'customer',
+        'columns': {
+            'id': Customer.id,
+            'customer_code': Customer.customer_code,
+            'name': Customer.name,
+            'phone': Customer.phone,
+            'phone_e164': Customer.phone_e164,
+            'address': Customer.address,
+            'area_location': Customer.area_location,
+            'gstin': Customer.gstin,
+            'preference': Customer.preference,
+            'registration_source': Customer.registration_source,
+            'created_at': Customer.created_at
+        },
+        'default_fields': ['customer_code', 'name', 'phone', 'address', 'area_location'],
+        'sortable': ['id', 'name', 'customer_code', 'area_location', 'created_at'],
+        'default_sort': 'id',
+        'filters': apply_customer_filters
+    },
+    'employees': {
+        'table': 'employee',
+        'columns': {
+            'id': Employee.id,
+            'employee_code': Employee.employee_code,
+            'name': Employee.name,
+            'phone': Employee.phone,
+            'email': Employee.email,
+            'pan_number': Employee.pan_number,
+            'aadhar_number': Employee.aadhar_number,
+            'designation': Employee.designation,
+            'department': Employee.department,
+            'join_date': Employee.join_date,
+            'status': Employee.status,
+            'created_at': Employee.created_at,
+            'updated_at': Employee.updated_at
+        },
+        'default_fields': [
+            'employee_code', 'name', 'phone', 'email', 'pan_number', 'aadhar_number',
+            'designation', 'department', 'join_date', 'status', 'created_at', 'updated_at'
+        ],
+        'sortable': ['id', 'name', 'employee_code', 'department', 'join_date'],
+        'default_sort': 'id',
+        'filters': apply_employee_filters
+    }
+}
+
+def encode_cursor(sort_value, row_id):
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def keyset_listing(name, args):
+    """
+    One page of a listing using keyset pagination.
+
+    Query parameters: fields (comma separated), sort (column, '-' prefix for
+    descending), limit (max 1000), cursor (next_cursor from the previous page)
+    and the listing's filters.
+
+    Returns:
+        tuple: (list of row dicts, next_cursor or None)
+    """
+    definition = LISTING_DEFINITIONS[name]
+    columns = definition['columns']
+
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()] or definition['default_fields']
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    sort = args.get('sort', definition['default_sort'])
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-')
+    if sort_name not in definition['sortable']:
+        raise ValueError(f"Invalid sort. Must be one of: {', '.join(definition['sortable'])}")
+
+    limit = max(1, min(args.get('limit', 100, type=int), 1000))
+    id_column = columns['id']
+    # Compare the stored text so NULLs and datetimes page consistently
+    sort_key = id_column if sort_name == 'id' else type_coerce(func.coalesce(columns[sort_name], ''), db.String)
+
+    query = db.session.query(id_column, sort_key.label('_sort_key'), *[columns[f].label(f) for f in fields])
+    query = definition['filters'](query, args)
+
+    if args.get('cursor'):
+        last_value, last_id = decode_cursor(args['cursor'])
+        if sort_name == 'id':
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(or_(sort_key < last_value, and_(sort_key == last_value, id_column < last_id)))
+        else:
+            query = query.filter(or_(sort_key > last_value, and_(sort_key == last_value, id_column > last_id)))
+
+    if descending:
+        query = query.order_by(sort_key.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_key, id_column)
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]._sort_key, rows[-1].id)
+
+    serialize = row_serializer(['id', *fields])
+    return [serialize(row) for row in rows], next_cursor
+
+serialize_customer = model_serializer(Customer, fields=[
+    'id', 'customer_code', 'name', 'address', 'phone', 'preference', 'gstin',
+    'area_location', 'registration_source', 'created_at'
+])
+serialize_order = model_serializer(Sales)
+
+MAX_BATCH_TRANSACTIONS = 500
+
+# Fields a manual entry may set; id, created_at, created_by and source are set by the server
+MANUAL_TRANSACTION_FIELDS = {
+    'transaction_date', 'transaction_type', 'category', 'amount', 'tax_amount', 'total_amount',
+    'payment_mode', 'payment_status', 'reference_no', 'order_no', 'description', 'notes',
+    'is_reconciled'
+}
+
+def _parse_bool(field, value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes', 'y', 'false', '0', 'no', 'n'):
+        return value.strip().lower() in ('true', '1', 'yes', 'y')
+    raise ValueError(f'{field} must be true or false')
+
+def build_manual_transaction(data):
+    """
+    Build an Accounts row from a manual-entry JSON object.
+
+    Raises:
+        ValueError: A field fails to parse or fails the model validators
+        TypeError: The object is not a dict or has unknown fields
+    """
+    if not isinstance(data, dict):
+        raise TypeError('Transaction must be an object')
+    unknown = sorted(set(data) - MANUAL_TRANSACTION_FIELDS)
+    if unknown:
+        raise TypeError(f"Unknown transaction fields: {', '.join(map(str, unknown))}")
+    data = dict(data)
+    data['source'] = 'manual'  # Add source for manually added transactions
+
+    # Convert empty strings to None
+    for key in data:
+        if data[key] == '':
+            data[key] = None
+
+    if data.get('is_reconciled') is not None:
+        data['is_reconciled'] = _parse_bool('is_reconciled', data['is_reconciled'])
+
+    for field in ['transaction_date', 'amount', 'total_amount']:
+        if data.get(field) is None:
+            raise ValueError(f'{field} is required')
+
+    # Parse amounts to exact paise
+    for field in ['amount', 'tax_amount', 'total_amount']:
+        if data.get(field) is not None:
+            data[field] = to_money(data[field])
+
+    # Convert date string to datetime
+    data['transaction_date'] = datetime.strptime(data['transaction_date'], '%Y-%m-%d')
+
+    return Accounts(**data)
+
 def init_routes(app):
     # Enable CORS
     CORS(app)
 
+    fact_service = FactTableService()
+    archive_service = TransactionArchiveService()
+    reconciliation_service = ReconciliationService()
+    receivable_service = ReceivableService()
+    workload_service = WorkloadService()
+    agent_scheduler = AgentScheduler(max_concurrency=app.config.get('LLM_MAX_CONCURRENCY', 2))
+
+    def build_agent():
+        """Create an accounting agent bound to the shared scheduler for the current user"""
+        db_path = os.path.join(current_app.root_path, 'instance', 'database.db')
+        user_key = session.get('username') or request.remote_addr
+        return AccountingAgent(db_path=db_path, scheduler=agent_scheduler, user_key=user_key)
+
+    backup_service = BackupService(
+        os.path.join(app.root_path, 'instance', 'database.db'),
+        app.config.get('BACKUP_FOLDER', os.path.join(app.root_path, 'backups')),
+        keep=app.config.get('BACKUP_KEEP', 7)
+    )
+
+    search_service = SearchService()
+    customer_typeahead = CustomerTypeahead()
+    export_service = ExportService(app.config.get('EXPORT_FOLDER', os.path.join(app.root_path, 'exports')))
+
+    chat_store = ChatSessionStore(
+        os.path.join(app.root_path, 'instance', 'database.db'),
+        token_budget=app.config.get('CHAT_HISTORY_TOKEN_BUDGET', 1500)
+    )
+
     @app.route('/login', methods=['GET', 'POST'])
     def login():
         if request.method == 'POST':
@@ -88,15 +540,16 @@ def init_routes(app):
         return render_template('transaction_form.html')
 
     @app.route('/api/customers')
+    @etag_cached('customer')
     def get_customers():
-        customers = Customer.query.all()
-        return jsonify([{
-            'customer_code': c.customer_code,
-            'name': c.name,
-            'phone': c.phone,
-            'address': c.address,
-            'area_location': c.area_location
-        } for c in customers])
+        try:
+            customers, next_cursor = keyset_listing('customers', request.args)
+            return jsonify({'items': customers, 'next_cursor': next_cursor})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            app.logger.error(f"Error getting customers: {str(e)}")
+            return jsonify({'error': str(e)}), 500
 
     @app.route('/api/orders')
     def get_orders():
@@ -104,37 +557,10 @@ def init_routes(app):
             # Get filter parameters from request
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 100, type=int)
-            search = request.args.get('search', '').lower()
-            start_date = request.args.get('start_date')
-            end_date = request.args.get('end_date')
-            due_start = request.args.get('due_start')
-            due_end = request.args.get('due_end')
-            status = request.args.get('status')
 
-            # Build query
-            query = Sales.query.order_by(Sales.order_date.desc())
-
-            # Apply filters
-            if search:
-                query = query.join(Customer).filter(
-                    or_(
-                        Sales.order_no.ilike(f'%{search}%'),
-                        Customer.name.ilike(f'%{search}%')
-                    )
-                )
-            
-            if start_date:
-                query = query.filter(Sales.order_date >= datetime.strptime(start_date, '%Y-%m-%d'))
-            if end_date:
-                query = query.filter(Sales.order_date <= datetime.strptime(end_date, '%Y-%m-%d'))
-            
-            if due_start:
-                query = query.filter(Sales.due_date >= datetime.strptime(due_start, '%Y-%m-%d'))
-            if due_end:
-                query = query.filter(Sales.due_date <= datetime.strptime(due_end, '%Y-%m-%d'))
-            
-            if status and status != 'all':
-                query = query.filter(Sales.order_status == status)
+            # Build query with the shared filters
+            query = apply_order_filters(Sales.query, request.args, ranked=True).order_by(Sales.order_date.desc())
+
 
             # Get total count before pagination
             total_count = query.count()
@@ -170,34 +596,10 @@ def init_routes(app):
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 100, type=int)
             
-            # Get filter parameters
-            search = request.args.get('search', '').lower()
-            start_date = request.args.get('start_date')
-            end_date = request.args.get('end_date')
-            source = request.args.get('source')
-
             # Build query
-            query = Accounts.query
-
-            # Apply filters
-            if search:
-                query = query.filter(
-                    or_(
-                        Accounts.order_no.ilike(f'%{search}%'),
-                        Accounts.description.ilike(f'%{search}%'),
-                        Accounts.notes.ilike(f'%{search}%')
-                    )
-                )
-            
-            if start_date:
-                query = query.filter(Accounts.transaction_date >= datetime.strptime(start_date, '%Y-%m-%d'))
-            if end_date:
-                query = query.filter(Accounts.transaction_date <= datetime.strptime(end_date, '%Y-%m-%d'))
-            
-            if source and source != 'all':
-                query = query.filter(Accounts.source == source)
+            query = apply_transaction_filters(Accounts.query, request.args, ranked=True)
 
-            # Order by date
+            # Best search matches first, then by date
             query = query.order_by(Accounts.transaction_date.desc())
             
             # Get total count before pagination
@@ -242,90 +644,58 @@ def init_routes(app):
             return jsonify({'error': str(e)}), 500
 
     @app.route('/customers/<customer_code>', methods=['GET'])
+    @etag_cached('customer')
     def get_customer(customer_code):
         try:
             customer = Customer.query.filter_by(customer_code=customer_code).first()
             if not customer:
                 return jsonify({'error': 'Customer not found'}), 404
-                
-            return jsonify({
-                'id': customer.id,
-                'customer_code': customer.customer_code,
-                'name': customer.name,
-                'address': customer.address,
-                'phone': customer.phone,
-                'preference': customer.preference,
-                'gstin': customer.gstin,
-                'area_location': customer.area_location,
-                'registration_source': customer.registration_source,
-                'created_at': customer.created_at.isoformat() if customer.created_at else None
-            }), 200
+
+            return jsonify(serialize_customer(customer)), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
     @app.route('/orders/<order_no>', methods=['GET'])
+    @etag_cached('sales')
     def get_order(order_no):
         try:
             order = Sales.query.get(order_no)
             if not order:
                 return jsonify({'error': 'Order not found'}), 404
-                
-            return jsonify({
-                'order_no': order.order_no,
-                'customer_id': order.customer_id,
-                'order_date': order.order_date.isoformat() if order.order_date else None,
-                'due_date': order.due_date.isoformat() if order.due_date else None,
-                'last_activity': order.last_activity.isoformat() if order.last_activity else None,
-                'pieces': order.pieces,
-                'weight': order.weight,
-                'gross_amount': order.gross_amount,
-                'discount': order.discount,
-                'tax': order.tax,
-                'net_amount': order.net_amount,
-                'advance': order.advance,
-                'paid': order.paid,
-                'adjustment': order.adjustment,
-                'balance': order.balance,
-                'advance_received': order.advance_received,
-                'advance_used': order.advance_used,
-                'booked_by': order.booked_by,
-                'workshop_note': order.workshop_note,
-                'order_note': order.order_note,
-                'home_delivery': order.home_delivery,
-                'garments_inspected_by': order.garments_inspected_by,
-                'order_from_pos': order.order_from_pos,
-                'package': order.package,
-                'package_type': order.package_type,
-                'package_name': order.package_name,
-                'feedback': order.feedback,
-                'tags': order.tags,
-                'comment': order.comment,
-                'primary_services': order.primary_services,
-                'topup_service': order.topup_service,
-                'order_status': order.order_status,
-                'last_payment_activity': order.last_payment_activity.isoformat() if order.last_payment_activity else None,
-                'coupon_code': order.coupon_code,
-                'created_at': order.created_at.isoformat() if order.created_at else None
-            }), 200
+
+            return jsonify(serialize_order(order)), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500 
 
+    # Constants only change with a deploy, so the body is built once
+    constants_payload = StaticPayload({
+        'TRANSACTION_TYPES': TRANSACTION_TYPES,
+        'INCOME_CATEGORIES': INCOME_CATEGORIES,
+        'EXPENSE_CATEGORIES': EXPENSE_CATEGORIES,
+        'PAYMENT_MODES': PAYMENT_MODES,
+        'PAYMENT_STATUSES': PAYMENT_STATUSES
+    })
+
     @app.route('/api/constants', methods=['GET'])
     def get_constants():
-        return jsonify({
-            'TRANSACTION_TYPES': TRANSACTION_TYPES,
-            'INCOME_CATEGORIES': INCOME_CATEGORIES,
-            'EXPENSE_CATEGORIES': EXPENSE_CATEGORIES,
-            'PAYMENT_MODES': PAYMENT_MODES,
-            'PAYMENT_STATUSES': PAYMENT_STATUSES
-        })
+        return constants_payload.response()
 
     @app.route('/api/customers/search', methods=['GET'])
     def search_customers():
-        query = request.args.get('q', '')
-        if len(query) < 2:
+        query = request.args.get('q', '').strip()
+        if not query:
             return jsonify([])
         
+        # Prefix matches come from the in-memory index without touching the database
+        matches = customer_typeahead.search(query, limit=10)
+        if matches or len(query) < 2:
+            return jsonify(matches)
+        
+        # Otherwise fall back to substring search: ranked trigram index
+        # lookup for three or more characters, LIKE below that
+        if len(query) >= MIN_FTS_LENGTH:
+            return jsonify(search_service.search_customers(query, limit=10))
+        
         customers = Customer.query.filter(
             or_(
                 Customer.name.ilike(f'%{query}%'),
@@ -341,28 +711,30 @@ def init_routes(app):
             'phone': c.phone
         } for c in customers])
 
+    @app.route('/api/customers/by-phone/<number>', methods=['GET'])
+    def get_customers_by_phone(number):
+        phone = normalize_phone(number)
+        if not phone:
+            return jsonify({'error': 'Invalid phone number'}), 400
+        
+        customers = Customer.query.filter_by(phone_e164=phone).all()
+        return jsonify([{
+            'id': c.id,
+            'name': c.name,
+            'customer_code': c.customer_code,
+            'phone': c.phone,
+            'phone_e164': c.phone_e164,
+            'area_location': c.area_location
+        } for c in customers])
+
     @app.route('/api/transactions', methods=['POST'])
     def add_transaction():
         try:
-            data = request.json
-            data['source'] = 'manual'  # Add source for manually added transactions
-            
-            # Convert string amounts to float
-            for field in ['amount', 'tax_amount', 'total_amount']:
-                if data.get(field):
-                    data[field] = float(data[field])
-            
-            # Convert date string to datetime
-            if data.get('transaction_date'):
-                data['transaction_date'] = datetime.strptime(data['transaction_date'], '%Y-%m-%d')
-            
-            # Convert empty strings to None
-            for key in data:
-                if data[key] == '':
-                    data[key] = None
-            
-            transaction = Accounts(**data)
+            transaction = build_manual_transaction(request.json)
             db.session.add(transaction)
+            db.session.flush()
+            fact_service.refresh_dates([transaction.transaction_date])
+            fact_service.refresh_orders([transaction.order_no])
             db.session.commit()
             
             return jsonify({'message': 'Transaction added successfully', 'id': transaction.id}), 201
@@ -371,6 +743,52 @@ def init_routes(app):
             db.session.rollback()
             return jsonify({'error': str(e)}), 400 
 
+    @app.route('/api/transactions/batch', methods=['POST'])
+    def add_transactions_batch():
+        """
+        Validate and insert a list of manual transactions in one database
+        transaction. Nothing is saved unless every line is valid; the
+        response has one result per line, in request order.
+        """
+        data = request.get_json(silent=True) or {}
+        items = data.get('transactions')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'No transactions provided'}), 400
+        if len(items) > MAX_BATCH_TRANSACTIONS:
+            return jsonify({'error': f'At most {MAX_BATCH_TRANSACTIONS} transactions per batch'}), 400
+
+        transactions = []
+        results = []
+        for index, item in enumerate(items):
+            try:
+                transactions.append(build_manual_transaction(item))
+                results.append({'index': index, 'success': True})
+            except (ValueError, TypeError) as e:
+                results.append({'index': index, 'success': False, 'error': str(e)})
+
+        failed = sum(1 for result in results if not result['success'])
+        if failed:
+            return jsonify({'success': False, 'error': f'{failed} of {len(items)} transactions are invalid', 'results': results}), 400
+
+        try:
+            db.session.add_all(transactions)
+            db.session.flush()
+            fact_service.refresh_dates({t.transaction_date for t in transactions})
+            fact_service.refresh_orders(t.order_no for t in transactions)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error saving transaction batch: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+        for result, transaction in zip(results, transactions):
+            result['id'] = transaction.id
+        return jsonify({
+            'success': True,
+            'message': f'Added {len(transactions)} transactions',
+            'results': results
+        }), 201
+
     @app.route('/admin')
     @login_required
     @admin_required
@@ -477,9 +895,8 @@ def init_routes(app):
                 recent_orders = Sales.query.filter(
                     Sales.order_date >= start_date
                 ).count()
-                print(f"Orders count: {total_orders}, Recent: {recent_orders}")
             except Exception as e:
-                print(f"Error getting orders count: {str(e)}")
+                app.logger.error(f"Error getting orders count: {str(e)}")
                 total_orders = recent_orders = 0
 
             try:
@@ -488,10 +905,12 @@ def init_routes(app):
                 recent_customers = Customer.query.filter(
                     Customer.created_at >= start_date
                 ).count()
-                print(f"Customers count: {total_customers}, Recent: {recent_customers}")
+                active_customers = CustomerMetrics.query.filter(
+                    CustomerMetrics.last_order_date >= start_date
+                ).count()
             except Exception as e:
-                print(f"Error getting customers count: {str(e)}")
-                total_customers = recent_customers = 0
+                app.logger.error(f"Error getting customers count: {str(e)}")
+                total_customers = recent_customers = active_customers = 0
 
             try:
                 # Revenue stats
@@ -511,9 +930,8 @@ def init_routes(app):
                     Accounts.transaction_date >= start_date
                 ).scalar()
                 recent_revenue = float(recent_revenue) if recent_revenue else 0
-                print(f"Revenue - Total: {total_revenue}, Recent: {recent_revenue}")
             except Exception as e:
-                print(f"Error getting revenue: {str(e)}")
+                app.logger.error(f"Error getting revenue: {str(e)}")
                 total_revenue = recent_revenue = 0
 
             try:
@@ -528,25 +946,12 @@ def init_routes(app):
                     status if status else 'Unprocessed': count 
                     for status, count in status_distribution
                 }
-                print(f"Status distribution: {status_dict}")
             except Exception as e:
-                print(f"Error getting status distribution: {str(e)}")
+                app.logger.error(f"Error getting status distribution: {str(e)}")
                 status_dict = {}
 
             try:
                 # Daily revenue
-                print("Fetching daily revenue...")
-                
-                # First, let's check if we have any transactions in this period
-                transaction_check = db.session.query(Accounts).filter(
-                    Accounts.transaction_type == 'Income',
-                    Accounts.category == 'Sales',
-                    Accounts.transaction_date >= start_date,
-                    Accounts.transaction_date <= end_date
-                ).first()
-                print(f"Any transactions found: {transaction_check is not None}")
-
-                # Get daily revenue with more detailed date handling
                 daily_revenue = db.session.query(
                     func.date(Accounts.transaction_date).label('date'),
                     func.sum(Accounts.amount).label('amount')
@@ -561,21 +966,16 @@ def init_routes(app):
                     func.date(Accounts.transaction_date)
                 ).all()
 
-                print(f"Raw daily revenue data: {daily_revenue}")
 
                 # Fill in missing dates
                 all_dates = []
                 current_date = start_date
                 
-                # Create a dictionary of existing revenues
-                revenue_dict = {}
-                for date, amount in daily_revenue:
-                    try:
-                        date_str = date.strftime('%Y-%m-%d')
-                        revenue_dict[date_str] = float(amount if amount is not None else 0)
-                        print(f"Processed revenue for {date_str}: {revenue_dict[date_str]}")
-                    except Exception as e:
-                        print(f"Error processing date {date}: {str(e)}")
+                # Create a dictionary of existing revenues; SQLite's date() returns 'YYYY-MM-DD' strings
+                revenue_dict = {
+                    str(date)[:10]: float(amount if amount is not None else 0)
+                    for date, amount in daily_revenue
+                }
 
                 # Fill in all dates
                 while current_date.date() <= end_date.date():
@@ -585,15 +985,12 @@ def init_routes(app):
                         'date': date_str,
                         'amount': amount
                     })
-                    print(f"Added date {date_str} with amount {amount}")
                     current_date += timedelta(days=1)
 
-                print(f"Final daily revenue data: {all_dates}")
-                print(f"Number of dates: {len(all_dates)}")
+                app.logger.debug(f"Daily revenue: {len(revenue_dict)} days with sales over {len(all_dates)} days")
 
             except Exception as e:
-                print(f"Error getting daily revenue: {str(e)}")
-                print("Traceback:", traceback.format_exc())
+                app.logger.exception(f"Error getting daily revenue: {str(e)}")
                 all_dates = []
 
             try:
@@ -611,9 +1008,8 @@ def init_routes(app):
                     mode if mode else 'Unknown': float(amount or 0)
                     for mode, amount in payment_distribution
                 }
-                print(f"Payment distribution: {payment_dict}")
             except Exception as e:
-                print(f"Error getting payment distribution: {str(e)}")
+                app.logger.error(f"Error getting payment distribution: {str(e)}")
                 payment_dict = {}
 
             return jsonify({
@@ -621,6 +1017,7 @@ def init_routes(app):
                 'recent_orders': recent_orders,
                 'total_customers': total_customers,
                 'recent_customers': recent_customers,
+                'active_customers': active_customers,
                 'total_revenue': total_revenue,
                 'recent_revenue': recent_revenue,
                 'status_distribution': status_dict,
@@ -629,10 +1026,7 @@ def init_routes(app):
             })
 
         except Exception as e:
-            print(f"Main dashboard error: {str(e)}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            traceback.print_exc()
+            app.logger.exception(f"Dashboard error: {str(e)}")
             return jsonify({'error': str(e)}), 500 
 
     whatsapp_service = WhatsAppService()
@@ -647,7 +1041,11 @@ def init_routes(app):
             if not phone or not message:
                 return jsonify({'error': 'Phone and message are required'}), 400
             
-            result = whatsapp_service.send_message(phone, message)
+            normalized = normalize_phone(phone)
+            if not normalized:
+                return jsonify({'error': 'Invalid phone number'}), 400
+            
+            result = whatsapp_service.send_message(normalized, message)
             return jsonify(result), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
@@ -659,26 +1057,32 @@ def init_routes(app):
             message = data.get('message')
             filter_criteria = data.get('filter', {})
             
-            # Build query based on filter criteria
-            query = Customer.query
+            # Build query based on filter criteria, using the per-customer metrics
+            query = Customer.query.join(CustomerMetrics, CustomerMetrics.customer_id == Customer.id)
             
             if filter_criteria.get('last_order_days'):
                 days = filter_criteria['last_order_days']
                 date_threshold = datetime.now() - timedelta(days=days)
-                query = query.join(Sales).filter(Sales.order_date >= date_threshold)
+                if filter_criteria.get('type') == 'inactive':
+                    query = query.filter(CustomerMetrics.last_order_date < date_threshold)
+                else:
+                    query = query.filter(CustomerMetrics.last_order_date >= date_threshold)
                 
             if filter_criteria.get('min_orders'):
-                query = query.having(func.count(Sales.order_no) >= filter_criteria['min_orders'])
+                query = query.filter(CustomerMetrics.order_count >= filter_criteria['min_orders'])
                 
             customers = query.all()
             
             results = []
+            sent_to = set()
             for customer in customers:
-                if customer.phone:
-                    result = whatsapp_service.send_message(customer.phone, message)
+                # Customers sharing a number only get the message once
+                if customer.phone_e164 and customer.phone_e164 not in sent_to:
+                    sent_to.add(customer.phone_e164)
+                    result = whatsapp_service.send_message(customer.phone_e164, message)
                     results.append({
                         'customer': customer.name,
-                        'phone': customer.phone,
+                        'phone': customer.phone_e164,
                         'status': 'success' if result else 'failed'
                     })
                     
@@ -736,11 +1140,12 @@ def init_routes(app):
     def get_accounting_insights():
         try:
             # Initialize accounting agent
-            db_path = os.path.join(current_app.root_path, 'instance', 'database.db')
-            agent = AccountingAgent(db_path=db_path)
+            agent = build_agent()
             
             days = request.args.get('days', default=7, type=int)
             analysis_type = request.args.get('type', default='daily', type=str)
+            # narrative=0 returns the template figures without asking the model
+            narrative = bool(request.args.get('narrative', default=1, type=int))
             
             # Format question based on analysis type
             if analysis_type == 'monthly':
@@ -753,7 +1158,17 @@ def init_routes(app):
             else:  # daily
                 question = f"Analyze daily transactions for the past {days} days"
             
-            insights = agent.analyze_financial_data(question)
+            # With ?async=1 the worker is released and the client polls the job
+            if request.args.get('async', type=int):
+                job_id = agent_scheduler.submit(
+                    agent.user_key,
+                    agent.atraced('insights', agent.aanalyze_financial_data(question, narrative=narrative))
+                )
+                return jsonify({'success': True, 'job_id': job_id}), 202
+            
+            insights = agent_scheduler.run(
+                agent.atraced('insights', agent.aanalyze_financial_data(question, narrative=narrative))
+            )
             
             return jsonify({
                 'success': True,
@@ -763,6 +1178,222 @@ def init_routes(app):
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/accounting/report', methods=['GET'])
+    @login_required
+    def get_accounting_report():
+        try:
+            agent = build_agent()
+            report_type = request.args.get('type', default='income_statement', type=str)
+            period = request.args.get('period')
+            
+            # Report sections are analyzed in parallel on the scheduler loop
+            if request.args.get('async', type=int):
+                job_id = agent_scheduler.submit(
+                    agent.user_key, agent.atraced('report', agent.aget_financial_report(report_type, period))
+                )
+                return jsonify({'success': True, 'job_id': job_id}), 202
+            
+            report = agent_scheduler.run(agent.atraced('report', agent.aget_financial_report(report_type, period)))
+            
+            return jsonify({
+                'success': True,
+                'report': report
+            })
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/admin/perf')
+    @login_required
+    @admin_required
+    def admin_perf():
+        return render_template('admin_perf.html')
+
+    @app.route('/api/admin/perf', methods=['GET'])
+    @login_required
+    @admin_required
+    def get_perf_stats():
+        """Request timings, SQL counts, slow queries and sampled profiles since startup"""
+        monitor = current_app.extensions.get('perf_monitor')
+        if monitor is None:
+            return jsonify({'error': 'Instrumentation is not enabled'}), 404
+        return jsonify(monitor.snapshot())
+
+    @app.route('/api/admin/perf/reset', methods=['POST'])
+    @login_required
+    @admin_required
+    def reset_perf_stats():
+        monitor = current_app.extensions.get('perf_monitor')
+        if monitor is None:
+            return jsonify({'error': 'Instrumentation is not enabled'}), 404
+        monitor.reset()
+        return jsonify({'success': True})
+
+    @app.route('/api/admin/agent-metrics', methods=['GET'])
+    @login_required
+    @admin_required
+    def get_agent_metrics():
+        try:
+            days = request.args.get('days', default=7, type=int)
+            since = datetime.utcnow() - timedelta(days=days)
+
+            def summarize(durations):
+                if not durations:
+                    return {'count': 0, 'p50_ms': None, 'p95_ms': None}
+                values = np.array(durations, dtype=float)
+                return {
+                    'count': len(durations),
+                    'p50_ms': round(float(np.percentile(values, 50)), 1),
+                    'p95_ms': round(float(np.percentile(values, 95)), 1)
+                }
+
+            traces = db.session.query(
+                AgentTrace.endpoint,
+                AgentTrace.duration_ms,
+                AgentTrace.prompt_tokens,
+                AgentTrace.completion_tokens
+            ).filter(AgentTrace.started_at >= since).all()
+
+            spans = db.session.query(
+                AgentTrace.endpoint,
+                AgentSpan.name,
+                AgentSpan.duration_ms
+            ).join(AgentTrace).filter(AgentTrace.started_at >= since).all()
+
+            endpoints = {}
+
+            def entry_for(endpoint):
+                return endpoints.setdefault(endpoint, {
+                    'durations': [],
+                    'prompt_tokens': [],
+                    'completion_tokens': [],
+                    'spans': {}
+                })
+
+            for endpoint, duration, prompt_tokens, completion_tokens in traces:
+                entry = entry_for(endpoint)
+                entry['durations'].append(duration or 0)
+                entry['prompt_tokens'].append(prompt_tokens or 0)
+                entry['completion_tokens'].append(completion_tokens or 0)
+
+            for endpoint, name, duration in spans:
+                entry_for(endpoint)['spans'].setdefault(name, []).append(duration or 0)
+
+            return jsonify({
+                'days': days,
+                'endpoints': {
+                    endpoint: {
+                        'total': summarize(entry['durations']),
+                        'avg_prompt_tokens': round(float(np.mean(entry['prompt_tokens'])), 1) if entry['prompt_tokens'] else None,
+                        'avg_completion_tokens': round(float(np.mean(entry['completion_tokens'])), 1) if entry['completion_tokens'] else None,
+                        'spans': {name: summarize(durations) for name, durations in entry['spans'].items()}
+                    }
+                    for endpoint, entry in endpoints.items()
+                }
+            })
+
+        except Exception as e:
+            app.logger.error(f"Error getting agent metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/admin/backups', methods=['GET'])
+    @login_required
+    @admin_required
+    def list_backups():
+        try:
+            return jsonify(backup_service.list_backups())
+        except Exception as e:
+            app.logger.error(f"Error listing backups: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/admin/backups', methods=['POST'])
+    @login_required
+    @admin_required
+    def create_backup():
+        try:
+            backup = backup_service.create_backup()
+            return jsonify({'success': True, 'backup': backup}), 201
+        except Exception as e:
+            app.logger.error(f"Error creating backup: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/admin/backups/<name>', methods=['GET'])
+    @login_required
+    @admin_required
+    def download_backup(name):
+        try:
+            path = backup_service.backup_path(name)
+            return send_file(path, as_attachment=True, download_name=name)
+        except (ValueError, FileNotFoundError) as e:
+            return jsonify({'error': str(e)}), 404
+
+    @app.route('/api/admin/exports', methods=['POST'])
+    @login_required
+    @admin_required
+    def run_analytics_export():
+        try:
+            data = request.get_json(silent=True) or {}
+            entities = data.get('entities') or list(EXPORT_ENTITIES)
+            fmt = data.get('format', 'parquet')
+            incremental = data.get('incremental', True)
+            
+            results = [
+                export_service.export_to_directory(entity, fmt=fmt, incremental=incremental)
+                for entity in entities
+            ]
+            return jsonify({'success': True, 'exports': results})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Analytics export failed: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/admin/exports/<entity>', methods=['GET'])
+    @login_required
+    @admin_required
+    def download_analytics_export(entity):
+        try:
+            fmt = request.args.get('format', 'parquet')
+            path, rows = export_service.export_file(entity, fmt=fmt)
+            app.logger.info(f"Exported {rows} {entity} rows as {fmt}")
+            
+            @after_this_request
+            def remove_export(response):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    app.logger.warning(f"Could not remove export file {path}: {str(e)}")
+                return response
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            extension = os.path.splitext(path)[1]
+            return send_file(
+                path,
+                mimetype='application/octet-stream',
+                as_attachment=True,
+                download_name=f'{entity}_{timestamp}{extension}'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            app.logger.error(f"Analytics export failed: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/agent/jobs/<job_id>', methods=['GET'])
+    @login_required
+    def get_agent_job(job_id):
+        job = agent_scheduler.get_job(job_id)
+        if not job or job['user'] != (session.get('username') or request.remote_addr):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'job_id': job['id'],
+            'status': job['status'],
+            'result': job['result'],
+            'error': job['error']
+        })
+
     @app.route('/api/transactions/<int:id>', methods=['DELETE'])
     @admin_required
     def delete_transaction(id):
@@ -774,6 +1405,9 @@ def init_routes(app):
                 return jsonify({'error': 'Can only delete manual transactions'}), 403
             
             db.session.delete(transaction)
+            db.session.flush()
+            fact_service.refresh_dates([transaction.transaction_date])
+            fact_service.refresh_orders([transaction.order_no])
             db.session.commit()
             
             return jsonify({'success': True})
@@ -786,20 +1420,12 @@ def init_routes(app):
     @admin_required
     def cleanup_transactions():
         try:
-            # Find all transactions with invalid order numbers
-            invalid_transactions = Accounts.query.filter(
-                ~Accounts.order_no.like('T%')  # ~ is the NOT operator in SQLAlchemy
-            ).all()
-            
-            # Count transactions to be deleted
-            count = len(invalid_transactions)
-            
-            # Delete the transactions
-            for transaction in invalid_transactions:
-                db.session.delete(transaction)
-            
-            db.session.commit()
-            
+            # ?preview=true reports what would be removed without deleting
+            if request.args.get('preview', '').lower() in ('1', 'true'):
+                return jsonify({'preview': True, **archive_service.preview_invalid()})
+
+            count = archive_service.purge_invalid()
+
             return jsonify({
                 'success': True,
                 'message': f'Removed {count} invalid transactions',
@@ -816,16 +1442,25 @@ def init_routes(app):
         try:
             app.logger.info("Starting manual transactions export")
             
-            # Get all manual transactions
-            transactions = Accounts.query.filter_by(source='manual').order_by(Accounts.transaction_date.desc()).all()
-            app.logger.info(f"Found {len(transactions)} manual transactions")
+            rows = Accounts.query.filter_by(source='manual').order_by(
+                Accounts.transaction_date.desc()
+            ).with_entities(
+                func.strftime('%Y-%m-%d', Accounts.transaction_date),
+                func.coalesce(Accounts.order_no, ''),
+                func.coalesce(Accounts.transaction_type, ''),
+                func.coalesce(Accounts.amount, 0),
+                func.coalesce(Accounts.payment_mode, ''),
+                func.coalesce(Accounts.reference_no, ''),
+                func.coalesce(Accounts.description, ''),
+                func.coalesce(Accounts.notes, '')
+            ).yield_per(1000)
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'manual_transactions_{timestamp}.csv'
             
-            # Create string buffer first
-            string_buffer = StringIO()
-            writer = csv.writer(string_buffer)
+            app.logger.info(f"Streaming file: {filename}")
             
-            # Write headers
-            writer.writerow([
+            return stream_csv(filename, [
                 'Date', 
                 'Order No', 
                 'Transaction Type',
@@ -834,37 +1469,7 @@ def init_routes(app):
                 'Reference No',
                 'Description',
                 'Notes'
-            ])
-            
-            # Write transaction data
-            for txn in transactions:
-                writer.writerow([
-                    txn.transaction_date.strftime('%Y-%m-%d') if txn.transaction_date else '',
-                    txn.order_no or '',
-                    txn.transaction_type or '',
-                    str(txn.amount) if txn.amount else '0',
-                    txn.payment_mode or '',
-                    txn.reference_no or '',
-                    txn.description or '',
-                    txn.notes or ''
-                ])
-            
-            # Convert to bytes for sending
-            output = BytesIO()
-            output.write(string_buffer.getvalue().encode('utf-8'))
-            output.seek(0)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'manual_transactions_{timestamp}.csv'
-            
-            app.logger.info(f"Preparing to send file: {filename}")
-            
-            return send_file(
-                output,
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=filename
-            )
+            ], rows)
             
         except Exception as e:
             app.logger.error(f"Export failed: {str(e)}")
@@ -874,6 +1479,30 @@ def init_routes(app):
                 'details': 'Check server logs for more information'
             }), 500 
 
+    @app.route('/api/export/<entity>')
+    @login_required
+    @admin_required
+    def export_entity(entity):
+        try:
+            definition = EXPORT_DEFINITIONS.get(entity)
+            if not definition:
+                return jsonify({'error': f"Invalid entity. Must be one of: {', '.join(EXPORT_DEFINITIONS)}"}), 400
+            
+            headers = [header for header, _ in definition['columns']]
+            query = db.session.query(*[column for _, column in definition['columns']])
+            if 'join' in definition:
+                query = query.select_from(definition['columns'][0][1].class_).outerjoin(*definition['join'])
+            query = definition['filters'](query, request.args).order_by(definition['order_by'])
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            return stream_csv(f'{entity}_{timestamp}.csv', headers, query.yield_per(1000))
+            
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            app.logger.error(f"Export failed: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/employees')
     @login_required
     def employees_page():
@@ -881,23 +1510,16 @@ def init_routes(app):
 
     @app.route('/api/employees', methods=['GET'])
     @login_required
+    @etag_cached('employee')
     def get_employees():
-        employees = Employee.query.all()
-        return jsonify([{
-            'id': emp.id,
-            'employee_code': emp.employee_code,
-            'name': emp.name,
-            'phone': emp.phone,
-            'email': emp.email,
-            'pan_number': emp.pan_number,
-            'aadhar_number': emp.aadhar_number,
-            'designation': emp.designation,
-            'department': emp.department,
-            'join_date': emp.join_date,
-            'status': emp.status,
-            'created_at': emp.created_at,
-            'updated_at': emp.updated_at
-        } for emp in employees])
+        try:
+            employees, next_cursor = keyset_listing('employees', request.args)
+            return jsonify({'items': employees, 'next_cursor': next_cursor})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            app.logger.error(f"Error getting employees: {str(e)}")
+            return jsonify({'error': str(e)}), 500
 
     @app.route('/api/employees', methods=['POST'])
     @login_required
@@ -975,6 +1597,7 @@ def init_routes(app):
             }), 500 
 
     @app.route('/api/daily-balance', methods=['GET'])
+    @etag_cached('daily_balances', key=lambda: datetime.now().date())
     def get_daily_balance():
         try:
             date = request.args.get('date')
@@ -1006,6 +1629,88 @@ def init_routes(app):
             app.logger.error(f"Error getting daily balance: {str(e)}")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/reconciliation', methods=['GET'])
+    @admin_required
+    def get_reconciliation():
+        """
+        Recorded daily balances between start and end (default: the last 30
+        days) checked against the ledger's cash and bank movement.
+        """
+        try:
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else datetime.now().date()
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else end - timedelta(days=30)
+            tolerance = to_paise(request.args.get('tolerance') or 0)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            entries = reconciliation_service.reconcile(start, end, tolerance=tolerance)
+            return jsonify({
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'entries': entries,
+                'mismatches': sum(1 for entry in entries if entry['mismatch'])
+            })
+        except Exception as e:
+            app.logger.error(f"Error reconciling balances: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/receivables/aging', methods=['GET'])
+    @login_required
+    def get_receivables_aging():
+        """
+        Outstanding order balances per customer (or per area with
+        ?group_by=area) in 0-30/31-60/61-90/90+ day buckets, largest first.
+        """
+        try:
+            as_of = datetime.strptime(request.args['as_of'], '%Y-%m-%d').date() if request.args.get('as_of') else None
+            min_outstanding = to_paise(request.args.get('min_outstanding') or 0)
+            limit = min(request.args.get('limit', 100, type=int), 1000)
+            offset = request.args.get('offset', 0, type=int)
+            return jsonify(receivable_service.aging(
+                group_by=request.args.get('group_by', 'customer'),
+                as_of=as_of,
+                min_outstanding=min_outstanding,
+                limit=limit,
+                offset=offset
+            ))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            app.logger.error(f"Error computing receivables aging: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/receivables/customers/<int:customer_id>', methods=['GET'])
+    @login_required
+    def get_customer_receivables(customer_id):
+        """Open orders of one customer, oldest first, for collection calls"""
+        customer = Customer.query.get_or_404(customer_id)
+        orders = receivable_service.open_orders(customer_id)
+        return jsonify({
+            'customer': serialize_customer(customer),
+            'outstanding': sum(order['outstanding'] for order in orders),
+            'orders': orders
+        })
+
+    @app.route('/api/workload', methods=['GET'])
+    @login_required
+    def get_workload():
+        """
+        Pieces and weight due per day and service for open orders over the
+        next ?days= days (default 14) from ?start=, with overdue counts.
+        """
+        try:
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+            days = request.args.get('days', 14, type=int)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            return jsonify(workload_service.forecast(start=start, days=days))
+        except Exception as e:
+            app.logger.error(f"Error forecasting workload: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/daily-balance', methods=['POST'])
     @admin_required
     def add_daily_balance():
@@ -1049,11 +1754,13 @@ def init_routes(app):
             if not data or 'ids' not in data:
                 return jsonify({'error': 'No transaction IDs provided'}), 400
             
-            # Delete transactions
-            Accounts.query.filter(Accounts.id.in_(data['ids'])).delete(synchronize_session=False)
-            db.session.commit()
+            if data.get('preview'):
+                return jsonify({'preview': True, **archive_service.preview_ids(data['ids'])})
+
+            # Archived and deleted in chunks, committing between them
+            count = archive_service.purge_ids(data['ids'])
             
-            return jsonify({'success': True, 'message': f"Deleted {len(data['ids'])} transactions"})
+            return jsonify({'success': True, 'message': f"Deleted {count} transactions", 'count': count})
             
         except Exception as e:
             db.session.rollback()
@@ -1066,21 +1773,50 @@ def init_routes(app):
         try:
             data = request.get_json()
             message = data.get('message')
-            conversation_history = data.get('history', [])
+            session_id = data.get('session_id')
             
             if not message:
                 return jsonify({'error': 'No message provided'}), 400
             
+            # History lives server-side; the client only sends the session ID
+            if session_id:
+                if not chat_store.owns_session(session_id, session['user_id']):
+                    return jsonify({'error': 'Chat session not found'}), 404
+            else:
+                session_id = chat_store.create_session(session['user_id'])
+            
             # Initialize accounting agent
-            db_path = os.path.join(current_app.root_path, 'instance', 'database.db')
-            agent = AccountingAgent(db_path=db_path)
+            agent = build_agent()
+            
+            # With "async": true the worker is released and the client polls the job
+            if data.get('async'):
+                job_id = agent_scheduler.submit(
+                    agent.user_key, agent.atraced('chat', agent.achat_in_session(chat_store, session_id, message))
+                )
+                return jsonify({'job_id': job_id, 'session_id': session_id}), 202
             
-            response = agent.process_chat_message(message, conversation_history)
+            response = agent_scheduler.run(
+                agent.atraced('chat', agent.achat_in_session(chat_store, session_id, message))
+            )
             return jsonify(response)
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/chat/sessions/<session_id>/results/<int:result_id>', methods=['GET'])
+    @login_required
+    def get_chat_result(session_id, result_id):
+        try:
+            if not chat_store.owns_session(session_id, session['user_id']):
+                return jsonify({'error': 'Chat session not found'}), 404
+            
+            result = chat_store.get_result(result_id, session_id)
+            if not result:
+                return jsonify({'error': 'Result not found'}), 404
+            return jsonify(result)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/accounting/schema', methods=['GET'])
     @login_required
     def get_schema():
@@ -0,0 +1,43 @@
+from operator import attrgetter
+from sqlalchemy import inspect
+
+
+def row_serializer(fields, rename=None):
+    """
+    Build a function turning an object or result row into a dict of fields.
+
+    The attribute getter is created once, so serializing a page of rows is a
+    single C-level attribute fetch and a dict(zip()) per row. Values are left
+    as-is; the JSON provider encodes datetimes and Decimals.
+
+    Args:
+        fields (list): Attribute names to read
+        rename (dict, optional): Output key for attributes whose key differs
+    """
+    fields = list(fields)
+    keys = [(rename or {}).get(field, field) for field in fields]
+    if len(fields) == 1:
+        getter = attrgetter(fields[0])
+        key = keys[0]
+        return lambda obj: {key: getter(obj)}
+    getter = attrgetter(*fields)
+    return lambda obj: dict(zip(keys, getter(obj)))
+
+
+def model_serializer(model, fields=None, exclude=()):
+    """
+    Row serializer for a model, with fields taken from its column metadata.
+
+    Args:
+        model: SQLAlchemy model class
+        fields (list, optional): Columns to include, in order; defaults to all
+        exclude (iterable): Columns to leave out
+    """
+    columns = [attr.key for attr in inspect(model).column_attrs]
+    if fields is None:
+        fields = columns
+    else:
+        unknown = set(fields) - set(columns)
+        if unknown:
+            raise ValueError(f"{model.__name__} has no columns: {', '.join(sorted(unknown))}")
+    return row_serializer([field for field in fields if field not in exclude])
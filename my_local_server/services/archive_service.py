@@ -0,0 +1,129 @@
+import time
+from datetime import datetime
+from sqlalchemy import text
+from extensions import db
+from services.fact_service import FactTableService
+from money import from_paise
+
+# Columns copied from accounts into accounts_archive
+ARCHIVE_COLUMNS = [
+    'id', 'transaction_date', 'order_no', 'transaction_type', 'category', 'amount',
+    'tax_amount', 'total_amount', 'payment_mode', 'payment_status', 'reference_no',
+    'description', 'notes', 'is_reconciled', 'created_at', 'created_by', 'source'
+]
+
+# Transactions the cleanup removes: order numbers that are not 'T...' invoices
+INVALID_ORDER_CONDITION = "order_no NOT LIKE 'T%'"
+
+
+class TransactionArchiveService:
+    """
+    Set-based removal of Accounts rows.
+
+    Rows are removed in chunks of chunk_size IDs. Each chunk copies its rows
+    into accounts_archive, deletes them, refreshes the fact rows for the days
+    it touched and commits. The service then sleeps for pause seconds so
+    other writers can take the SQLite write lock between chunks.
+    """
+
+    def __init__(self, chunk_size=500, pause=0.05):
+        """
+        Args:
+            chunk_size (int): Transactions removed per transaction; stays below SQLite's parameter limit
+            pause (float): Seconds to sleep between chunks
+        """
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.facts = FactTableService()
+
+    def _id_params(self, ids):
+        placeholders = ', '.join(f':id{n}' for n in range(len(ids)))
+        return placeholders, {f'id{n}': transaction_id for n, transaction_id in enumerate(ids)}
+
+    def _summary(self, where, params):
+        row = db.session.execute(text(f"""
+            SELECT COUNT(*), COUNT(DISTINCT date(transaction_date)), COALESCE(SUM(total_amount), 0)
+            FROM accounts WHERE {where}
+        """), params).one()
+        return {'count': row[0], 'days': row[1], 'total_amount': from_paise(row[2])}
+
+    def _archive_chunk(self, ids, reason):
+        """Archive and delete one chunk of transaction IDs, then commit"""
+        placeholders, params = self._id_params(ids)
+        params.update({'now': datetime.utcnow(), 'reason': reason})
+        columns = ', '.join(ARCHIVE_COLUMNS)
+
+        touched = db.session.execute(text(
+            f'SELECT DISTINCT date(transaction_date), order_no FROM accounts WHERE id IN ({placeholders})'
+        ), params).all()
+        # A transaction archived, restored and removed again keeps only its latest copy
+        db.session.execute(text(f"""
+            INSERT OR REPLACE INTO accounts_archive ({columns}, archived_at, archive_reason)
+            SELECT {columns}, :now, :reason FROM accounts WHERE id IN ({placeholders})
+        """), params)
+        deleted = db.session.execute(text(
+            f'DELETE FROM accounts WHERE id IN ({placeholders})'
+        ), params).rowcount
+        self.facts.refresh_dates(day for day, _ in touched)
+        self.facts.refresh_orders(order_no for _, order_no in touched)
+        db.session.commit()
+        return deleted
+
+    def _yield_lock(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def preview_invalid(self):
+        """What purge_invalid would remove: count, distinct days and total_amount"""
+        return self._summary(INVALID_ORDER_CONDITION, {})
+
+    def purge_invalid(self):
+        """
+        Archive and delete every transaction matching INVALID_ORDER_CONDITION.
+
+        Returns:
+            int: Number of transactions removed
+        """
+        removed = 0
+        while True:
+            ids = db.session.execute(text(
+                f'SELECT id FROM accounts WHERE {INVALID_ORDER_CONDITION} ORDER BY id LIMIT :limit'
+            ), {'limit': self.chunk_size}).scalars().all()
+            if not ids:
+                return removed
+            removed += self._archive_chunk(ids, 'cleanup')
+            self._yield_lock()
+
+    def preview_ids(self, ids):
+        """What purge_ids would remove for these transaction IDs"""
+        ids = sorted({int(i) for i in ids})
+        summary = {'count': 0, 'days': set(), 'total_amount': 0}
+        for offset in range(0, len(ids), self.chunk_size):
+            placeholders, params = self._id_params(ids[offset:offset + self.chunk_size])
+            rows = db.session.execute(text(f"""
+                SELECT date(transaction_date), COUNT(*), COALESCE(SUM(total_amount), 0)
+                FROM accounts WHERE id IN ({placeholders})
+                GROUP BY date(transaction_date)
+            """), params).all()
+            for day, count, total in rows:
+                summary['days'].add(day)
+                summary['count'] += count
+                summary['total_amount'] += total
+        summary['days'] = len(summary['days'])
+        summary['total_amount'] = from_paise(summary['total_amount'])
+        return summary
+
+    def purge_ids(self, ids):
+        """
+        Archive and delete the given transactions.
+
+        Returns:
+            int: Number of transactions removed (IDs that no longer exist are skipped)
+        """
+        ids = sorted({int(i) for i in ids})
+        removed = 0
+        for offset in range(0, len(ids), self.chunk_size):
+            if offset:
+                self._yield_lock()
+            removed += self._archive_chunk(ids[offset:offset + self.chunk_size], 'bulk_delete')
+        return removed
@@ -0,0 +1,378 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from services.version_service import DATABASE_EPOCH, new_epoch
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_STATEMENT = re.compile(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\b', re.IGNORECASE)
+TRANSACTION_STATEMENT = re.compile(r'^\s*(BEGIN(\s+TRANSACTION)?|COMMIT|END(\s+TRANSACTION)?)\s*;\s*$', re.IGNORECASE)
+# Full-text indexes (SearchService's *_fts tables) are not restored from a
+# dump: iterdump writes them through PRAGMA writable_schema and raw shadow
+# table rows, which cannot be replayed into a fresh database. They are
+# recreated and rebuilt from their source tables after the restore.
+FTS_STATEMENT = re.compile(
+    r'''^\s*(CREATE\s+(VIRTUAL\s+)?TABLE|INSERT\s+INTO|CREATE\s+TRIGGER)\s+(IF\s+NOT\s+EXISTS\s+)?'''
+    r'''["'`]?\w+_fts(_\w+)?["'`]?[\s(]''',
+    re.IGNORECASE
+)
+SCHEMA_WRITE_STATEMENT = re.compile(
+    r'^\s*(PRAGMA\s+writable_schema\b|INSERT\s+INTO\s+["\']?sqlite_master\b)', re.IGNORECASE
+)
+BACKUP_NAME_PATTERN = re.compile(r'^database-\d{8}-\d{6}\.db\.(gz|zst)$')
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupService:
+    """
+    Online backups of the SQLite database.
+
+    The snapshot is copied with the SQLite backup API a few pages at a time,
+    sleeping between steps so writers are never blocked for long, then
+    streamed through zstd (or gzip) with a SHA-256 checksum written next to
+    it. Only the newest `keep` backups are retained.
+    """
+
+    def __init__(self, db_path, backup_dir, keep=7, pages=256, step_sleep=0.05):
+        """
+        Args:
+            db_path (str): Path to the live SQLite database
+            backup_dir (str): Folder the compressed backups are written to
+            keep (int): Number of backups to retain
+            pages (int): Pages copied per backup step
+            step_sleep (float): Seconds to sleep between steps
+        """
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.step_sleep = step_sleep
+
+    def create_backup(self):
+        """
+        Snapshot, compress and checksum the database, then apply retention.
+
+        Returns:
+            dict: name, size, sha256, compression and duration_seconds of the new backup
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        started = time.perf_counter()
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        extension = 'zst' if zstandard else 'gz'
+        name = f'database-{stamp}.db.{extension}'
+        snapshot_path = os.path.join(self.backup_dir, f'.{name}.snapshot')
+        partial_path = os.path.join(self.backup_dir, f'.{name}.partial')
+        final_path = os.path.join(self.backup_dir, name)
+
+        try:
+            self._snapshot(snapshot_path)
+            checksum = self._compress(snapshot_path, partial_path)
+            os.replace(partial_path, final_path)
+            with open(self._checksum_path(final_path), 'w') as f:
+                f.write(f'{checksum}  {name}\n')
+        finally:
+            for path in (snapshot_path, partial_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self.prune()
+        duration = time.perf_counter() - started
+        logger.info(f"Backup {name} written in {duration:.1f}s")
+        return {
+            'name': name,
+            'size': os.path.getsize(final_path),
+            'sha256': checksum,
+            'compression': extension,
+            'duration_seconds': round(duration, 2)
+        }
+
+    def _snapshot(self, target_path):
+        """Copy the live database page by page, yielding to writers between steps"""
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(target_path)
+        try:
+            def pause(status, remaining, total):
+                time.sleep(self.step_sleep)
+
+            source.backup(target, pages=self.pages, progress=pause)
+        finally:
+            target.close()
+            source.close()
+
+    def _compress(self, source_path, target_path):
+        """Stream the snapshot into the compressed file and return its SHA-256"""
+        digest = hashlib.sha256()
+
+        class HashingWriter:
+            def __init__(self, raw):
+                self.raw = raw
+
+            def write(self, data):
+                digest.update(data)
+                return self.raw.write(data)
+
+        with open(source_path, 'rb') as src, open(target_path, 'wb') as raw:
+            writer = HashingWriter(raw)
+            if zstandard:
+                compressor = zstandard.ZstdCompressor(level=10, threads=-1)
+                with compressor.stream_writer(writer, closefd=False) as out:
+                    self._copy(src, out)
+            else:
+                with gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=6) as out:
+                    self._copy(src, out)
+
+        return digest.hexdigest()
+
+    def _copy(self, src, out):
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(chunk)
+
+    def _checksum_path(self, backup_path):
+        return backup_path + '.sha256'
+
+    def list_backups(self):
+        """List retained backups, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        backups = []
+        for name in os.listdir(self.backup_dir):
+            if not BACKUP_NAME_PATTERN.match(name):
+                continue
+            path = os.path.join(self.backup_dir, name)
+            checksum = None
+            if os.path.exists(self._checksum_path(path)):
+                with open(self._checksum_path(path)) as f:
+                    checksum = f.read().split()[0]
+            backups.append({
+                'name': name,
+                'size': os.path.getsize(path),
+                'sha256': checksum,
+                'created_at': datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            })
+        return sorted(backups, key=lambda b: b['name'], reverse=True)
+
+    def backup_path(self, name):
+        """Resolve a backup name to its path, rejecting anything else"""
+        if not BACKUP_NAME_PATTERN.match(name or ''):
+            raise ValueError(f"Invalid backup name: {name}")
+        path = os.path.join(self.backup_dir, name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Backup not found: {name}")
+        return path
+
+    def verify_backup(self, name):
+        """Recompute a backup's SHA-256 and compare it with the stored checksum"""
+        path = self.backup_path(name)
+        with open(self._checksum_path(path)) as f:
+            expected = f.read().split()[0]
+
+        return self._file_sha256(path) == expected
+
+    def _file_sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def prune(self):
+        """Delete all but the newest `keep` backups"""
+        removed = []
+        for backup in self.list_backups()[self.keep:]:
+            path = os.path.join(self.backup_dir, backup['name'])
+            os.remove(path)
+            if os.path.exists(self._checksum_path(path)):
+                os.remove(self._checksum_path(path))
+            removed.append(backup['name'])
+        return removed
+
+    def restore_backup(self, path):
+        """
+        Replace the database with a compressed snapshot.
+
+        The snapshot is checksummed (when a .sha256 file is present),
+        decompressed to a temporary file next to the database, integrity
+        checked and only then renamed over the database. The app should be
+        stopped while restoring.
+
+        Args:
+            path (str): Path to a .db.gz or .db.zst backup
+        """
+        if os.path.exists(self._checksum_path(path)):
+            with open(self._checksum_path(path)) as f:
+                expected = f.read().split()[0]
+            if self._file_sha256(path) != expected:
+                raise ValueError(f"Checksum mismatch for {os.path.basename(path)}")
+
+        temp_path = self.db_path + '.restore'
+        try:
+            with open(path, 'rb') as src, open(temp_path, 'wb') as out:
+                if path.endswith('.zst'):
+                    if not zstandard:
+                        raise RuntimeError("The zstandard package is required to restore .zst backups")
+                    with zstandard.ZstdDecompressor().stream_reader(src) as reader:
+                        self._copy(reader, out)
+                else:
+                    with gzip.GzipFile(fileobj=src, mode='rb') as reader:
+                        self._copy(reader, out)
+            self._verify_database(temp_path)
+            self._swap_in(temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def restore_sql_dump(self, path):
+        """
+        Replace the database with the contents of a SQL text dump.
+
+        The dump is read a line at a time and each complete statement is
+        executed as soon as it is read, all inside one transaction with
+        synchronous writes off; CREATE INDEX statements are held back until
+        the data is in. The result is integrity checked and renamed over the
+        database.
+
+        Full-text indexes are left out; run SearchService().ensure_index()
+        against the restored database to recreate and populate them.
+
+        Args:
+            path (str): Path to a SQL dump such as the one written by export_db.py --sql
+        """
+        temp_path = self.db_path + '.restore'
+        try:
+            try:
+                result = self._load_dump(path, temp_path, 'utf-8')
+            except UnicodeDecodeError:
+                # Older dumps were written with the platform's default encoding
+                result = self._load_dump(path, temp_path, 'latin-1')
+            self._verify_database(temp_path)
+            self._swap_in(temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return result
+
+    def _load_dump(self, path, target_path, encoding):
+        """Execute a dump statement by statement into a fresh database at target_path"""
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        statements, indexes = 0, []
+        conn = sqlite3.connect(target_path, isolation_level=None)
+        try:
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('PRAGMA journal_mode=MEMORY')
+            conn.execute('BEGIN')
+            with open(path, 'r', encoding=encoding) as f:
+                for statement in self._iter_statements(f):
+                    if INDEX_STATEMENT.match(statement):
+                        indexes.append(statement)
+                    else:
+                        conn.execute(statement)
+                        statements += 1
+            for statement in indexes:
+                conn.execute(statement)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return {'statements': statements, 'indexes': len(indexes)}
+
+    def _iter_statements(self, lines):
+        """Yield each complete statement of a dump, skipping its BEGIN/COMMIT and full-text indexes"""
+        buffer = []
+        for line in lines:
+            buffer.append(line)
+            statement = ''.join(buffer)
+            if not sqlite3.complete_statement(statement):
+                continue
+            buffer = []
+            if TRANSACTION_STATEMENT.match(statement):
+                continue
+            if FTS_STATEMENT.match(statement) or SCHEMA_WRITE_STATEMENT.match(statement):
+                continue
+            yield statement.strip()
+        if ''.join(buffer).strip():
+            raise ValueError("SQL dump ends with an incomplete statement")
+
+    def check_sql_dump(self, path):
+        """
+        Round-trip check for a SQL dump: load it into a scratch database and
+        compare row counts with the live database, table by table.
+
+        Full-text index tables are not compared since restores rebuild them.
+
+        Returns:
+            dict: 'tables' compared and 'mismatches', {table: (live rows, restored rows)}
+        """
+        scratch_path = path + '.check'
+        try:
+            self._load_dump(path, scratch_path, 'utf-8')
+            self._verify_database(scratch_path)
+            live, restored = self._row_counts(self.db_path), self._row_counts(scratch_path)
+        finally:
+            if os.path.exists(scratch_path):
+                os.remove(scratch_path)
+
+        mismatches = {
+            table: (live.get(table), restored.get(table))
+            for table in set(live) | set(restored)
+            if live.get(table) != restored.get(table)
+        }
+        return {'tables': len(live), 'mismatches': mismatches}
+
+    def _row_counts(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            tables = [
+                name for (name,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )
+                if not re.search(r'_fts(_\w+)?$', name)
+            ]
+            return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+        finally:
+            conn.close()
+
+    def _verify_database(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            raise ValueError(f"Restored database failed integrity check: {result}")
+
+    def _new_epoch(self, path):
+        """Give the restored database a fresh epoch so ETags issued for the old one stop matching"""
+        conn = sqlite3.connect(path)
+        try:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'table_version'").fetchone():
+                conn.execute(
+                    'INSERT OR REPLACE INTO table_version (name, version) VALUES (?, ?)',
+                    (DATABASE_EPOCH, new_epoch())
+                )
+                conn.commit()
+        finally:
+            conn.close()
+
+    def _swap_in(self, temp_path):
+        """Atomically rename the restored file over the live database"""
+        self._new_epoch(temp_path)
+        # A leftover WAL from the old database must not be replayed into the new one
+        for suffix in ('-wal', '-shm', '-journal'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+        os.replace(temp_path, self.db_path)
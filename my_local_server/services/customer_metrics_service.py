@@ -0,0 +1,71 @@
+from datetime import datetime
+from sqlalchemy import text
+from extensions import db
+
+# Outstanding comes from order_receivable, so it already accounts for
+# payments imported after the sales export.
+METRICS_SELECT = """
+    SELECT s.customer_id,
+           COUNT(*),
+           MIN(s.order_date),
+           MAX(s.order_date),
+           COALESCE(SUM(s.net_amount), 0),
+           COALESCE(SUM(r.outstanding), 0),
+           CAST(ROUND(COALESCE(AVG(s.net_amount), 0)) AS INTEGER),
+           :now
+    FROM sales s
+    LEFT JOIN order_receivable r ON r.order_no = s.order_no
+    {where}
+    GROUP BY s.customer_id
+"""
+
+METRICS_COLUMNS = ('customer_id, order_count, first_order_date, last_order_date, '
+                   'total_net, outstanding, avg_ticket, updated_at')
+
+
+class CustomerMetricsService:
+    """
+    Lifetime order count, first and last order date, total net, outstanding
+    balance and average ticket per customer, kept in customer_metrics so
+    campaign filters, the dashboard and the accounting agent read one
+    indexed row instead of grouping all of Sales.
+
+    Amounts are integer paise. Refresh after order_receivable.
+    """
+
+    def refresh_customers(self, customer_ids):
+        """
+        Recompute the metrics rows for the given customers.
+
+        Args:
+            customer_ids (iterable): IDs of customers whose orders or payments changed
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        ids = sorted({int(i) for i in customer_ids if i is not None})
+        # Stay well below SQLite's bound parameter limit
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            placeholders = ', '.join(f':id{n}' for n in range(len(chunk)))
+            params = {f'id{n}': customer_id for n, customer_id in enumerate(chunk)}
+            params['now'] = datetime.utcnow()
+            db.session.execute(text(
+                f'DELETE FROM customer_metrics WHERE customer_id IN ({placeholders})'
+            ), params)
+            db.session.execute(text(
+                f'INSERT INTO customer_metrics ({METRICS_COLUMNS}) ' +
+                METRICS_SELECT.format(where=f'WHERE s.customer_id IN ({placeholders})')
+            ), params)
+
+    def rebuild(self):
+        """
+        Recompute every metrics row in one statement.
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        db.session.execute(text('DELETE FROM customer_metrics'))
+        db.session.execute(text(
+            f'INSERT INTO customer_metrics ({METRICS_COLUMNS}) ' + METRICS_SELECT.format(where='')
+        ), {'now': datetime.utcnow()})
@@ -0,0 +1,126 @@
+import re
+from sqlalchemy import text
+from extensions import db
+
+# Sales text column -> (dimension table, order_service.kind); tags have no kind
+DIMENSION_COLUMNS = {
+    'primary_services': ('service', 'primary'),
+    'topup_service': ('service', 'topup'),
+    'tags': ('tag', None)
+}
+
+_SEPARATORS = re.compile(r'[,;|]')
+_SPACES = re.compile(r'\s+')
+
+
+def split_values(value):
+    """
+    Split a comma-separated POS column into (key, name) pairs.
+
+    Names are stripped and single-spaced; the key is the lowercased name,
+    so 'Dry Clean' and 'dry  clean' intern to the same row. Duplicates
+    within one value are dropped, keeping the first spelling.
+    """
+    pairs = {}
+    for part in _SEPARATORS.split(value or ''):
+        name = _SPACES.sub(' ', part).strip()
+        if name and name.lower() not in pairs:
+            pairs[name.lower()] = name[:100]
+    return list(pairs.items())
+
+
+def _in_params(prefix, values):
+    placeholders = ', '.join(f':{prefix}{n}' for n in range(len(values)))
+    return placeholders, {f'{prefix}{n}': value for n, value in enumerate(values)}
+
+
+class OrderDimensionService:
+    """
+    Keeps order_service and order_tag in step with the free-text
+    primary_services, topup_service and tags columns on Sales.
+
+    Names are interned into the service and tag tables, so service- and
+    tag-level aggregates are joins on integer keys instead of LIKE scans.
+    The text columns stay on Sales as imported.
+    """
+
+    def _intern(self, table, pairs):
+        """IDs for (key, name) pairs in a dimension table, inserting new names"""
+        ids = {}
+        names = {}
+        for key, name in pairs:
+            names.setdefault(key, name)
+        keys = sorted(names)
+        for offset in range(0, len(keys), 500):
+            chunk = keys[offset:offset + 500]
+            db.session.execute(
+                text(f'INSERT OR IGNORE INTO {table} (key, name) VALUES (:key, :name)'),
+                [{'key': key, 'name': names[key]} for key in chunk]
+            )
+            placeholders, params = _in_params('k', chunk)
+            ids.update(db.session.execute(text(
+                f'SELECT key, id FROM {table} WHERE key IN ({placeholders})'
+            ), params).all())
+        return ids
+
+    def refresh_orders(self, order_nos):
+        """
+        Re-parse the service and tag columns of the given orders.
+
+        Args:
+            order_nos (iterable): Order numbers that were inserted or updated
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        orders = sorted({str(o) for o in order_nos if o})
+        columns = ', '.join(DIMENSION_COLUMNS)
+        # Stay well below SQLite's bound parameter limit
+        for offset in range(0, len(orders), 500):
+            placeholders, params = _in_params('o', orders[offset:offset + 500])
+            rows = db.session.execute(text(
+                f'SELECT order_no, {columns} FROM sales WHERE order_no IN ({placeholders})'
+            ), params).mappings().all()
+            db.session.execute(text(f'DELETE FROM order_service WHERE order_no IN ({placeholders})'), params)
+            db.session.execute(text(f'DELETE FROM order_tag WHERE order_no IN ({placeholders})'), params)
+            self._link(rows)
+
+    def rebuild(self):
+        """
+        Re-parse every order.
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        db.session.execute(text('DELETE FROM order_service'))
+        db.session.execute(text('DELETE FROM order_tag'))
+        columns = ', '.join(DIMENSION_COLUMNS)
+        rows = db.session.execute(text(f'SELECT order_no, {columns} FROM sales')).mappings().all()
+        for offset in range(0, len(rows), 5000):
+            self._link(rows[offset:offset + 5000])
+        return len(rows)
+
+    def _link(self, rows):
+        """Insert the link rows for a batch of sales rows"""
+        parsed = {
+            column: [(row['order_no'], split_values(row[column])) for row in rows]
+            for column in DIMENSION_COLUMNS
+        }
+        for column, (dimension, kind) in DIMENSION_COLUMNS.items():
+            pairs = [pair for _, values in parsed[column] for pair in values]
+            if not pairs:
+                continue
+            ids = self._intern(dimension, pairs)
+            if kind:
+                links = [
+                    {'order_no': order_no, 'id': ids[key], 'kind': kind}
+                    for order_no, values in parsed[column] for key, _ in values
+                ]
+                statement = 'INSERT OR IGNORE INTO order_service (order_no, service_id, kind) VALUES (:order_no, :id, :kind)'
+            else:
+                links = [
+                    {'order_no': order_no, 'id': ids[key]}
+                    for order_no, values in parsed[column] for key, _ in values
+                ]
+                statement = 'INSERT OR IGNORE INTO order_tag (order_no, tag_id) VALUES (:order_no, :id)'
+            db.session.execute(text(statement), links)
@@ -0,0 +1,258 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, text
+from extensions import db
+from models import Accounts, Sales, Customer, ExportWatermark
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for analytics exports
+    pa = None
+
+BATCH_SIZE = 10000
+
+# partition_column splits files by month. Triggers on each table record the
+# months touched by inserts, updates and deletes (archives included) in
+# export_partition_change; incremental exports rewrite only those months.
+EXPORT_ENTITIES = {
+    'accounts': {
+        'model': Accounts,
+        'partition_column': 'transaction_date'
+    },
+    'sales': {
+        'model': Sales,
+        'partition_column': 'order_date'
+    },
+    'customers': {
+        'model': Customer,
+        'partition_column': 'created_at'
+    }
+}
+
+UNKNOWN_MONTH = 'unknown'
+
+EXPORT_FORMATS = {'parquet': 'parquet', 'feather': 'arrow'}
+
+
+def _arrow_type(column):
+    python_type = column.type.python_type
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is datetime:
+        return pa.timestamp('us')
+    if python_type is Decimal:
+        # Money columns: exact rupees with paise
+        return pa.decimal128(18, 2)
+    return pa.string()
+
+
+def _next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+
+class ExportService:
+    """
+    Columnar exports of the ledger for offline analytics.
+
+    Rows are streamed from the database in batches straight into Parquet (or
+    Feather) writers, so only one batch is in memory at a time. Directory
+    exports are partitioned by month; incremental runs rewrite only the
+    months changed since the last export of that entity in that format,
+    and remove months whose rows are all gone.
+    """
+
+    def __init__(self, export_dir):
+        """
+        Args:
+            export_dir (str): Folder partitioned exports are written to
+        """
+        self.export_dir = export_dir
+
+    def _change_triggers(self, entity, config):
+        table = config['model'].__tablename__
+        column = config['partition_column']
+
+        def mark(row):
+            return f"""INSERT INTO export_partition_change (entity, month, version)
+                VALUES ('{entity}', COALESCE(strftime('%Y-%m', {row}.{column}), '{UNKNOWN_MONTH}'),
+                        (SELECT COALESCE(MAX(version), 0) + 1 FROM export_partition_change))
+                ON CONFLICT (entity, month) DO UPDATE SET version = excluded.version;"""
+
+        return {
+            f'{table}_export_ai': f'CREATE TRIGGER {table}_export_ai AFTER INSERT ON {table} BEGIN {mark("new")} END',
+            f'{table}_export_ad': f'CREATE TRIGGER {table}_export_ad AFTER DELETE ON {table} BEGIN {mark("old")} END',
+            f'{table}_export_au': f'CREATE TRIGGER {table}_export_au AFTER UPDATE ON {table} BEGIN {mark("old")} {mark("new")} END'
+        }
+
+    def ensure_tracking(self):
+        """(Re)create the triggers that record changed month partitions"""
+        for entity, config in EXPORT_ENTITIES.items():
+            for name, statement in self._change_triggers(entity, config).items():
+                db.session.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+                db.session.execute(text(statement))
+        db.session.commit()
+
+    def _check_available(self, fmt):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Parquet/Feather exports")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    def _entity(self, name):
+        if name not in EXPORT_ENTITIES:
+            raise ValueError(f"Invalid entity. Must be one of: {', '.join(EXPORT_ENTITIES)}")
+        return EXPORT_ENTITIES[name]
+
+    def _schema(self, table):
+        return pa.schema([(column.name, _arrow_type(column)) for column in table.columns])
+
+    def _write(self, query, schema, path, fmt):
+        """Stream a query's rows into a file in batches; returns the row count"""
+        columns = schema.names
+        result = db.session.execute(query, execution_options={'stream_results': True})
+        writer = None
+        rows = 0
+        try:
+            if fmt == 'parquet':
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            else:
+                writer = pa.ipc.new_file(path, schema)
+
+            while True:
+                batch = result.fetchmany(BATCH_SIZE)
+                if not batch:
+                    break
+                arrays = [
+                    pa.array([row[index] for row in batch], type=schema.field(index).type)
+                    for index in range(len(columns))
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows += len(batch)
+        finally:
+            result.close()
+            if writer is not None:
+                writer.close()
+        return rows
+
+    def export_file(self, entity, fmt='parquet'):
+        """
+        Export a whole entity to a single temporary file for download.
+
+        Returns:
+            tuple: (path to the temporary file, row count); the caller deletes the file
+        """
+        self._check_available(fmt)
+        table = self._entity(entity)['model'].__table__
+        handle, path = tempfile.mkstemp(suffix=f'.{EXPORT_FORMATS[fmt]}')
+        os.close(handle)
+        try:
+            rows = self._write(table.select(), self._schema(table), path, fmt)
+        except Exception:
+            os.remove(path)
+            raise
+        return path, rows
+
+    def export_to_directory(self, entity, fmt='parquet', incremental=True):
+        """
+        Write month-partitioned files under export_dir/<entity>/month=YYYY-MM/.
+
+        Args:
+            entity (str): One of EXPORT_ENTITIES
+            fmt (str): 'parquet' or 'feather'
+            incremental (bool): Only rewrite months changed since the last export
+                of this entity in this format
+
+        Returns:
+            dict: entity, format, months written, removed_months, rows written and
+                the change version the export is current to
+        """
+        self._check_available(fmt)
+        config = self._entity(entity)
+        table = config['model'].__table__
+        partition = table.c[config['partition_column']]
+        schema = self._schema(table)
+
+        # Changes made while the export runs get a higher version and are picked up next time
+        version = db.session.execute(text(
+            'SELECT COALESCE(MAX(version), 0) FROM export_partition_change'
+        )).scalar()
+        watermark = db.session.get(ExportWatermark, (entity, fmt))
+        entity_dir = os.path.join(self.export_dir, entity)
+
+        if incremental and watermark:
+            months = db.session.execute(text(
+                'SELECT month FROM export_partition_change WHERE entity = :entity AND version > :version'
+            ), {'entity': entity, 'version': watermark.version}).scalars().all()
+        else:
+            months = [
+                month or UNKNOWN_MONTH
+                for (month,) in db.session.query(func.strftime('%Y-%m', partition)).distinct().all()
+            ]
+            self._remove_partitions_except(entity_dir, months)
+
+        written = 0
+        removed = []
+        for month in sorted(months):
+            if month == UNKNOWN_MONTH:
+                query = table.select().where(partition.is_(None))
+            else:
+                month_start = datetime.strptime(month, '%Y-%m')
+                query = table.select().where(
+                    partition >= month_start, partition < _next_month(month_start)
+                )
+
+            partition_dir = os.path.join(entity_dir, f'month={month}')
+            os.makedirs(partition_dir, exist_ok=True)
+            final_path = os.path.join(partition_dir, f'{entity}-{month}.{EXPORT_FORMATS[fmt]}')
+            partial_path = final_path + '.partial'
+            try:
+                rows = self._write(query.order_by(partition), schema, partial_path, fmt)
+                if rows:
+                    os.replace(partial_path, final_path)
+                    written += rows
+                else:
+                    # Every row of the month was deleted or archived
+                    if os.path.exists(final_path):
+                        os.remove(final_path)
+                    removed.append(month)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+            if not os.listdir(partition_dir):
+                os.rmdir(partition_dir)
+
+        if watermark is None:
+            watermark = ExportWatermark(entity=entity, format=fmt)
+            db.session.add(watermark)
+        watermark.version = version
+        watermark.row_count = written
+        watermark.exported_at = datetime.utcnow()
+        db.session.commit()
+
+        return {
+            'entity': entity,
+            'format': fmt,
+            'months': sorted(set(months) - set(removed)),
+            'removed_months': removed,
+            'rows': written,
+            'version': version
+        }
+
+    def _remove_partitions_except(self, entity_dir, months):
+        """Delete month directories left over from months that no longer have rows"""
+        if not os.path.isdir(entity_dir):
+            return
+        keep = {f'month={month}' for month in months}
+        for name in os.listdir(entity_dir):
+            if name.startswith('month=') and name not in keep:
+                shutil.rmtree(os.path.join(entity_dir, name))
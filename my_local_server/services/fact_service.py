@@ -0,0 +1,237 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from extensions import db
+from services.reconciliation_service import ReconciliationService
+from services.receivable_service import ReceivableService
+from services.customer_metrics_service import CustomerMetricsService
+
+# Descriptions advertised to the accounting agent alongside the schema
+FACT_TABLE_DESCRIPTIONS = {
+    'fact_daily_pnl': 'One row per day: income, expense, transfer, tax, net (income - expense) and transaction_count. Use for any daily P&L question.',
+    'fact_weekly_pnl': 'View over fact_daily_pnl grouped by week (week, week_start, income, expense, transfer, tax, net, transaction_count).',
+    'fact_monthly_pnl': 'View over fact_daily_pnl grouped by month (month as YYYY-MM, income, expense, transfer, tax, net, transaction_count).',
+    'fact_payment_mode_daily': 'One row per day, payment_mode and transaction_type with amount and transaction_count. Use for payment-mode mix.',
+    'fact_customer_balance': 'View over customer_metrics in rupees: one row per customer with customer_code, name, area_location, order_count, total_net, total_paid, outstanding and last_order_date.',
+    'customer_metrics': 'One row per customer with order_count, first_order_date, last_order_date, total_net, outstanding and avg_ticket (amounts in paise). Use for order frequency, recency and lifetime value.',
+    'fact_order_aging': 'View over order_receivable of orders with an outstanding balance (after ledger payments): outstanding in rupees, age_days and age_bucket (0-30, 31-60, 61-90, 90+).'
+}
+
+FACT_VIEWS = {
+    # customer_metrics is the source of truth for per-customer figures; this
+    # keeps the older rupee-denominated name the agent and reports know
+    'fact_customer_balance': """
+        CREATE VIEW IF NOT EXISTS fact_customer_balance AS
+        SELECT m.customer_id,
+               c.customer_code,
+               c.name,
+               c.area_location,
+               m.order_count,
+               m.total_net / 100.0 AS total_net,
+               (m.total_net - m.outstanding) / 100.0 AS total_paid,
+               m.outstanding / 100.0 AS outstanding,
+               m.last_order_date
+        FROM customer_metrics m
+        JOIN customer c ON c.id = m.customer_id
+    """,
+    'fact_weekly_pnl': """
+        CREATE VIEW IF NOT EXISTS fact_weekly_pnl AS
+        SELECT strftime('%Y-W%W', date) AS week,
+               MIN(date) AS week_start,
+               SUM(income) AS income,
+               SUM(expense) AS expense,
+               SUM(transfer) AS transfer,
+               SUM(tax) AS tax,
+               SUM(net) AS net,
+               SUM(transaction_count) AS transaction_count
+        FROM fact_daily_pnl
+        GROUP BY strftime('%Y-W%W', date)
+    """,
+    'fact_monthly_pnl': """
+        CREATE VIEW IF NOT EXISTS fact_monthly_pnl AS
+        SELECT strftime('%Y-%m', date) AS month,
+               SUM(income) AS income,
+               SUM(expense) AS expense,
+               SUM(transfer) AS transfer,
+               SUM(tax) AS tax,
+               SUM(net) AS net,
+               SUM(transaction_count) AS transaction_count
+        FROM fact_daily_pnl
+        GROUP BY strftime('%Y-%m', date)
+    """,
+    'fact_order_aging': """
+        CREATE VIEW IF NOT EXISTS fact_order_aging AS
+        SELECT r.order_no,
+               r.customer_id,
+               c.name AS customer_name,
+               r.area_location,
+               r.order_date,
+               r.due_date,
+               r.outstanding / 100.0 AS outstanding,
+               CAST(julianday('now') - julianday(r.order_date) AS INTEGER) AS age_days,
+               CASE
+                   WHEN julianday('now') - julianday(r.order_date) <= 30 THEN '0-30'
+                   WHEN julianday('now') - julianday(r.order_date) <= 60 THEN '31-60'
+                   WHEN julianday('now') - julianday(r.order_date) <= 90 THEN '61-90'
+                   ELSE '90+'
+               END AS age_bucket
+        FROM order_receivable r
+        JOIN customer c ON c.id = r.customer_id
+        WHERE r.outstanding > 0
+    """
+}
+
+FACT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_accounts_transaction_date ON accounts (transaction_date)',
+    'CREATE INDEX IF NOT EXISTS ix_sales_customer_id ON sales (customer_id)',
+    'CREATE INDEX IF NOT EXISTS ix_sales_order_date ON sales (order_date)',
+    'CREATE INDEX IF NOT EXISTS ix_sales_due_status ON sales (due_date, order_status)',
+    'CREATE INDEX IF NOT EXISTS ix_daily_balances_date ON daily_balances (date)',
+    'CREATE INDEX IF NOT EXISTS ix_accounts_order_no ON accounts (order_no)',
+    'CREATE INDEX IF NOT EXISTS ix_order_service_service ON order_service (service_id, kind, order_no)',
+    'CREATE INDEX IF NOT EXISTS ix_order_tag_tag ON order_tag (tag_id, order_no)',
+    'CREATE INDEX IF NOT EXISTS ix_order_receivable_customer_open ON order_receivable (customer_id, order_date, outstanding) WHERE outstanding > 0',
+    'CREATE INDEX IF NOT EXISTS ix_order_receivable_area_open ON order_receivable (area_location, order_date, outstanding) WHERE outstanding > 0'
+]
+
+
+def _to_date(value):
+    """Normalize a date, datetime or 'YYYY-MM-DD...' string to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class FactTableService:
+    """
+    Maintains the precomputed summary tables the accounting agent queries
+    instead of the raw Accounts, Sales and Customer tables.
+
+    Source amounts are integer paise, so the sums are exact; fact tables
+    store the totals in rupees.
+
+    Refreshes are incremental: only the days or customers touched by a write
+    are recomputed, using range predicates that can use the indexes.
+    """
+
+    def __init__(self):
+        self.channels = ReconciliationService()
+        self.receivables = ReceivableService()
+        self.metrics = CustomerMetricsService()
+
+    def ensure_views(self):
+        """Create the supporting indexes if they are missing and (re)create the fact views"""
+        # Outstanding amounts moved to order_receivable; the sales.balance index only served the old aging view
+        db.session.execute(text('DROP INDEX IF EXISTS ix_sales_outstanding'))
+        for statement in FACT_INDEXES:
+            db.session.execute(text(statement))
+        # fact_customer_balance used to be a table refreshed alongside customer_metrics
+        if db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fact_customer_balance'"
+        )).first():
+            db.session.execute(text('DROP TABLE fact_customer_balance'))
+        # Views hold no data, so they are recreated to pick up definition changes
+        for name, statement in FACT_VIEWS.items():
+            db.session.execute(text(f'DROP VIEW IF EXISTS {name}'))
+            db.session.execute(text(statement))
+        db.session.commit()
+
+    def refresh_dates(self, dates):
+        """
+        Recompute the daily P&L, payment-mode and channel balance rows for the given days.
+
+        Args:
+            dates (iterable): Dates, datetimes or 'YYYY-MM-DD' strings that were touched
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        days = sorted({_to_date(d) for d in dates if d is not None})
+        self._refresh_pnl(days)
+        self.channels.refresh_dates(days)
+
+    def _refresh_pnl(self, days):
+        for day in days:
+            params = {
+                'day': day.isoformat(),
+                'start': day.isoformat(),
+                'end': (day + timedelta(days=1)).isoformat(),
+                'now': datetime.utcnow()
+            }
+            db.session.execute(text('DELETE FROM fact_daily_pnl WHERE date = :day'), params)
+            db.session.execute(text('DELETE FROM fact_payment_mode_daily WHERE date = :day'), params)
+            db.session.execute(text("""
+                INSERT INTO fact_daily_pnl
+                    (date, income, expense, transfer, tax, net, transaction_count, updated_at)
+                SELECT :day,
+                       COALESCE(SUM(CASE WHEN transaction_type = 'Income' THEN total_amount END), 0) / 100.0,
+                       COALESCE(SUM(CASE WHEN transaction_type = 'Expense' THEN total_amount END), 0) / 100.0,
+                       COALESCE(SUM(CASE WHEN transaction_type = 'Transfer' THEN total_amount END), 0) / 100.0,
+                       COALESCE(SUM(tax_amount), 0) / 100.0,
+                       COALESCE(SUM(CASE WHEN transaction_type = 'Income' THEN total_amount
+                                         WHEN transaction_type = 'Expense' THEN -total_amount END), 0) / 100.0,
+                       COUNT(*),
+                       :now
+                FROM accounts
+                WHERE transaction_date >= :start AND transaction_date < :end
+                HAVING COUNT(*) > 0
+            """), params)
+            db.session.execute(text("""
+                INSERT INTO fact_payment_mode_daily
+                    (date, payment_mode, transaction_type, amount, transaction_count)
+                SELECT :day,
+                       COALESCE(payment_mode, 'Unknown'),
+                       COALESCE(transaction_type, 'Unknown'),
+                       COALESCE(SUM(total_amount), 0) / 100.0,
+                       COUNT(*)
+                FROM accounts
+                WHERE transaction_date >= :start AND transaction_date < :end
+                GROUP BY COALESCE(payment_mode, 'Unknown'), COALESCE(transaction_type, 'Unknown')
+            """), params)
+
+    def refresh_orders(self, order_nos):
+        """
+        Recompute the receivable and customer metrics rows for orders whose payments changed.
+
+        Args:
+            order_nos (iterable): Order numbers referenced by the touched transactions
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        customer_ids = self.receivables.refresh_orders(order_nos)
+        self.metrics.refresh_customers(customer_ids)
+
+    def refresh_customers(self, customer_ids):
+        """
+        Recompute the receivable and metrics rows for the given customers.
+
+        Args:
+            customer_ids (iterable): IDs of customers whose orders changed
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        ids = sorted({int(i) for i in customer_ids if i is not None})
+        # Metrics read order_receivable, so it is refreshed first
+        self.receivables.refresh_customers(ids)
+        self.metrics.refresh_customers(ids)
+
+    def rebuild(self):
+        """Rebuild every fact table from scratch and commit"""
+        db.session.execute(text('DELETE FROM fact_daily_pnl'))
+        db.session.execute(text('DELETE FROM fact_payment_mode_daily'))
+
+        days = db.session.execute(text(
+            'SELECT DISTINCT date(transaction_date) FROM accounts WHERE transaction_date IS NOT NULL'
+        )).scalars().all()
+        self._refresh_pnl(sorted(_to_date(day) for day in days))
+        self.channels.rebuild()
+
+        self.receivables.rebuild()
+        self.metrics.rebuild()
+        customers = db.session.execute(text('SELECT COUNT(*) FROM customer_metrics')).scalar()
+
+        db.session.commit()
+        return {'days': len(days), 'customers': customers}
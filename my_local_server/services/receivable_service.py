@@ -0,0 +1,229 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from extensions import db
+from money import from_paise
+
+# Aging buckets by order age in days: (label, lower bound, upper bound or None)
+AGING_BUCKETS = [
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None)
+]
+
+AGING_GROUPS = {
+    'customer': 'customer_id',
+    'area': 'area_location'
+}
+
+# The POS balance only knows payments made before the sales export, and the
+# ledger only knows payments imported since; neither over-reports, so an
+# order owes the smaller of the two, never less than zero.
+RECEIVABLE_SELECT = """
+    SELECT s.order_no, s.customer_id, c.area_location, s.order_date, s.due_date,
+           COALESCE(s.net_amount, 0),
+           COALESCE(p.received, 0),
+           MAX(0, MIN(COALESCE(s.balance, s.net_amount, 0),
+                      COALESCE(s.net_amount, 0) - COALESCE(p.received, 0))),
+           :now
+    FROM sales s
+    JOIN customer c ON c.id = s.customer_id
+    LEFT JOIN (
+        SELECT order_no, SUM(total_amount) AS received
+        FROM accounts
+        WHERE transaction_type = 'Income' AND order_no IS NOT NULL {accounts_filter}
+        GROUP BY order_no
+    ) p ON p.order_no = s.order_no
+    {sales_filter}
+"""
+
+RECEIVABLE_COLUMNS = ('order_no, customer_id, area_location, order_date, due_date, '
+                      'net_amount, received, outstanding, updated_at')
+
+
+def _in_params(prefix, values):
+    placeholders = ', '.join(f':{prefix}{n}' for n in range(len(values)))
+    return placeholders, {f'{prefix}{n}': value for n, value in enumerate(values)}
+
+
+class ReceivableService:
+    """
+    Per-order outstanding amounts in order_receivable, and aging over them.
+
+    Rows are recomputed for the orders a write touches: sales imports
+    refresh a customer's orders, payment imports and ledger edits refresh
+    the orders they reference through the accounts.order_no index. Aging
+    reads only open rows through partial indexes on
+    (customer_id | area_location, order_date).
+
+    Amounts are integer paise in the table and rupees in results.
+    """
+
+    def refresh_orders(self, order_nos):
+        """
+        Recompute the receivable rows for the given orders.
+
+        Args:
+            order_nos (iterable): Order numbers whose sale or payments changed
+
+        Returns:
+            set: IDs of the customers owning those orders
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        orders = sorted({str(o).strip() for o in order_nos if o})
+        customer_ids = set()
+        # Stay well below SQLite's bound parameter limit
+        for offset in range(0, len(orders), 500):
+            placeholders, params = _in_params('o', orders[offset:offset + 500])
+            params['now'] = datetime.utcnow()
+            db.session.execute(text(
+                f'DELETE FROM order_receivable WHERE order_no IN ({placeholders})'
+            ), params)
+            db.session.execute(text(
+                f'INSERT INTO order_receivable ({RECEIVABLE_COLUMNS}) ' + RECEIVABLE_SELECT.format(
+                    accounts_filter=f'AND order_no IN ({placeholders})',
+                    sales_filter=f'WHERE s.order_no IN ({placeholders})'
+                )
+            ), params)
+            customer_ids.update(db.session.execute(text(
+                f'SELECT DISTINCT customer_id FROM order_receivable WHERE order_no IN ({placeholders})'
+            ), params).scalars())
+        return customer_ids
+
+    def refresh_customers(self, customer_ids):
+        """
+        Recompute the receivable rows for every order of the given customers.
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        ids = sorted({int(i) for i in customer_ids if i is not None})
+        for offset in range(0, len(ids), 500):
+            placeholders, params = _in_params('id', ids[offset:offset + 500])
+            order_nos = db.session.execute(text(
+                f'SELECT order_no FROM sales WHERE customer_id IN ({placeholders})'
+            ), params).scalars().all()
+            self.refresh_orders(order_nos)
+
+    def rebuild(self):
+        """
+        Recompute every receivable row in one statement.
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        db.session.execute(text('DELETE FROM order_receivable'))
+        db.session.execute(text(
+            f'INSERT INTO order_receivable ({RECEIVABLE_COLUMNS}) ' +
+            RECEIVABLE_SELECT.format(accounts_filter='', sales_filter='')
+        ), {'now': datetime.utcnow()})
+
+    def aging(self, group_by='customer', as_of=None, min_outstanding=0, limit=100, offset=0):
+        """
+        Outstanding amounts per customer or area, split into aging buckets.
+
+        Args:
+            group_by (str): 'customer' or 'area'
+            as_of (date): Date order ages are measured from (default: today)
+            min_outstanding (int): Only groups owing more than this, in paise
+            limit (int): Maximum number of groups, largest outstanding first
+            offset (int): Number of groups to skip
+
+        Returns:
+            dict: 'buckets' totals over all groups and 'groups', one dict per customer or area
+        """
+        if group_by not in AGING_GROUPS:
+            raise ValueError(f"group_by must be one of: {', '.join(AGING_GROUPS)}")
+        column = AGING_GROUPS[group_by]
+        as_of = as_of or date.today()
+
+        # Bucket bounds become order_date cut-offs so the range checks run on the index
+        params = {'min_outstanding': min_outstanding, 'limit': limit, 'offset': offset}
+        sums = []
+        for n, (label, low, high) in enumerate(AGING_BUCKETS):
+            conditions = []
+            if low:
+                conditions.append(f'order_date < :before{n}')
+                params[f'before{n}'] = (as_of - timedelta(days=low - 1)).isoformat()
+            if high is not None:
+                conditions.append(f'order_date >= :from{n}')
+                params[f'from{n}'] = (as_of - timedelta(days=high)).isoformat()
+            sums.append(f"COALESCE(SUM(CASE WHEN {' AND '.join(conditions)} THEN outstanding END), 0) AS b{n}")
+
+        rows = db.session.execute(text(f"""
+            SELECT {column} AS group_key, COUNT(*) AS order_count, SUM(outstanding) AS outstanding,
+                   {', '.join(sums)}
+            FROM order_receivable
+            WHERE outstanding > 0
+            GROUP BY {column}
+            HAVING SUM(outstanding) > :min_outstanding
+            ORDER BY outstanding DESC
+            LIMIT :limit OFFSET :offset
+        """), params).mappings().all()
+
+        names = {}
+        if group_by == 'customer' and rows:
+            placeholders, id_params = _in_params('id', [row['group_key'] for row in rows])
+            names = {
+                row.id: row for row in db.session.execute(text(
+                    f'SELECT id, customer_code, name, phone FROM customer WHERE id IN ({placeholders})'
+                ), id_params)
+            }
+
+        groups = []
+        for row in rows:
+            group = {
+                'order_count': row['order_count'],
+                'outstanding': from_paise(row['outstanding']),
+                'buckets': {label: from_paise(row[f'b{n}']) for n, (label, _, _) in enumerate(AGING_BUCKETS)}
+            }
+            if group_by == 'customer':
+                customer = names.get(row['group_key'])
+                group.update({
+                    'customer_id': row['group_key'],
+                    'customer_code': customer.customer_code if customer else None,
+                    'name': customer.name if customer else None,
+                    'phone': customer.phone if customer else None
+                })
+            else:
+                group['area_location'] = row['group_key']
+            groups.append(group)
+
+        totals = db.session.execute(text(f"""
+            SELECT COUNT(*) AS order_count, COALESCE(SUM(outstanding), 0) AS outstanding, {', '.join(sums)}
+            FROM order_receivable WHERE outstanding > 0
+        """), params).mappings().one()
+        return {
+            'as_of': as_of.isoformat(),
+            'group_by': group_by,
+            'order_count': totals['order_count'],
+            'outstanding': from_paise(totals['outstanding']),
+            'buckets': {label: from_paise(totals[f'b{n}']) for n, (label, _, _) in enumerate(AGING_BUCKETS)},
+            'groups': groups
+        }
+
+    def open_orders(self, customer_id, as_of=None):
+        """Open orders of one customer, oldest first, with their age in days"""
+        as_of = as_of or date.today()
+        rows = db.session.execute(text("""
+            SELECT order_no, order_date, due_date, net_amount, received, outstanding
+            FROM order_receivable
+            WHERE customer_id = :customer_id AND outstanding > 0
+            ORDER BY order_date
+        """), {'customer_id': customer_id}).mappings().all()
+
+        orders = []
+        for row in rows:
+            order_date = datetime.strptime(str(row['order_date'])[:10], '%Y-%m-%d').date() if row['order_date'] else None
+            orders.append({
+                'order_no': row['order_no'],
+                'order_date': order_date.isoformat() if order_date else None,
+                'due_date': str(row['due_date'])[:10] if row['due_date'] else None,
+                'net_amount': from_paise(row['net_amount']),
+                'received': from_paise(row['received']),
+                'outstanding': from_paise(row['outstanding']),
+                'age_days': (as_of - order_date).days if order_date else None
+            })
+        return orders
@@ -0,0 +1,184 @@
+from datetime import date, timedelta
+from sqlalchemy import text
+from extensions import db
+from constants import PAYMENT_CHANNELS
+from money import from_paise
+
+# DailyBalance column each channel is checked against
+CHANNEL_BALANCE_COLUMNS = {
+    'cash': 'cash_in_hand',
+    'bank': 'bank_balance'
+}
+
+
+def _channel_case():
+    """SQL CASE mapping accounts.payment_mode to its channel (NULL if none)"""
+    whens = ' '.join(
+        f"WHEN payment_mode IN ({', '.join(repr(mode) for mode in modes)}) THEN '{channel}'"
+        for channel, modes in PAYMENT_CHANNELS.items()
+    )
+    return f'CASE {whens} END'
+
+
+# Income adds to a channel and Expense takes from it; Transfers carry no
+# direction in the ledger and are left out.
+CHANNEL_DAY_SQL = f"""
+    SELECT {_channel_case()} AS channel,
+           date(transaction_date) AS day,
+           COALESCE(SUM(CASE WHEN transaction_type = 'Income' THEN total_amount END), 0) AS inflow,
+           COALESCE(SUM(CASE WHEN transaction_type = 'Expense' THEN total_amount END), 0) AS outflow
+    FROM accounts
+    WHERE transaction_date >= :start AND transaction_date < :end
+    GROUP BY channel, day
+    HAVING channel IS NOT NULL
+"""
+
+
+class ReconciliationService:
+    """
+    Running ledger balance per payment channel, kept as a prefix sum in
+    channel_balance, and its comparison against the recorded DailyBalance.
+
+    Refreshing a day recomputes that day's net and shifts the running
+    balance of that day and every later day by the change, so today's
+    writes touch one row per channel. A channel's balance on any date is
+    the latest row on or before it: one primary-key lookup.
+
+    Amounts are integer paise throughout.
+    """
+
+    def refresh_dates(self, dates):
+        """
+        Recompute the channel rows for the given days.
+
+        Args:
+            dates (iterable): date objects that were touched
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        for day in sorted(set(dates)):
+            params = {'start': day.isoformat(), 'end': (day + timedelta(days=1)).isoformat()}
+            totals = {
+                row.channel: (row.inflow, row.outflow)
+                for row in db.session.execute(text(CHANNEL_DAY_SQL), params)
+            }
+            for channel in PAYMENT_CHANNELS:
+                inflow, outflow = totals.get(channel, (0, 0))
+                self._apply_day(channel, day, inflow, outflow)
+
+    def _apply_day(self, channel, day, inflow, outflow):
+        key = {'channel': channel, 'day': day.isoformat()}
+        old_net = db.session.execute(text(
+            'SELECT net FROM channel_balance WHERE channel = :channel AND date = :day'
+        ), key).scalar()
+        delta = (inflow - outflow) - (old_net or 0)
+
+        if old_net is None:
+            if not inflow and not outflow:
+                return
+            previous = db.session.execute(text("""
+                SELECT running_balance FROM channel_balance
+                WHERE channel = :channel AND date < :day
+                ORDER BY date DESC LIMIT 1
+            """), key).scalar() or 0
+            db.session.execute(text("""
+                INSERT INTO channel_balance (channel, date, inflow, outflow, net, running_balance)
+                VALUES (:channel, :day, 0, 0, 0, :previous)
+            """), {**key, 'previous': previous})
+
+        if not inflow and not outflow:
+            # No activity left that day; later rows still carry the shift below
+            db.session.execute(text(
+                'DELETE FROM channel_balance WHERE channel = :channel AND date = :day'
+            ), key)
+        else:
+            db.session.execute(text("""
+                UPDATE channel_balance SET inflow = :inflow, outflow = :outflow, net = :net
+                WHERE channel = :channel AND date = :day
+            """), {**key, 'inflow': inflow, 'outflow': outflow, 'net': inflow - outflow})
+        if delta:
+            db.session.execute(text("""
+                UPDATE channel_balance SET running_balance = running_balance + :delta
+                WHERE channel = :channel AND date >= :day
+            """), {**key, 'delta': delta})
+
+    def rebuild(self):
+        """
+        Recompute every channel row in one pass with a window sum.
+
+        Note:
+            Runs in the caller's transaction; the caller is responsible for committing.
+        """
+        db.session.execute(text('DELETE FROM channel_balance'))
+        db.session.execute(text(f"""
+            INSERT INTO channel_balance (channel, date, inflow, outflow, net, running_balance)
+            SELECT channel, day, inflow, outflow, inflow - outflow,
+                   SUM(inflow - outflow) OVER (PARTITION BY channel ORDER BY day)
+            FROM ({CHANNEL_DAY_SQL})
+            WHERE inflow != 0 OR outflow != 0
+        """), {'start': '0001-01-01', 'end': '9999-12-31'})
+
+    def ledger_balance(self, channel, on_date):
+        """Running ledger balance of a channel at the end of on_date, in paise"""
+        return db.session.execute(text("""
+            SELECT running_balance FROM channel_balance
+            WHERE channel = :channel AND date <= :day
+            ORDER BY date DESC LIMIT 1
+        """), {'channel': channel, 'day': on_date.isoformat()}).scalar() or 0
+
+    def reconcile(self, start, end, tolerance=0):
+        """
+        Compare recorded DailyBalance entries between start and end with the ledger.
+
+        Opening balances are not in the ledger, so each entry is checked on
+        movement: the change in the recorded balance since the previous entry
+        must equal the ledger's net for that channel over the same days.
+        The first entry ever recorded has no previous entry and is not checked.
+
+        Args:
+            start (date): First date to check
+            end (date): Last date to check
+            tolerance (int): Allowed absolute difference in paise
+
+        Returns:
+            list: One dict per DailyBalance entry, with a per-channel breakdown and a mismatch flag
+        """
+        columns = ', '.join(CHANNEL_BALANCE_COLUMNS.values())
+        previous = db.session.execute(text(f"""
+            SELECT date, {columns} FROM daily_balances
+            WHERE date < :start ORDER BY date DESC LIMIT 1
+        """), {'start': start.isoformat()}).mappings().first()
+        entries = db.session.execute(text(f"""
+            SELECT date, {columns} FROM daily_balances
+            WHERE date >= :start AND date <= :end ORDER BY date
+        """), {'start': start.isoformat(), 'end': end.isoformat()}).mappings().all()
+
+        results = []
+        for entry in entries:
+            day = date.fromisoformat(str(entry['date'])[:10])
+            channels = {}
+            mismatch = False
+            for channel, column in CHANNEL_BALANCE_COLUMNS.items():
+                ledger = self.ledger_balance(channel, day)
+                item = {'recorded': from_paise(entry[column]), 'ledger_balance': from_paise(ledger)}
+                if previous is not None:
+                    previous_day = date.fromisoformat(str(previous['date'])[:10])
+                    recorded_movement = entry[column] - previous[column]
+                    ledger_movement = ledger - self.ledger_balance(channel, previous_day)
+                    difference = recorded_movement - ledger_movement
+                    item.update({
+                        'recorded_movement': from_paise(recorded_movement),
+                        'ledger_movement': from_paise(ledger_movement),
+                        'difference': from_paise(difference)
+                    })
+                    mismatch = mismatch or abs(difference) > tolerance
+                channels[channel] = item
+            results.append({
+                'date': day.isoformat(),
+                'since': str(previous['date'])[:10] if previous is not None else None,
+                'channels': channels,
+                'mismatch': mismatch
+            })
+            previous = entry
+        return results
@@ -0,0 +1,182 @@
+import re
+from sqlalchemy import text, column, Integer, String, Float
+from extensions import db
+
+# Trigram tokens need at least three characters; shorter terms fall back to LIKE
+MIN_FTS_LENGTH = 3
+
+# Trigram FTS5 indexes with bm25 column weights. External-content indexes
+# keep the text only in the source table and map to it through an explicit
+# INTEGER PRIMARY KEY. sales has a text key and only an implicit rowid, which
+# VACUUM or a dump restore may renumber, so its index stores order_no itself
+# and is matched back on that.
+SEARCH_INDEXES = {
+    'customer_fts': {
+        'table': 'customer',
+        'rowid': 'id',
+        'columns': ['name', 'customer_code', 'phone'],
+        'weights': [10.0, 5.0, 1.0]
+    },
+    'sales_fts': {
+        'table': 'sales',
+        'key': 'order_no',
+        'columns': ['order_no'],
+        'weights': [1.0]
+    },
+    'accounts_fts': {
+        'table': 'accounts',
+        'rowid': 'id',
+        'columns': ['order_no', 'description', 'notes'],
+        'weights': [10.0, 5.0, 1.0]
+    }
+}
+
+
+def fts_phrase(term, columns=None):
+    """
+    Quote a user search term as a single FTS5 phrase (substring match with
+    trigrams), optionally restricted to some of the indexed columns.
+    """
+    phrase = '"' + term.replace('"', '""') + '"'
+    if columns:
+        return '{' + ' '.join(columns) + '} : ' + phrase
+    return phrase
+
+
+def _bm25(index):
+    weights = ', '.join(str(w) for w in SEARCH_INDEXES[index]['weights'])
+    return f'bm25({index}, {weights})'
+
+
+def fts_rowids(index, term, columns=None):
+    """
+    Subquery of rowids in the source table whose indexed columns contain term.
+
+    Use as Model.id.in_(fts_rowids(...)).
+    """
+    return text(
+        f'SELECT rowid FROM {index} WHERE {index} MATCH :fts_{index}'
+    ).bindparams(**{f'fts_{index}': fts_phrase(term, columns)}).columns(column('rowid', Integer))
+
+
+def fts_ranked(index, term, columns=None):
+    """
+    Subquery of matches with their bm25 rank (lower is better): columns
+    'rowid' for external-content indexes or the stored key (order_no for
+    sales_fts), and 'rank'.
+
+    Join it to the source table and order by .c.rank for best matches first.
+    """
+    config = SEARCH_INDEXES[index]
+    key = config.get('key', 'rowid')
+    key_type = String if 'key' in config else Integer
+    return text(
+        f'SELECT {key}, {_bm25(index)} AS rank FROM {index} WHERE {index} MATCH :fts_{index}'
+    ).bindparams(**{f'fts_{index}': fts_phrase(term, columns)}).columns(
+        column(key, key_type), column('rank', Float)
+    ).subquery(f'{index}_match')
+
+
+class SearchService:
+    """
+    Maintains the trigram FTS5 indexes behind customer, order and
+    transaction search. Triggers on the source tables keep them in sync.
+    """
+
+    def _statements(self, index, config):
+        table = config['table']
+        columns = ', '.join(config['columns'])
+        new_values = ', '.join(f'new.{c}' for c in config['columns'])
+        old_values = ', '.join(f'old.{c}' for c in config['columns'])
+        if 'key' in config:
+            # The index keeps its own copy of the text, matched back on the key
+            key = config['key']
+            return [
+                f"""CREATE VIRTUAL TABLE IF NOT EXISTS {index}
+                    USING fts5({columns}, tokenize='trigram')""",
+                f"""CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+                        INSERT INTO {index}({columns}) VALUES ({new_values});
+                    END""",
+                f"""CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+                        DELETE FROM {index} WHERE {key} = old.{key};
+                    END""",
+                f"""CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {columns} ON {table} BEGIN
+                        DELETE FROM {index} WHERE {key} = old.{key};
+                        INSERT INTO {index}({columns}) VALUES ({new_values});
+                    END"""
+            ]
+        rowid = config['rowid']
+        return [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {index}
+                USING fts5({columns}, content='{table}', content_rowid='{rowid}', tokenize='trigram')""",
+            f"""CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {index}(rowid, {columns}) VALUES (new.{rowid}, {new_values});
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.{rowid}, {old_values});
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {columns} ON {table} BEGIN
+                    INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.{rowid}, {old_values});
+                    INSERT INTO {index}(rowid, {columns}) VALUES (new.{rowid}, {new_values});
+                END"""
+        ]
+
+    def _signature(self, sql):
+        return re.sub(r'\s+|if not exists', '', (sql or '').lower())
+
+    def _drop(self, index):
+        for suffix in ('ai', 'ad', 'au'):
+            db.session.execute(text(f'DROP TRIGGER IF EXISTS {index}_{suffix}'))
+        db.session.execute(text(f'DROP TABLE IF EXISTS {index}'))
+
+    def _populate(self, index, config):
+        if 'key' in config:
+            columns = ', '.join(config['columns'])
+            db.session.execute(text(f'DELETE FROM {index}'))
+            db.session.execute(text(f"INSERT INTO {index}({columns}) SELECT {columns} FROM {config['table']}"))
+        else:
+            db.session.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+    def ensure_index(self):
+        """
+        Create the FTS tables and sync triggers if they are missing.
+
+        An index whose definition changed is dropped and recreated. Newly
+        created indexes are populated from their source tables.
+        """
+        existing = dict(db.session.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'"
+        )).all())
+        for index, config in SEARCH_INDEXES.items():
+            statements = self._statements(index, config)
+            if index in existing and self._signature(existing[index]) != self._signature(statements[0]):
+                self._drop(index)
+                del existing[index]
+            for statement in statements:
+                db.session.execute(text(statement))
+            if index not in existing:
+                self._populate(index, config)
+        db.session.commit()
+
+    def rebuild(self):
+        """Repopulate every FTS index from its source table"""
+        for index, config in SEARCH_INDEXES.items():
+            self._populate(index, config)
+        db.session.commit()
+
+    def search_customers(self, term, limit=10):
+        """
+        Customers whose name, code or phone contains term, best matches first.
+
+        Returns:
+            list: dicts with id, name, customer_code and phone
+        """
+        rows = db.session.execute(text(f"""
+            SELECT c.id, c.name, c.customer_code, c.phone
+            FROM customer_fts
+            JOIN customer c ON c.id = customer_fts.rowid
+            WHERE customer_fts MATCH :term
+            ORDER BY {_bm25('customer_fts')}
+            LIMIT :limit
+        """), {'term': fts_phrase(term), 'limit': limit}).mappings().all()
+        return [dict(row) for row in rows]
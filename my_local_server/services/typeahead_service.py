@@ -0,0 +1,127 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from sqlalchemy import text
+from extensions import db
+from services.version_service import TableVersionService, DATABASE_EPOCH
+
+
+def _tokens(name, code, phone_e164):
+    """Normalized prefix keys for one customer: name words, code and phone digits"""
+    tokens = {word for word in (name or '').lower().split()}
+    if code:
+        tokens.add(code.lower())
+    if phone_e164:
+        # Counter staff type the 10-digit mobile number, not the country code
+        tokens.add(phone_e164[-10:])
+        tokens.add(phone_e164[1:])
+    return tokens
+
+
+class CustomerTypeahead:
+    """
+    Per-process prefix index over customer names, codes and phone numbers.
+
+    Keys are kept in one sorted list with a parallel array of customer IDs,
+    so a lookup is a bisect plus a short scan. The index is rebuilt when the
+    customer version in table_version changes; the version is checked at
+    most once every check_interval seconds. Without a version row (tracking
+    not set up) the index is simply rebuilt every check_interval seconds.
+    """
+
+    def __init__(self, check_interval=2.0):
+        """
+        Args:
+            check_interval (float): Seconds between version checks against the database
+        """
+        self.check_interval = check_interval
+        self.version = None
+        self._loaded = False
+        self._keys = []
+        self._ids = array('l')
+        self._customers = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.versions = TableVersionService()
+
+    def _current_version(self):
+        """(database epoch, customer version), or None when customer is not tracked"""
+        versions = self.versions.get_versions(['customer', DATABASE_EPOCH])
+        if versions['customer'] is None:
+            return None
+        return versions[DATABASE_EPOCH], versions['customer']
+
+    def refresh(self, force=False):
+        """Rebuild the index if the customer table changed since the last load"""
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.check_interval:
+            return
+
+        # Another request is already rebuilding; keep serving the current index
+        if not self._lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if not force and self._loaded and now - self._checked_at < self.check_interval:
+                # Rebuilt by the request that held the lock
+                return
+            self._checked_at = now
+            version = self._current_version()
+            if not force and self._loaded and version is not None and version == self.version:
+                return
+
+            rows = db.session.execute(text(
+                'SELECT id, name, customer_code, phone, phone_e164 FROM customer'
+            )).all()
+            pairs = []
+            customers = {}
+            for customer_id, name, code, phone, phone_e164 in rows:
+                customers[customer_id] = (name, code, phone)
+                pairs.extend((token, customer_id) for token in _tokens(name, code, phone_e164))
+            pairs.sort()
+
+            # Swap in the new structures together
+            self._keys = [token for token, _ in pairs]
+            self._ids = array('l', (customer_id for _, customer_id in pairs))
+            self._customers = customers
+            self.version = version
+            self._loaded = True
+        finally:
+            self._lock.release()
+
+    def search(self, query, limit=10):
+        """
+        Customers with a name word, code or phone number starting with query.
+
+        Every word in the query must prefix one of the customer's name words,
+        so 'ravi ku' finds 'Ravi Kumar'.
+
+        Returns:
+            list: dicts with id, name, customer_code and phone
+        """
+        self.refresh()
+        words = query.lower().split()
+        if not words:
+            return []
+        if words[0].startswith('+'):
+            words[0] = words[0][1:]
+
+        keys, ids, customers = self._keys, self._ids, self._customers
+        first, rest = words[0], words[1:]
+        results = []
+        seen = set()
+        index = bisect_left(keys, first)
+        while index < len(keys) and keys[index].startswith(first) and len(results) < limit:
+            customer_id = ids[index]
+            index += 1
+            if customer_id in seen or customer_id not in customers:
+                continue
+            seen.add(customer_id)
+
+            name, code, phone = customers[customer_id]
+            if rest:
+                name_words = (name or '').lower().split()
+                if not all(any(w.startswith(word) for w in name_words) for word in rest):
+                    continue
+            results.append({'id': customer_id, 'name': name, 'customer_code': code, 'phone': phone})
+        return results
@@ -0,0 +1,60 @@
+import secrets
+from sqlalchemy import text
+from extensions import db
+
+# Tables whose writes are counted in table_version. SQLite triggers do the
+# counting, so ORM writes, bulk imports and raw SQL are all covered.
+VERSIONED_TABLES = ['customer', 'employee', 'sales', 'daily_balances']
+
+# A table_version row holding a random token that changes whenever the whole
+# database file is replaced (BackupService restores). A restored file brings
+# back older counters with different data, so validators must include it.
+DATABASE_EPOCH = 'database_epoch'
+
+
+def new_epoch():
+    return secrets.randbits(62)
+
+
+class TableVersionService:
+    """Change counters used for cache invalidation and HTTP ETags"""
+
+    def _triggers(self, table):
+        bump = f"UPDATE table_version SET version = version + 1 WHERE name = '{table}';"
+        return {
+            f'{table}_version_ai': f'CREATE TRIGGER {table}_version_ai AFTER INSERT ON {table} BEGIN {bump} END',
+            f'{table}_version_ad': f'CREATE TRIGGER {table}_version_ad AFTER DELETE ON {table} BEGIN {bump} END',
+            f'{table}_version_au': f'CREATE TRIGGER {table}_version_au AFTER UPDATE ON {table} BEGIN {bump} END'
+        }
+
+    def ensure_tracking(self):
+        """Create the version rows and the database epoch, and (re)create the triggers"""
+        db.session.execute(text(
+            'INSERT OR IGNORE INTO table_version (name, version) VALUES (:name, :epoch)'
+        ), {'name': DATABASE_EPOCH, 'epoch': new_epoch()})
+        for table in VERSIONED_TABLES:
+            db.session.execute(text(
+                'INSERT OR IGNORE INTO table_version (name, version) VALUES (:name, 0)'
+            ), {'name': table})
+            for name, statement in self._triggers(table).items():
+                db.session.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+                db.session.execute(text(statement))
+        db.session.commit()
+
+    def get_version(self, table):
+        """Current change counter for a table, or None if it is not tracked"""
+        return db.session.execute(text(
+            'SELECT version FROM table_version WHERE name = :name'
+        ), {'name': table}).scalar()
+
+    def get_versions(self, tables):
+        """Versions for several tables in one query; untracked tables map to None"""
+        versions = {table: None for table in tables}
+        if not tables:
+            return versions
+        placeholders = ', '.join(f':t{n}' for n in range(len(tables)))
+        rows = db.session.execute(text(
+            f'SELECT name, version FROM table_version WHERE name IN ({placeholders})'
+        ), {f't{n}': table for n, table in enumerate(tables)}).all()
+        versions.update(dict(rows))
+        return versions
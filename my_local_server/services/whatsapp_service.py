@@ -1,9 +1,12 @@
+import logging
 import requests
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class WhatsAppService:
     def __init__(self):
         self.api_url = "https://graph.facebook.com/v17.0"
@@ -32,7 +35,7 @@ class WhatsAppService:
             )
             return response.json()
         except Exception as e:
-            print(f"Error sending WhatsApp message: {str(e)}")
+            logger.error(f"Error sending WhatsApp message: {str(e)}")
             return None
 
     def send_template_message(self, to_phone, template_name, language_code="en", components=None):
@@ -64,5 +67,5 @@ class WhatsAppService:
             )
             return response.json()
         except Exception as e:
-            print(f"Error sending template message: {str(e)}")
+            logger.error(f"Error sending template message: {str(e)}")
             return None 
\ No newline at end of file
@@ -0,0 +1,142 @@
+import threading
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from extensions import db
+from constants import WORKSHOP_OPEN_STATUSES
+from services.version_service import TableVersionService, DATABASE_EPOCH
+
+MAX_WORKLOAD_DAYS = 90
+
+# Open orders by due date; the range and status checks run on ix_sales_due_status
+OPEN_ORDERS_FILTER = "(order_status IS NULL OR order_status IN ({statuses}))".format(
+    statuses=', '.join(repr(status) for status in WORKSHOP_OPEN_STATUSES)
+)
+
+
+class WorkloadService:
+    """
+    Pieces and weight the workshop must finish per day and per service,
+    from the due dates of open orders.
+
+    The load matrix is built with NumPy (np.add.at over day and service
+    codes) and cached per process. The cache is dropped when the date
+    changes or the sales version in table_version moves, so an import
+    is reflected on the next request.
+
+    Services come from order_service (kind 'primary'). An order listing
+    several primary services counts its full pieces and weight under each
+    of them, since every service handles every piece; daily totals count
+    each order once.
+    """
+
+    def __init__(self):
+        self.versions = TableVersionService()
+        self._cache = {}
+        self._cache_key = None
+        self._lock = threading.Lock()
+
+    def forecast(self, start=None, days=14):
+        """
+        Daily load matrix for the days from start, plus overdue orders.
+
+        Args:
+            start (date): First due date to include (default: today)
+            days (int): Number of days, at most MAX_WORKLOAD_DAYS
+
+        Returns:
+            dict: 'dates', 'services', 'pieces' and 'weight' matrices (one row per date),
+                  daily 'totals' and 'overdue' counts
+        """
+        today = date.today()
+        start = start or today
+        days = max(1, min(int(days), MAX_WORKLOAD_DAYS))
+
+        versions = self.versions.get_versions(['sales', DATABASE_EPOCH])
+        cache_key = (today, versions[DATABASE_EPOCH], versions['sales'])
+        with self._lock:
+            if cache_key != self._cache_key:
+                self._cache = {}
+                self._cache_key = cache_key
+            result = self._cache.get((start, days))
+        if result is None:
+            result = self._build(start, days, today)
+            with self._lock:
+                if cache_key == self._cache_key:
+                    self._cache[(start, days)] = result
+        return result
+
+    def _build(self, start, days, today):
+        end = start + timedelta(days=days)
+        params = {'start': start.isoformat(), 'end': end.isoformat()}
+        rows = db.session.execute(text(f"""
+            SELECT order_no, due_date, pieces, weight
+            FROM sales
+            WHERE due_date >= :start AND due_date < :end AND {OPEN_ORDERS_FILTER}
+        """), params).all()
+        orders = pd.DataFrame(rows, columns=['order_no', 'due_date', 'pieces', 'weight'])
+        links = db.session.execute(text(f"""
+            SELECT s.order_no, sv.name
+            FROM sales s
+            JOIN order_service os ON os.order_no = s.order_no AND os.kind = 'primary'
+            JOIN service sv ON sv.id = os.service_id
+            WHERE s.due_date >= :start AND s.due_date < :end AND {OPEN_ORDERS_FILTER}
+        """), params).all()
+        links = pd.DataFrame(links, columns=['order_no', 'service'])
+
+        dates = [start + timedelta(days=n) for n in range(days)]
+        if orders.empty:
+            services = []
+            pieces = weight = np.zeros((days, 0))
+            order_counts = np.zeros(days, dtype=np.int64)
+            piece_totals = weight_totals = np.zeros(days)
+        else:
+            orders['pieces'] = pd.to_numeric(orders['pieces'], errors='coerce').fillna(0)
+            orders['weight'] = pd.to_numeric(orders['weight'], errors='coerce').fillna(0.0)
+            due = pd.to_datetime(orders['due_date'].astype(str).str[:10])
+            orders['day'] = (due - pd.Timestamp(start)).dt.days
+
+            # Daily totals count each order once
+            order_counts = np.bincount(orders['day'], minlength=days)
+            piece_totals = np.bincount(orders['day'], weights=orders['pieces'], minlength=days)
+            weight_totals = np.bincount(orders['day'], weights=orders['weight'], minlength=days)
+
+            by_service = orders[['order_no', 'day', 'pieces', 'weight']].merge(links, on='order_no', how='left')
+            by_service['service'] = by_service['service'].fillna('Unspecified')
+            codes, uniques = pd.factorize(by_service['service'], sort=True)
+            services = list(uniques)
+            pieces = np.zeros((days, len(services)))
+            weight = np.zeros((days, len(services)))
+            np.add.at(pieces, (by_service['day'].to_numpy(), codes), by_service['pieces'].to_numpy())
+            np.add.at(weight, (by_service['day'].to_numpy(), codes), by_service['weight'].to_numpy())
+
+        return {
+            'start': start.isoformat(),
+            'days': days,
+            'dates': [day.isoformat() for day in dates],
+            'services': services,
+            'pieces': pieces.astype(np.int64).tolist(),
+            'weight': np.round(weight, 2).tolist(),
+            'totals': {
+                'orders': order_counts.tolist(),
+                'pieces': piece_totals.astype(np.int64).tolist(),
+                'weight': np.round(weight_totals, 2).tolist()
+            },
+            'overdue': self._overdue(today)
+        }
+
+    def _overdue(self, today):
+        """Open orders whose due date has passed"""
+        row = db.session.execute(text(f"""
+            SELECT COUNT(*) AS orders, COALESCE(SUM(pieces), 0) AS pieces,
+                   COALESCE(SUM(weight), 0) AS weight, MIN(due_date) AS oldest_due_date
+            FROM sales
+            WHERE due_date < :today AND {OPEN_ORDERS_FILTER}
+        """), {'today': today.isoformat()}).mappings().one()
+        return {
+            'orders': row['orders'],
+            'pieces': int(row['pieces']),
+            'weight': round(float(row['weight']), 2),
+            'oldest_due_date': str(row['oldest_due_date'])[:10] if row['oldest_due_date'] else None
+        }
@@ -0,0 +1,413 @@
+import re
+from datetime import date, timedelta
+
+# Known-good, index-friendly queries for the questions the accounting agent
+# sees most often. Every date filter is a plain range on an indexed column
+# (fact table date keys, accounts.transaction_date, sales.order_date);
+# outstanding amounts read the open rows of order_receivable.
+SQL_TEMPLATES = {
+    'pnl_by_period': {
+        'description': 'Income, expense and net profit',
+        'numeric': False,
+        'sql': {
+            'day': """
+                SELECT date AS period, income, expense, net, transaction_count
+                FROM fact_daily_pnl
+                WHERE date >= :start AND date < :end
+                ORDER BY date
+            """,
+            'week': """
+                SELECT strftime('%Y-W%W', date) AS period, MIN(date) AS period_start,
+                       SUM(income) AS income, SUM(expense) AS expense, SUM(net) AS net,
+                       SUM(transaction_count) AS transaction_count
+                FROM fact_daily_pnl
+                WHERE date >= :start AND date < :end
+                GROUP BY strftime('%Y-W%W', date)
+                ORDER BY period
+            """,
+            'month': """
+                SELECT strftime('%Y-%m', date) AS period,
+                       SUM(income) AS income, SUM(expense) AS expense, SUM(net) AS net,
+                       SUM(transaction_count) AS transaction_count
+                FROM fact_daily_pnl
+                WHERE date >= :start AND date < :end
+                GROUP BY strftime('%Y-%m', date)
+                ORDER BY period
+            """
+        }
+    },
+    'total_for_period': {
+        'description': 'Totals',
+        'numeric': True,
+        'sql': """
+            SELECT COALESCE(SUM(income), 0) AS income,
+                   COALESCE(SUM(expense), 0) AS expense,
+                   COALESCE(SUM(net), 0) AS net,
+                   COALESCE(SUM(transaction_count), 0) AS transaction_count
+            FROM fact_daily_pnl
+            WHERE date >= :start AND date < :end
+        """
+    },
+    'category_breakdown': {
+        'description': '{transaction_type} by category',
+        'numeric': False,
+        'sql': """
+            SELECT category, SUM(total_amount) / 100.0 AS total, COUNT(*) AS transaction_count
+            FROM accounts
+            WHERE transaction_date >= :start AND transaction_date < :end
+              AND transaction_type = :transaction_type
+            GROUP BY category
+            ORDER BY total DESC
+        """
+    },
+    'payment_mode_split': {
+        'description': '{transaction_type} by payment mode',
+        'numeric': False,
+        # "Cash vs UPI" without a type is a question about collections
+        'default_transaction_type': 'Income',
+        'sql': """
+            SELECT payment_mode, SUM(amount) AS total, SUM(transaction_count) AS transaction_count
+            FROM fact_payment_mode_daily
+            WHERE date >= :start AND date < :end
+              AND transaction_type = :transaction_type
+            GROUP BY payment_mode
+            ORDER BY total DESC
+        """
+    },
+    'top_customers': {
+        'description': 'Top customers by net order value',
+        'numeric': False,
+        'sql': """
+            SELECT c.customer_code, c.name, COUNT(*) AS orders, SUM(s.net_amount) / 100.0 AS total_net
+            FROM sales s
+            JOIN customer c ON c.id = s.customer_id
+            WHERE s.order_date >= :start AND s.order_date < :end
+            GROUP BY s.customer_id
+            ORDER BY total_net DESC
+            LIMIT :limit
+        """
+    },
+    'service_breakdown': {
+        'description': 'Orders and order value by service',
+        'numeric': False,
+        'sql': """
+            SELECT sv.name AS service, COUNT(*) AS orders, SUM(s.net_amount) / 100.0 AS total_net
+            FROM sales s
+            JOIN order_service os ON os.order_no = s.order_no AND os.kind = 'primary'
+            JOIN service sv ON sv.id = os.service_id
+            WHERE s.order_date >= :start AND s.order_date < :end
+            GROUP BY os.service_id
+            ORDER BY total_net DESC
+        """
+    },
+    'tag_breakdown': {
+        'description': 'Orders and order value by tag',
+        'numeric': False,
+        'sql': """
+            SELECT t.name AS tag, COUNT(*) AS orders, SUM(s.net_amount) / 100.0 AS total_net
+            FROM sales s
+            JOIN order_tag ot ON ot.order_no = s.order_no
+            JOIN tag t ON t.id = ot.tag_id
+            WHERE s.order_date >= :start AND s.order_date < :end
+            GROUP BY ot.tag_id
+            ORDER BY total_net DESC
+        """
+    },
+    'outstanding_balances': {
+        'description': 'Customers with outstanding balances',
+        'numeric': False,
+        'dated': False,
+        'sql': """
+            SELECT c.customer_code, c.name, c.area_location, COUNT(*) AS open_orders,
+                   SUM(r.outstanding) / 100.0 AS outstanding, MAX(r.order_date) AS last_order_date
+            FROM order_receivable r
+            JOIN customer c ON c.id = r.customer_id
+            WHERE r.outstanding > 0
+            GROUP BY r.customer_id
+            ORDER BY outstanding DESC
+            LIMIT :limit
+        """
+    }
+}
+
+# Checked in order; the first intent whose pattern matches and that
+# accounts for the whole question wins
+INTENT_PATTERNS = [
+    ('outstanding_balances', re.compile(
+        r'\b(outstanding|owes?|owing|unpaid|receivables?|pending payments?|dues)\b')),
+    ('service_breakdown', re.compile(
+        r'\b(by|per|each|which|top)\s+services?\b|\bservices?\s+(wise|revenue|sales|mix|breakdown)\b')),
+    ('tag_breakdown', re.compile(
+        r'\b(by|per|each|which)\s+tags?\b|\btags?\s+(wise|revenue|sales|breakdown)\b')),
+    ('top_customers', re.compile(
+        r'\b(top|best|biggest|largest)\b(\s+\d+)?\s+customers?\b')),
+    ('payment_mode_split', re.compile(
+        r'\b(payment (modes?|methods?|split|mix)|mode of payment|cash vs|by payment)\b')),
+    ('category_breakdown', re.compile(
+        r'\b(categor(y|ies)|breakdown)\b')),
+    ('total_for_period', re.compile(
+        r'^\s*(what|how much)\b.*\b(total|income|revenue|expenses?|profit|net)\b')),
+    ('pnl_by_period', re.compile(
+        r'\b(analy[sz]e|transactions|revenue|income|sales|profit|p\s*&\s*l|expenses?|trend)\b')),
+]
+
+# A match only stands when every word of the question is accounted for:
+# a period or grain phrase, a word in COMMON_WORDS, or a word of the
+# matched intent. Anything else (a customer code, an employee, a category
+# name, a filter) needs model-generated SQL.
+COMMON_WORDS = {
+    'what', 'whats', "what's", 'how', 'much', 'is', 'was', 'were', 'are', 'the', 'a', 'an',
+    'me', 'show', 'give', 'list', 'get', 'tell', 'display', 'see', 'all', 'my', 'our', 'we',
+    'i', 'us', 'you', 'can', 'please', 'for', 'in', 'of', 'over', 'during', 'and', 'to',
+    'did', 'do', 'does', 'been', 'has', 'have', 'had'
+}
+
+INTENT_WORDS = {
+    'outstanding_balances': {
+        'outstanding', 'owe', 'owes', 'owing', 'unpaid', 'receivable', 'receivables', 'pending',
+        'payment', 'payments', 'dues', 'due', 'balance', 'balances', 'customer', 'customers',
+        'who', 'which', 'money', 'amount', 'amounts', 'most', 'top', 'largest', 'biggest', 'highest'
+    },
+    'service_breakdown': {
+        'by', 'per', 'each', 'which', 'top', 'service', 'services', 'wise', 'revenue', 'sales',
+        'income', 'mix', 'breakdown', 'order', 'orders', 'value', 'popular', 'most'
+    },
+    'tag_breakdown': {
+        'by', 'per', 'each', 'which', 'tag', 'tags', 'wise', 'revenue', 'sales', 'income',
+        'breakdown', 'order', 'orders', 'value'
+    },
+    'top_customers': {
+        'top', 'best', 'biggest', 'largest', 'customer', 'customers', 'who', 'by', 'revenue',
+        'sales', 'spend', 'spending', 'value', 'order', 'orders', 'net'
+    },
+    'payment_mode_split': {
+        'payment', 'payments', 'mode', 'modes', 'method', 'methods', 'split', 'mix', 'by',
+        'cash', 'vs', 'versus', 'upi', 'card', 'bank', 'online', 'income', 'revenue', 'sales',
+        'received', 'collection', 'collections', 'expense', 'expenses', 'spent', 'spend'
+    },
+    'category_breakdown': {
+        'category', 'categories', 'breakdown', 'by', 'per', 'each', 'wise', 'expense', 'expenses',
+        'spending', 'spent', 'income', 'revenue', 'sales'
+    },
+    'total_for_period': {
+        'total', 'income', 'revenue', 'sales', 'expense', 'expenses', 'profit', 'loss', 'net',
+        'earn', 'earned', 'make', 'made', 'spend', 'spent', 'money'
+    },
+    'pnl_by_period': {
+        'analyze', 'analyse', 'analysis', 'transactions', 'revenue', 'income', 'sales', 'profit',
+        'loss', 'pnl', 'expense', 'expenses', 'net', 'trend', 'trends', 'summary', 'overview'
+    },
+}
+
+PERIOD_PATTERN = re.compile(r'\b(?:past|last|previous)\s+(\d+)\s+(day|week|month)s?\b')
+LIMIT_PATTERN = re.compile(r'\b(?:top|best|biggest|largest)\s+(\d+)\b')
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30}
+INCOME_PATTERN = re.compile(r'\b(income|revenue|sales|received|collections?)\b')
+EXPENSE_PATTERN = re.compile(r'\b(expenses?|spent|spend|spending)\b')
+
+# Phrases _resolve_period and _resolve_grain understand; only these are
+# dropped before the unmatched-word check
+PERIOD_PHRASES = re.compile(
+    r'\b(today|yesterday|this week|(?:last|past|previous) week|this month|last month|this year|'
+    r'to date|all time|overall)\b'
+)
+GRAIN_PHRASES = re.compile(
+    r'\b(daily|weekly|monthly|(?:per|each|by) (?:day|week|month)|(?:day|week|month)[- ]wise)\b'
+)
+
+
+class TemplateMatch:
+    """A question resolved to a template, its SQL and bound parameters"""
+
+    def __init__(self, name, sql, params, numeric, description, dated=True):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self.numeric = numeric
+        self.description = description
+        self.dated = dated
+
+    @property
+    def title(self):
+        if not self.dated:
+            return self.description
+        return f"{self.description} for {self.params['start']} to {self.params['last_day']}"
+
+
+def _resolve_period(question, today):
+    """
+    Work out the date range and grain a question refers to.
+
+    Returns:
+        tuple: (start date, exclusive end date, grain of 'day', 'week' or 'month')
+    """
+    end = today + timedelta(days=1)
+
+    if re.search(r'\btoday\b', question):
+        return today, end, 'day'
+    if re.search(r'\byesterday\b', question):
+        return today - timedelta(days=1), today, 'day'
+    if re.search(r'\bthis week\b', question):
+        return today - timedelta(days=today.weekday()), end, 'day'
+    if re.search(r'\b(last|past|previous) week\b', question):
+        this_week = today - timedelta(days=today.weekday())
+        return this_week - timedelta(days=7), this_week, 'day'
+    if re.search(r'\bthis month\b', question):
+        return today.replace(day=1), end, 'day'
+    if re.search(r'\blast month\b', question):
+        this_month = today.replace(day=1)
+        return (this_month - timedelta(days=1)).replace(day=1), this_month, 'month'
+    if re.search(r'\bthis year\b', question):
+        return today.replace(month=1, day=1), end, 'month'
+    if re.search(r'\b(to date|all time|overall)\b', question):
+        return date(2000, 1, 1), end, 'month'
+
+    match = PERIOD_PATTERN.search(question)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        return today - timedelta(days=count * UNIT_DAYS[unit] - 1), end, unit
+
+    return today - timedelta(days=29), end, 'day'
+
+
+def _resolve_grain(question, default):
+    if re.search(r'\b(daily|per day|each day|by day|day-wise|day wise)\b', question):
+        return 'day'
+    if re.search(r'\b(weekly|per week|each week|by week|week-wise|week wise)\b', question):
+        return 'week'
+    if re.search(r'\b(monthly|per month|each month|by month|month-wise|month wise)\b', question):
+        return 'month'
+    return default
+
+
+def _resolve_transaction_type(text):
+    """'Income' or 'Expense' when the question names exactly one of them, else None"""
+    is_income = bool(INCOME_PATTERN.search(text))
+    is_expense = bool(EXPENSE_PATTERN.search(text))
+    if is_income == is_expense:
+        return None
+    return 'Income' if is_income else 'Expense'
+
+
+def _unmatched_words(text, name, uses_limit):
+    """Words of the question that neither the period nor the intent accounts for"""
+    text = PERIOD_PATTERN.sub(' ', text)
+    text = PERIOD_PHRASES.sub(' ', text)
+    text = GRAIN_PHRASES.sub(' ', text)
+    if uses_limit:
+        text = LIMIT_PATTERN.sub(' ', text)
+    text = re.sub(r'\bp\s*&\s*l\b', 'pnl', text)
+    allowed = COMMON_WORDS | INTENT_WORDS[name]
+    return [word for word in re.findall(r"[a-z0-9&']+", text) if word not in allowed]
+
+
+def match_question(question, today=None):
+    """
+    Match a question to a known SQL template.
+
+    Args:
+        question (str): The user's question
+        today (date, optional): Reference date for relative periods
+
+    Returns:
+        TemplateMatch or None: None when the question needs model-generated SQL
+    """
+    text = question.lower().replace('\u2019', "'").strip().rstrip('?.!')
+    today = today or date.today()
+
+    for name, pattern in INTENT_PATTERNS:
+        if not pattern.search(text):
+            continue
+
+        template = SQL_TEMPLATES[name]
+        uses_limit = ':limit' in str(template['sql'])
+        if _unmatched_words(text, name, uses_limit):
+            continue
+
+        start, end, default_grain = _resolve_period(text, today)
+        sql = template['sql']
+        if isinstance(sql, dict):
+            sql = sql[_resolve_grain(text, default_grain)]
+
+        transaction_type = None
+        if ':transaction_type' in str(template['sql']):
+            transaction_type = _resolve_transaction_type(text) or template.get('default_transaction_type')
+            if transaction_type is None:
+                # Income or expense? Let the model ask or decide rather than guess
+                continue
+
+        limit_match = LIMIT_PATTERN.search(text)
+        params = {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'last_day': (end - timedelta(days=1)).isoformat(),
+            'limit': min(int(limit_match.group(1)), 100) if limit_match else 10,
+            'transaction_type': transaction_type
+        }
+        description = template['description'].format(**params)
+        return TemplateMatch(name, sql, params, template['numeric'], description, template.get('dated', True))
+
+    return None
+
+
+def format_result(match, data):
+    """Render template results as a plain-text answer without the model"""
+    if match.numeric:
+        row = data[0] if data else {}
+        return (
+            f"{match.title}: "
+            f"income ₹{row.get('income') or 0:,.2f}, "
+            f"expense ₹{row.get('expense') or 0:,.2f}, "
+            f"net ₹{row.get('net') or 0:,.2f} "
+            f"across {row.get('transaction_count') or 0} transactions."
+        )
+
+    if not data:
+        return f"{match.title}: no matching records."
+
+    columns = list(data[0].keys())
+    lines = [f"{match.title}:", " | ".join(columns)]
+    for row in data:
+        lines.append(" | ".join(
+            f"{value:,.2f}" if isinstance(value, float) else str(value)
+            for value in row.values()
+        ))
+    return "\n".join(lines)
+
+
+# Questions with the template (and transaction type) they must resolve to;
+# None means the question has to go to the model. Run this module to check.
+EXAMPLE_QUESTIONS = [
+    ('What is the total revenue this month?', ('total_for_period', None)),
+    ('Show expenses by category last month', ('category_breakdown', 'Expense')),
+    ('Show breakdown by category this month', None),
+    ('Show payment mode split for this month', ('payment_mode_split', 'Income')),
+    ('Show cash vs UPI split', ('payment_mode_split', 'Income')),
+    ('Show expenses by payment mode this week', ('payment_mode_split', 'Expense')),
+    ('top 5 customers this year', ('top_customers', None)),
+    ('Who owes us money?', ('outstanding_balances', None)),
+    ('analyze transactions last week', ('pnl_by_period', None)),
+    ('Which employee booked the most sales?', None),
+    ('Show sales for customer C1023 last week', None),
+    ('revenue from home delivery orders this month', None),
+    ('expenses on rent last 3 months', None),
+    ('List transactions with reference number 123', None),
+]
+
+
+def check_examples():
+    """Return a description of every EXAMPLE_QUESTIONS entry that no longer resolves as expected"""
+    failures = []
+    for question, expected in EXAMPLE_QUESTIONS:
+        match = match_question(question)
+        actual = (match.name, match.params['transaction_type']) if match else None
+        if actual != expected:
+            failures.append(f'{question!r}: expected {expected}, got {actual}')
+    return failures
+
+
+if __name__ == '__main__':
+    failures = check_examples()
+    for failure in failures:
+        print(failure)
+    print(f"{len(EXAMPLE_QUESTIONS) - len(failures)} of {len(EXAMPLE_QUESTIONS)} example questions matched")
@@ -1,6 +1,7 @@
 class AccountingChat {
     constructor() {
-        this.conversationHistory = [];
+        // History is kept server-side; only the session ID is sent back
+        this.sessionId = null;
         this.initializeChat();
     }
 
@@ -42,7 +43,8 @@ class AccountingChat {
                 },
                 body: JSON.stringify({
                     message: message,
-                    history: this.conversationHistory
+                    session_id: this.sessionId,
+                    async: true
                 })
             });
 
@@ -50,13 +52,9 @@ class AccountingChat {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
-            
-            // Add messages to history
-            this.conversationHistory.push(
-                { role: 'user', content: message },
-                { role: 'assistant', content: data.message }
-            );
+            const job = await response.json();
+            this.sessionId = job.session_id;
+            const data = await this.waitForJob(job.job_id);
 
             // Format response with any query results
             let formattedResponse = data.message;
@@ -73,6 +71,26 @@ class AccountingChat {
         }
     }
 
+    async waitForJob(jobId) {
+        // Poll the agent job until the server has finished generating
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+
+            const response = await fetch(`/api/agent/jobs/${jobId}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const job = await response.json();
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'error') {
+                throw new Error(job.error);
+            }
+        }
+    }
+
     async getSchema() {
         try {
             const response = await fetch('/api/accounting/schema');
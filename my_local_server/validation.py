@@ -0,0 +1,64 @@
+from collections import namedtuple
+import pandas as pd
+from constants import (
+    TRANSACTION_TYPES,
+    INCOME_CATEGORIES,
+    EXPENSE_CATEGORIES,
+    PAYMENT_MODES,
+    PAYMENT_STATUSES
+)
+
+# allowed: frozenset of valid values; optional: blank values (None, '') pass
+Choice = namedtuple('Choice', ['allowed', 'optional', 'message'])
+
+
+def _choice(label, values, optional=False):
+    return Choice(frozenset(values), optional, f"Invalid {label}. Must be one of: {', '.join(values)}")
+
+
+# Compiled once at import; the Accounts validators and validate_frame share them
+ACCOUNT_CHOICES = {
+    'transaction_type': _choice('transaction type', TRANSACTION_TYPES),
+    'category': _choice('category', INCOME_CATEGORIES + EXPENSE_CATEGORIES),
+    'payment_mode': _choice('payment mode', PAYMENT_MODES, optional=True),
+    'payment_status': _choice('payment status', PAYMENT_STATUSES)
+}
+
+def check_choice(field, value):
+    """
+    Validate one Accounts field value against its compiled choices.
+
+    Returns:
+        The value unchanged
+
+    Raises:
+        ValueError: If the value is not allowed
+    """
+    choice = ACCOUNT_CHOICES[field]
+    if choice.optional and not value:
+        return value
+    if not isinstance(value, str) or value not in choice.allowed:
+        raise ValueError(choice.message)
+    return value
+
+
+def validate_frame(df):
+    """
+    Validate the Accounts choice columns of a DataFrame in bulk.
+
+    Only columns present in df are checked, with the same rules as the ORM
+    validators. Each check is a single isin() over the column.
+
+    Returns:
+        pd.Series: Error message per row (the first failing column), missing (NA) where valid
+    """
+    errors = pd.Series(None, index=df.index, dtype=object)
+    for field, choice in ACCOUNT_CHOICES.items():
+        if field not in df.columns:
+            continue
+        column = df[field]
+        invalid = ~column.isin(choice.allowed)
+        if choice.optional:
+            invalid &= column.notna() & (column != '')
+        errors = errors.mask(invalid & errors.isna(), choice.message)
+    return errors